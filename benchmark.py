@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+ローカルベンチマーク
+検索エンジンの代わりになるローカルサーバー（Bing / DuckDuckGo風の検索結果ページ）と
+大量の合成ページを配信するサイト群を起動し、FastWebScraper と FastWebScraperV2 の性能を測定する
+（ネットワークに接続せずに、性能に関わる変更の効果を確認できる）
+
+使い方:
+    python benchmark.py                                   # 既定の条件で v1 / v2 を比較
+    python benchmark.py --pages 5000 --size-kb 100 --latency-ms 50 --engine lxml
+    python benchmark.py --json bench.json                 # 結果をJSONでも保存
+
+測定項目:
+    search  : 検索結果ページの取得・解析（search_bing / search_google_custom）
+    fetch   : fetch_page_async を1件ずつ順番に実行（並列化なしの1ページあたりのコスト）
+    scrape  : scrape_urls_async で全ページを取得（スループット・レイテンシのパーセンタイル）
+    save    : save_results で結果を保存
+    各シナリオは別プロセスで実行し、CPU時間と最大RSSを測定する
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import socket
+import tempfile
+import time
+from html import escape
+from typing import Dict, List, Optional, Sequence
+
+from aiohttp import web
+
+# 合成ページの本文に使う単語
+_WORDS = (
+    "Python", "スクレイピング", "非同期", "処理", "データ", "解析", "aiohttp", "lxml", "高速", "並列",
+    "ページ", "検索", "結果", "画像", "テキスト", "抽出", "network", "latency", "throughput", "キャッシュ",
+)
+
+
+# ---------------------------------------------------------------------------
+# サイト群（ローカルサーバー）
+# ---------------------------------------------------------------------------
+
+class SiteFarm:
+    """
+    合成ページと検索結果ページを配信するaiohttpアプリケーション
+
+    - /bing/search?q=bench+<開始>+<件数>   : li.b_algo 形式の検索結果
+    - /ddg/html/?q=bench+<開始>+<件数>     : a.result__a 形式の検索結果
+    - /page/<番号>                         : 合成ページ（サイズ・遅延・画像数・文字コード・失敗率は番号から決定的に決まる）
+    """
+
+    def __init__(self, ports: Sequence[int], size_kb: float = 50, latency_ms: float = 20,
+                 jitter_ms: float = 10, images: int = 10, encodings: Sequence[str] = ('utf-8',),
+                 failure_rate: float = 0.0, seed: int = 0):
+        self.ports = list(ports)
+        self.size_kb = size_kb
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.images = images
+        self.encodings = list(encodings)
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self._pages: Dict[int, tuple] = {}
+
+    def page_url(self, n: int) -> str:
+        """n番目のページのURL（ポートを分けて複数のホストに見せる）"""
+        return f"http://127.0.0.1:{self.ports[n % len(self.ports)]}/page/{n}"
+
+    def _render_page(self, n: int) -> tuple:
+        """n番目のページの (ボディ, Content-Type, ステータス, 遅延秒) を作成（生成結果はキャッシュ）"""
+        cached = self._pages.get(n)
+        if cached is not None:
+            return cached
+
+        rng = random.Random(self.seed * 1_000_003 + n)
+        delay = max(0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        if rng.random() < self.failure_rate:
+            page = (b'Service Unavailable', 'text/plain', rng.choice((500, 503, 404)), delay)
+            self._pages[n] = page
+            return page
+
+        encoding = self.encodings[n % len(self.encodings)]
+        parts = [
+            f'<!DOCTYPE html><html><head><meta charset="{encoding}"><title>ベンチマークページ {n}</title>',
+            f'<meta name="description" content="合成ページ {n} の説明">',
+            f'<meta property="og:image" content="/static/og_{n}.png">',
+            '<style>body{font-family:sans-serif}</style><script>var x = 1;</script></head><body>',
+            f'<nav><a href="/">ホーム</a> <a href="/page/{n + 1}">次へ</a></nav><main><h1>ページ {n}</h1>',
+        ]
+        for i in range(self.images):
+            if i % 3 == 0:
+                parts.append(f'<img src="/static/{n}_{i}.jpg" srcset="/static/{n}_{i}@2x.jpg 2x" alt="画像 {i}">')
+            else:
+                parts.append(f'<img src="/static/{n}_{i}.jpg" alt="画像 {i}">')
+
+        target = int(self.size_kb * 1024)
+        size = sum(len(p) for p in parts)
+        section = 0
+        while size < target:
+            words = ' '.join(rng.choice(_WORDS) for _ in range(40))
+            if section % 5 == 0:
+                chunk = f'<h2>セクション {section}</h2><p>{escape(words)}</p>'
+            elif section % 5 == 1:
+                chunk = '<ul>' + ''.join(f'<li>{escape(rng.choice(_WORDS))} {j}</li>' for j in range(5)) + '</ul>'
+            else:
+                chunk = f'<p>{escape(words)} <a href="/page/{rng.randrange(10_000)}">リンク</a> <b>強調</b></p>'
+            parts.append(chunk)
+            size += len(chunk.encode(encoding, errors='replace'))
+            section += 1
+        parts.append('</main><footer>フッター</footer></body></html>')
+
+        body = ''.join(parts).encode(encoding, errors='replace')
+        page = (body, 'text/html', 200, delay)
+        self._pages[n] = page
+        return page
+
+    async def handle_page(self, request: web.Request) -> web.Response:
+        n = int(request.match_info['n'])
+        body, content_type, status, delay = self._render_page(n)
+        if delay:
+            await asyncio.sleep(delay)
+        encoding = self.encodings[n % len(self.encodings)]
+        # 半分のページはContent-Typeにcharsetを付けない（meta charsetでの判定を測定）
+        charset = encoding if status == 200 and n % 2 == 0 else None
+        return web.Response(body=body, status=status, content_type=content_type, charset=charset)
+
+    def _serp_range(self, request: web.Request) -> range:
+        """クエリ "bench <開始> <件数>" から検索結果に含めるページ番号の範囲を取得"""
+        parts = request.query.get('q', '').split()
+        try:
+            start, count = int(parts[1]), int(parts[2])
+        except (IndexError, ValueError):
+            start, count = 0, 10
+        return range(start, start + count)
+
+    async def handle_bing(self, request: web.Request) -> web.Response:
+        items = ''.join(
+            f'<li class="b_algo"><h2><a href="{self.page_url(n)}">結果 {n}</a></h2>'
+            f'<p class="b_caption">ページ {n} の概要</p></li>'
+            for n in self._serp_range(request)
+        )
+        html = f'<html><body><ol id="b_results">{items}</ol><a href="https://www.bing.com/">Bing</a></body></html>'
+        return web.Response(text=html, content_type='text/html', charset='utf-8')
+
+    async def handle_ddg(self, request: web.Request) -> web.Response:
+        items = ''.join(
+            f'<div class="result"><h2 class="result__title"><a class="result__a" href="{self.page_url(n)}">結果 {n}</a></h2></div>'
+            for n in self._serp_range(request)
+        )
+        html = f'<html><body><div id="links">{items}</div><a href="https://duckduckgo.com/">DuckDuckGo</a></body></html>'
+        return web.Response(text=html, content_type='text/html', charset='utf-8')
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/page/{n}', self.handle_page)
+        app.router.add_get('/bing/search', self.handle_bing)
+        app.router.add_get('/ddg/html/', self.handle_ddg)
+        return app
+
+    def serve_forever(self):
+        """全ポートでサーバーを起動（別プロセスで実行）"""
+        async def main():
+            runner = web.AppRunner(self.create_app(), access_log=None)
+            await runner.setup()
+            for port in self.ports:
+                await web.TCPSite(runner, '127.0.0.1', port).start()
+            await asyncio.Event().wait()
+
+        asyncio.run(main())
+
+
+def _free_ports(count: int) -> List[int]:
+    """空いているTCPポートを取得"""
+    sockets = []
+    try:
+        for _ in range(count):
+            sock = socket.socket()
+            sock.bind(('127.0.0.1', 0))
+            sockets.append(sock)
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+def _wait_for_port(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"ベンチマーク用サーバーが起動しませんでした (port {port})")
+
+
+# ---------------------------------------------------------------------------
+# 測定
+# ---------------------------------------------------------------------------
+
+def percentile(values: List[float], p: float) -> float:
+    """パーセンタイル（線形補間）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def _cpu_time() -> float:
+    """このプロセスと子プロセス（プロセスプールのワーカー）のCPU時間"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _run_scenario(name: str, farm: SiteFarm, options: Dict) -> Dict:
+    """1つのスクレイパーの測定（別プロセスで実行される）"""
+    from fast_scraper import FastWebScraper
+    from fast_scraper_v2 import FastWebScraperV2
+    from scheduler import HostScheduler
+    from search_providers import SearchRouter, BingSearch, DuckDuckGoSearch
+
+    pages = options['pages']
+    scheduler = HostScheduler(max_concurrency=options['concurrency'], per_host_limit=options['per_host'])
+    kwargs = dict(executor=options['executor'], engine=options['engine'], scheduler=scheduler)
+    if name == 'v1':
+        router = SearchRouter([BingSearch(f"http://127.0.0.1:{farm.ports[0]}/bing/search")])
+        scraper = FastWebScraper(search_router=router, **kwargs)
+        search = scraper.search_bing
+    else:
+        router = SearchRouter([DuckDuckGoSearch(f"http://127.0.0.1:{farm.ports[0]}/ddg/html/")])
+        scraper = FastWebScraperV2(search_router=router, **kwargs)
+        search = scraper.search_google_custom
+
+    report: Dict = {'scraper': name}
+    workdir = tempfile.mkdtemp(prefix='bench_')
+    cwd = os.getcwd()
+    log = io.StringIO()
+    try:
+        os.chdir(workdir)
+        # スクレイパーの進捗表示は測定対象に含めつつ、画面には出さない
+        with contextlib.redirect_stdout(log):
+            # --- search ---
+            per_query = options['results_per_query']
+            queries = [f"bench {start} {min(per_query, pages - start)}" for start in range(0, pages, per_query)]
+            cpu, start = _cpu_time(), time.perf_counter()
+            urls: List[str] = []
+            for query in queries:
+                urls.extend(search(query, num_results=min(per_query, pages - len(urls))))
+            report['search'] = {
+                'queries': len(queries),
+                'urls': len(urls),
+                'seconds': time.perf_counter() - start,
+                'cpu': _cpu_time() - cpu,
+            }
+
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                # --- fetch（1件ずつ） ---
+                async def fetch_sequential(sample: List[str]) -> List[float]:
+                    import aiohttp
+                    latencies = []
+                    async with aiohttp.ClientSession() as session:
+                        for url in sample:
+                            t = time.perf_counter()
+                            await scraper.fetch_page_async(session, url)
+                            latencies.append(time.perf_counter() - t)
+                    return latencies
+
+                sample = urls[:options['fetch_sample']]
+                cpu = _cpu_time()
+                latencies = loop.run_until_complete(fetch_sequential(sample))
+                report['fetch'] = {
+                    'pages': len(sample),
+                    'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+                    'p50': percentile(latencies, 50),
+                    'cpu': _cpu_time() - cpu,
+                }
+
+                # --- scrape（並列） ---
+                cpu, start = _cpu_time(), time.perf_counter()
+                results = loop.run_until_complete(scraper.scrape_urls_async(urls))
+                seconds = time.perf_counter() - start
+            finally:
+                loop.close()
+            latencies = [result['elapsed'] for result in results]
+            ok = sum(1 for result in results if result.ok)
+            content_bytes = sum(len(result['content']) for result in results)
+            report['scrape'] = {
+                'pages': len(results),
+                'ok': ok,
+                'failed': len(results) - ok,
+                'seconds': seconds,
+                'pages_per_sec': len(results) / seconds if seconds else 0.0,
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'cpu': _cpu_time() - cpu,
+                'content_mb': content_bytes / 1024 / 1024,
+            }
+
+            # --- save ---
+            cpu, start = _cpu_time(), time.perf_counter()
+            scraper.save_results("benchmark", results)
+            report['save'] = {'seconds': time.perf_counter() - start, 'cpu': _cpu_time() - cpu}
+        scraper.close()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report['cpu_total'] = _cpu_time()
+    report['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return report
+
+
+def _scenario_process(name: str, farm: SiteFarm, options: Dict, queue):
+    try:
+        queue.put(_run_scenario(name, farm, options))
+    except BaseException as e:
+        queue.put({'scraper': name, 'error': repr(e)})
+
+
+def run_benchmark(scrapers: Sequence[str] = ('v1', 'v2'), hosts: int = 8, seed: int = 0, **options) -> List[Dict]:
+    """
+    サイト群を起動して各スクレイパーを別プロセスで測定
+
+    Args:
+        scrapers: 測定するスクレイパー（'v1': FastWebScraper, 'v2': FastWebScraperV2）
+        hosts: サイト群のホスト数（ポートを分けて別ホストとして扱わせる）
+        seed: 合成ページの乱数シード
+        **options: 合成ページの条件（size_kb, latency_ms, ...）と測定条件（pages, engine, ...）
+
+    Returns:
+        スクレイパーごとの測定結果
+    """
+    farm_keys = ('size_kb', 'latency_ms', 'jitter_ms', 'images', 'encodings', 'failure_rate')
+    farm = SiteFarm(_free_ports(hosts), seed=seed, **{k: options.pop(k) for k in farm_keys if k in options})
+    options = {
+        'pages': 1000, 'engine': 'bs4', 'executor': None, 'concurrency': 50, 'per_host': 4,
+        'results_per_query': 100, 'fetch_sample': 20, **options,
+    }
+
+    ctx = multiprocessing.get_context('spawn')
+    server = ctx.Process(target=farm.serve_forever, daemon=True)
+    server.start()
+    try:
+        for port in farm.ports:
+            _wait_for_port(port)
+        reports = []
+        for name in scrapers:
+            queue = ctx.Queue()
+            process = ctx.Process(target=_scenario_process, args=(name, farm, options, queue))
+            process.start()
+            reports.append(queue.get())
+            process.join()
+        return reports
+    finally:
+        server.terminate()
+        server.join()
+
+
+def print_report(reports: List[Dict]):
+    """測定結果を表形式で表示"""
+    print("\n" + "=" * 80)
+    print("📊 ベンチマーク結果")
+    print("=" * 80)
+    for report in reports:
+        if 'error' in report:
+            print(f"\n❌ {report['scraper']}: {report['error']}")
+            continue
+        search, fetch, scrape, save = report['search'], report['fetch'], report['scrape'], report['save']
+        print(f"\n■ {report['scraper']}")
+        print(f"  search : {search['queries']}クエリ / {search['urls']}件  {search['seconds']:.2f}秒  CPU {search['cpu']:.2f}秒")
+        print(f"  fetch  : {fetch['pages']}件を順番に取得  平均 {fetch['mean'] * 1000:.1f}ms  p50 {fetch['p50'] * 1000:.1f}ms")
+        print(f"  scrape : {scrape['pages']}件（成功 {scrape['ok']} / 失敗 {scrape['failed']}）  {scrape['seconds']:.2f}秒"
+              f"  {scrape['pages_per_sec']:.1f}ページ/秒")
+        print(f"           p50 {scrape['p50'] * 1000:.1f}ms  p95 {scrape['p95'] * 1000:.1f}ms  p99 {scrape['p99'] * 1000:.1f}ms"
+              f"  CPU {scrape['cpu']:.2f}秒  本文 {scrape['content_mb']:.1f}MB")
+        print(f"  save   : {save['seconds']:.2f}秒  CPU {save['cpu']:.2f}秒")
+        print(f"  合計CPU時間 {report['cpu_total']:.2f}秒  最大RSS {report['peak_rss_mb']:.1f}MB")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="ローカルのサイト群でスクレイパーの性能を測定")
+    parser.add_argument('--scrapers', default='v1,v2', help="測定するスクレイパー（v1,v2）")
+    parser.add_argument('--pages', type=int, default=1000, help="取得するページ数")
+    parser.add_argument('--hosts', type=int, default=8, help="サイト群のホスト数")
+    parser.add_argument('--size-kb', type=float, default=50, help="1ページのサイズ（KB）")
+    parser.add_argument('--latency-ms', type=float, default=20, help="応答の遅延（ミリ秒）")
+    parser.add_argument('--jitter-ms', type=float, default=10, help="遅延のばらつき（ミリ秒）")
+    parser.add_argument('--images', type=int, default=10, help="1ページの画像数")
+    parser.add_argument('--encodings', default='utf-8,shift_jis,euc-jp', help="ページの文字コード（カンマ区切り）")
+    parser.add_argument('--failure-rate', type=float, default=0.02, help="エラーを返すページの割合")
+    parser.add_argument('--engine', default='bs4', choices=('bs4', 'lxml', 'stream'), help="抽出エンジン")
+    parser.add_argument('--executor', choices=('process', 'thread'), help="HTML解析の実行先")
+    parser.add_argument('--concurrency', type=int, default=50, help="全体の同時実行数")
+    parser.add_argument('--per-host', type=int, default=4, help="ホストごとの同時実行数")
+    parser.add_argument('--seed', type=int, default=0, help="合成ページの乱数シード")
+    parser.add_argument('--json', help="結果を保存するJSONファイル")
+    args = parser.parse_args(argv)
+
+    print(f"🏁 {args.pages}ページ × {args.hosts}ホスト（{args.size_kb}KB, {args.latency_ms}ms, "
+          f"画像{args.images}枚, 失敗率{args.failure_rate:.0%}, engine={args.engine}, executor={args.executor}）")
+    reports = run_benchmark(
+        scrapers=args.scrapers.split(','), hosts=args.hosts, seed=args.seed,
+        pages=args.pages, size_kb=args.size_kb, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        images=args.images, encodings=args.encodings.split(','), failure_rate=args.failure_rate,
+        engine=args.engine, executor=args.executor, concurrency=args.concurrency, per_host=args.per_host,
+    )
+    print_report(reports)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 結果を保存しました: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
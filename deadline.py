@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+処理全体の締め切り
+検索・ページ取得の各段階に残り時間を渡し、締め切りを過ぎたら未完了の処理を打ち切る
+"""
+
+import time
+from typing import Optional, Union
+
+
+class Deadline:
+    """
+    経過時間の上限（time.monotonic() 基準）
+
+    使用例:
+        deadline = Deadline(30)
+        urls = scraper.search_bing(query, deadline=deadline)
+        results = await scraper.scrape_urls_async(urls, deadline=deadline)
+    """
+    __slots__ = ('budget', 'expires_at')
+
+    def __init__(self, seconds: float):
+        """
+        Args:
+            seconds: 今からの持ち時間（秒）
+        """
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def coerce(cls, value: Union[None, float, 'Deadline']) -> Optional['Deadline']:
+        """秒数・Deadline・None のいずれかを Deadline（または None）に変換"""
+        if value is None or isinstance(value, Deadline):
+            return value
+        return cls(value)
+
+    def remaining(self) -> float:
+        """残り時間（秒。過ぎていれば0）"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def cap(self, timeout: float) -> float:
+        """timeout を残り時間で頭打ちにする"""
+        return min(timeout, self.remaining())
+
+    def __repr__(self) -> str:
+        return f"Deadline(budget={self.budget}, remaining={self.remaining():.3f})"
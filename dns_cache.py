@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+名前解決キャッシュ
+ホスト名 → IPアドレスをTTL付きでキャッシュし、セッション・クエリをまたいで名前解決を省略する
+（aiohttp のコネクターに resolver として渡す）
+"""
+
+import asyncio
+import socket
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+
+# (ホスト, ポート, アドレスファミリー)
+_Key = Tuple[str, int, int]
+
+
+class DnsCache(AbstractResolver):
+    """
+    TTL付きの名前解決キャッシュ（aiohttp のリゾルバー）
+
+    - 同じホストへの同時の名前解決は1回にまとめる
+    - 複数の ScraperSession（別スレッドのイベントループを含む）で共有できる
+    - 実際の名前解決は resolver_factory のリゾルバーに任せる
+      （aiohttp の既定では aiodns があれば非同期のc-ares、なければスレッドプールで getaddrinfo）
+
+    使用例:
+        dns_cache = DnsCache(ttl=300)
+        session = ScraperSession(dns_cache=dns_cache)
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 1024,
+                 resolver_factory: Callable[[], AbstractResolver] = DefaultResolver):
+        """
+        Args:
+            ttl: 解決結果の有効期間（秒）
+            max_entries: 保持する最大件数（古いものから破棄）
+            resolver_factory: 実際に名前解決を行うリゾルバーを作成する関数（イベントループごとに1つ作成）
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.resolver_factory = resolver_factory
+        self.hits = 0
+        self.misses = 0
+        self.lookup_time = 0.0      # 実際の名前解決にかかった時間の合計（秒）
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[_Key, Tuple[List[dict], float]]' = OrderedDict()
+        self._pending: Dict[Tuple[asyncio.AbstractEventLoop, _Key], asyncio.Task] = {}
+        self._resolvers: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AbstractResolver]' = weakref.WeakKeyDictionary()
+
+    def get(self, host: str, port: int = 0, family: int = socket.AF_INET) -> Optional[List[dict]]:
+        """キャッシュされた解決結果を取得（なければ・期限切れならNone）"""
+        key = (host, port, family)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            addrs, expires_at = item
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return [dict(addr) for addr in addrs]
+
+    def _put(self, key: _Key, addrs: List[dict]):
+        with self._lock:
+            self._entries[key] = (addrs, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _resolver(self, loop: asyncio.AbstractEventLoop) -> AbstractResolver:
+        with self._lock:
+            resolver = self._resolvers.get(loop)
+            if resolver is None:
+                resolver = self._resolvers[loop] = self.resolver_factory()
+            return resolver
+
+    async def _lookup(self, key: _Key, loop: asyncio.AbstractEventLoop) -> List[dict]:
+        host, port, family = key
+        start = time.perf_counter()
+        try:
+            addrs = await self._resolver(loop).resolve(host, port, family=family)
+        finally:
+            with self._lock:
+                self.lookup_time += time.perf_counter() - start
+                self._pending.pop((loop, key), None)
+        self._put(key, addrs)
+        return addrs
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[dict]:
+        """ホスト名を解決（キャッシュになければ解決してキャッシュに保存）"""
+        addrs = self.get(host, port, family)
+        if addrs is not None:
+            with self._lock:
+                self.hits += 1
+            return addrs
+
+        key = (host, port, family)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._pending.get((loop, key))
+            if task is None:
+                self.misses += 1
+                # 呼び出し元がキャンセルされても、同じホストを待っている他の呼び出しのために解決は続ける
+                task = self._pending[(loop, key)] = loop.create_task(self._lookup(key, loop))
+                task.add_done_callback(_consume_exception)
+            else:
+                self.hits += 1
+        addrs = await asyncio.shield(task)
+        return [dict(addr) for addr in addrs]
+
+    async def prefetch(self, host: str, port: int = 0, family: int = socket.AF_INET) -> bool:
+        """名前解決だけを先に済ませる（失敗しても例外は出さず False を返す）"""
+        try:
+            await self.resolve(host, port, family)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        return True
+
+    async def close(self):
+        """現在のイベントループで作成したリゾルバーを閉じる（キャッシュは保持する）"""
+        with self._lock:
+            resolver = self._resolvers.pop(asyncio.get_running_loop(), None)
+        if resolver is not None:
+            await resolver.close()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """ヒット数・ミス数・保持件数・名前解決にかかった時間の合計"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'lookup_time': self.lookup_time,
+            }
+
+
+def _consume_exception(task: asyncio.Task):
+    # 待っている呼び出しがすべてキャンセルされた場合の「exception was never retrieved」を防ぐ
+    if not task.cancelled():
+        task.exception()
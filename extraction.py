@@ -0,0 +1,686 @@
+#!/usr/bin/env python3
+"""
+HTML抽出処理
+取得したHTMLのバイト列からテキストと画像URLを抽出する
+プロセスプール/スレッドプールのワーカーからも呼び出せるようにモジュール関数として定義
+"""
+
+import codecs
+import logging
+import os
+import re
+import threading
+import time
+import concurrent.futures
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+import html2text
+import lxml.html
+import lxml.etree
+
+from url_utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# 抽出スタイル
+STYLE_FULL = 'full'      # ページ全体をテキスト化（FastWebScraper）
+STYLE_MAIN = 'main'      # タイトル・説明 + main/article/body（FastWebScraperV2）
+
+# 抽出エンジン
+ENGINE_BS4 = 'bs4'       # BeautifulSoup + html2text（従来方式）
+ENGINE_LXML = 'lxml'     # lxmlのツリーを1回だけ走査するシングルパス方式
+ENGINE_STREAM = 'stream' # ダウンロード中のチャンクをlxmlのフィードパーサーで逐次解析（出力はlxmlと同じ）
+
+# 抽出結果（URLに依存しない形式）: (テキスト, [(画像参照, altテキスト)], [メタ情報の画像参照])
+RawExtraction = Tuple[str, List[Tuple[str, str]], List[str]]
+
+# ワーカー（スレッド/プロセス）ごとのhtml2textコンバーター
+_local = threading.local()
+
+
+def get_converter() -> html2text.HTML2Text:
+    """現在のワーカー専用のhtml2textコンバーターを取得（HTML2Textはスレッドセーフではない）"""
+    converter = getattr(_local, 'converter', None)
+    if converter is None:
+        converter = html2text.HTML2Text()
+        converter.ignore_links = False
+        converter.ignore_images = False
+        converter.body_width = 0
+        _local.converter = converter
+    return converter
+
+
+def decode_body(body: bytes, encoding: Optional[str]) -> str:
+    """レスポンスのバイト列を文字列に変換"""
+    try:
+        return body.decode(encoding, errors='replace')
+    except LookupError:
+        # 未知の文字コード名の場合はUTF-8として扱う
+        return body.decode('utf-8', errors='replace')
+
+
+def extract_page(body: bytes, url: str, encoding: Optional[str] = None,
+                 style: str = STYLE_FULL, engine: str = ENGINE_BS4) -> Tuple[str, List[str]]:
+    """
+    HTMLからテキストコンテンツと画像URLを抽出
+
+    Args:
+        body: レスポンスボディ（バイト列）
+        url: ページURL（相対URLの解決に使用）
+        encoding: レスポンスの文字コード（不明ならNone）
+        style: 抽出スタイル（STYLE_FULL / STYLE_MAIN）
+        engine: 抽出エンジン（ENGINE_BS4 / ENGINE_LXML）
+
+    Returns:
+        (テキストコンテンツ, 画像URLリスト)
+    """
+    return resolve_page(extract_page_raw(body, encoding, style, engine), url)
+
+
+def extract_page_raw(body: bytes, encoding: Optional[str] = None, style: str = STYLE_FULL,
+                     engine: str = ENGINE_BS4, timings: Optional[Dict[str, float]] = None) -> RawExtraction:
+    """
+    HTMLからテキストコンテンツと画像参照（未解決の属性値）を抽出
+
+    結果はページURLに依存しないため、同じボディの抽出結果を別のURLでも再利用できる。
+
+    Args:
+        timings: 指定すると {'parse': パースの秒数, 'convert': テキスト変換・画像抽出の秒数} を書き込む
+
+    Returns:
+        (テキストコンテンツ, 本文中の画像の [(参照, altテキスト)], og:image等のメタ情報の画像参照リスト)
+    """
+    if engine in (ENGINE_LXML, ENGINE_STREAM):
+        return _extract_raw_lxml(body, encoding, style, timings)
+    if engine != ENGINE_BS4:
+        raise ValueError(f"Unknown extraction engine: {engine}")
+    return _extract_raw_bs4(body, encoding, style, timings)
+
+
+def extract_page_raw_timed(body: bytes, encoding: Optional[str] = None, style: str = STYLE_FULL,
+                           engine: str = ENGINE_BS4) -> Tuple[RawExtraction, Dict[str, float]]:
+    """extract_page_raw() の結果と段階ごとの所要時間を返す（ワーカープロセスから計測結果を持ち帰る用）"""
+    timings: Dict[str, float] = {}
+    return extract_page_raw(body, encoding, style, engine, timings), timings
+
+
+def resolve_page(raw: RawExtraction, url: str) -> Tuple[str, List[str]]:
+    """extract_page_raw() の結果の画像参照をページURLで絶対URLに変換"""
+    content, images = resolve_page_images(raw, url)
+    return content, list(images)
+
+
+def resolve_page_images(raw: RawExtraction, url: str) -> Tuple[str, Dict[str, str]]:
+    """
+    extract_page_raw() の結果を (テキストコンテンツ, {画像URL: altテキスト}) に変換
+
+    画像URLは絶対URLにして正規化し、最初に出現した順に重複なく並べる
+    （本文中の画像の後にog:image等のメタ情報の画像）。
+    """
+    content, image_refs, meta_refs = raw
+
+    # dictを挿入順を保つ集合として使い、重複判定をO(1)で行う
+    images: Dict[str, str] = {}
+
+    def add(ref: str, alt: str):
+        # 相対URLを絶対URLに変換
+        absolute_url = urljoin(url, ref.strip())
+        if not absolute_url.startswith(('http://', 'https://')):
+            return
+        key = normalize_url(absolute_url)
+        if key not in images or (alt and not images[key]):
+            images[key] = alt
+
+    for ref, alt in image_refs:
+        add(ref, alt)
+    for ref in meta_refs:
+        add(ref, '')
+    return content, images
+
+
+# ---------------------------------------------------------------------------
+# 画像参照の収集（bs4 / lxml 共通）
+# ---------------------------------------------------------------------------
+
+# 画像を示すmetaタグ（property または name）
+_META_IMAGE_KEYS = {'og:image', 'og:image:url', 'og:image:secure_url', 'twitter:image', 'twitter:image:src'}
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)', re.IGNORECASE)
+
+
+def parse_srcset(srcset: str) -> List[Tuple[str, float, str]]:
+    """
+    srcset属性を [(URL, 値, 単位)] に分解（単位は 'w' / 'x'。記述子がなければ 1x）
+
+    例: "a.jpg 480w, b.jpg 800w" → [('a.jpg', 480.0, 'w'), ('b.jpg', 800.0, 'w')]
+    """
+    candidates = []
+    pos = 0
+    length = len(srcset)
+    while pos < length:
+        # 区切りの空白とカンマを読み飛ばす
+        while pos < length and (srcset[pos].isspace() or srcset[pos] == ','):
+            pos += 1
+        start = pos
+        while pos < length and not srcset[pos].isspace():
+            pos += 1
+        url = srcset[start:pos]
+        if not url:
+            break
+        descriptor = ''
+        if url.endswith(','):
+            url = url.rstrip(',')
+        else:
+            start = pos
+            while pos < length and srcset[pos] != ',':
+                pos += 1
+            descriptor = srcset[start:pos].strip()
+        value, unit = 1.0, 'x'
+        if descriptor:
+            token = descriptor.split()[0]
+            try:
+                value, unit = float(token[:-1]), token[-1].lower()
+            except ValueError:
+                pass
+        if url:
+            candidates.append((url, value, unit))
+    return candidates
+
+
+def largest_srcset_candidate(srcset: Optional[str]) -> Optional[str]:
+    """srcsetの中で最も大きい画像のURL（幅指定 w を倍率指定 x より優先）"""
+    if not srcset:
+        return None
+    candidates = parse_srcset(srcset)
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: (c[2] == 'w', c[1]))[0]
+
+
+def _image_src(get: Callable[[str], Optional[str]]) -> Optional[str]:
+    """imgのURL（遅延読み込みの data-src / data-lazy-src を含む）"""
+    return get('src') or get('data-src') or get('data-lazy-src')
+
+
+def _collect_images(tag: str, get: Callable[[str], Optional[str]],
+                    image_refs: List[Tuple[str, str]], meta_refs: List[str]):
+    """要素の属性から画像参照を取り出して追加（get は属性値を返す関数）"""
+    if tag == 'img':
+        alt = (get('alt') or '').strip()
+        src = _image_src(get)
+        if src:
+            image_refs.append((src, alt))
+        largest = largest_srcset_candidate(get('srcset') or get('data-srcset'))
+        if largest:
+            image_refs.append((largest, alt))
+    elif tag == 'source':
+        # <picture><source srcset> のレスポンシブ画像
+        largest = largest_srcset_candidate(get('srcset') or get('data-srcset'))
+        if largest:
+            image_refs.append((largest, ''))
+    elif tag == 'meta':
+        key = (get('property') or get('name') or '').lower()
+        if key in _META_IMAGE_KEYS and get('content'):
+            meta_refs.append(get('content'))
+    elif tag == 'link':
+        rel = get('rel') or ''
+        if not isinstance(rel, str):
+            # BeautifulSoupではrelがリスト
+            rel = ' '.join(rel)
+        if 'preload' in rel.lower().split() and (get('as') or '').lower() == 'image':
+            href = get('href') or largest_srcset_candidate(get('imagesrcset'))
+            if href:
+                meta_refs.append(href)
+
+    # style属性のCSS背景画像
+    style = get('style')
+    if style and 'url(' in style.lower():
+        for match in _CSS_URL.finditer(style):
+            if not match.group(2).startswith('data:'):
+                image_refs.append((match.group(2), ''))
+
+
+def _extract_raw_bs4(body: bytes, encoding: Optional[str], style: str,
+                     timings: Optional[Dict[str, float]] = None) -> RawExtraction:
+    """BeautifulSoup + html2text による抽出"""
+    start = time.perf_counter()
+    if encoding:
+        soup = BeautifulSoup(decode_body(body, encoding), 'lxml')
+    else:
+        # 文字コード不明の場合はBeautifulSoupの自動判定に任せる
+        soup = BeautifulSoup(body, 'lxml')
+    converter = get_converter()
+
+    # スクリプトとスタイルタグを削除
+    for script in soup(["script", "style", "noscript"]):
+        script.decompose()
+    # 遅延読み込みの画像もlxmlエンジンと同じく本文中に出力する（html2textは src しか見ない）
+    for img in soup.find_all('img'):
+        if not img.get('src') and _image_src(img.get):
+            img['src'] = _image_src(img.get)
+    parsed = time.perf_counter()
+
+    if style == STYLE_MAIN:
+        # タイトルを取得
+        title = soup.find('title')
+        title_text = title.text if title else "No Title"
+
+        # メタディスクリプションを取得
+        meta_desc = soup.find('meta', attrs={'name': 'description'})
+        description = meta_desc.get('content', '') if meta_desc else ''
+
+        # mainタグ、articleタグ、またはbodyタグから取得
+        main_content = soup.find('main') or soup.find('article') or soup.find('body')
+        if main_content:
+            text_content = converter.handle(str(main_content))
+        else:
+            text_content = converter.handle(str(soup))
+
+        # テキストの前にタイトルと説明を追加
+        content = f"# {title_text}\n\n"
+        if description:
+            content += f"**説明**: {description}\n\n"
+        content += text_content
+    else:
+        content = converter.handle(str(soup))
+
+    # 画像の参照を抽出（文書順）
+    image_refs: List[Tuple[str, str]] = []
+    meta_refs: List[str] = []
+    for tag in soup.find_all(True):
+        _collect_images(tag.name, tag.get, image_refs, meta_refs)
+
+    if timings is not None:
+        timings['parse'] = parsed - start
+        timings['convert'] = time.perf_counter() - parsed
+    return content, image_refs, meta_refs
+
+
+# ---------------------------------------------------------------------------
+# lxmlシングルパスエンジン
+# ---------------------------------------------------------------------------
+
+# 中身ごと捨てるタグ
+_DROP_TAGS = {'script', 'style', 'noscript', 'template', 'iframe', 'svg', 'select'}
+# 前後に段落区切りを入れるブロック要素
+_BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'main', 'header', 'footer', 'nav', 'aside',
+    'form', 'fieldset', 'figure', 'figcaption', 'address', 'details', 'summary',
+    'dl', 'table', 'blockquote', 'center',
+}
+_HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+_EMPHASIS_TAGS = {'b': '**', 'strong': '**', 'i': '_', 'em': '_', 'code': '`', 'kbd': '`'}
+# v2形式で本文とみなす要素（優先順）
+_MAIN_TAGS = ('main', 'article', 'body')
+_WHITESPACE = re.compile(r'[ \t\r\n\f]+')
+
+
+class _MarkdownWriter:
+    """html2text風のMarkdownテキストを組み立てる"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.pending_newlines = 0
+        self.line_prefix = ''
+        self.at_line_start = True
+        self.last_space = True
+
+    def block(self, newlines: int = 2):
+        """次のテキストの前に改行を入れる"""
+        if self.chunks:
+            self.pending_newlines = max(self.pending_newlines, newlines)
+
+    def raw(self, text: str):
+        """テキストをそのまま出力（空白の正規化なし）"""
+        if not text:
+            return
+        if self.pending_newlines:
+            self.chunks.append('\n' * self.pending_newlines)
+            self.pending_newlines = 0
+            self.at_line_start = True
+        if self.at_line_start and self.line_prefix:
+            self.chunks.append(self.line_prefix)
+            self.line_prefix = ''
+        self.chunks.append(text)
+        self.at_line_start = text.endswith('\n')
+        self.last_space = text[-1].isspace()
+
+    def text(self, text: Optional[str]):
+        """テキストノードを出力（連続する空白を1つにまとめる）"""
+        if not text:
+            return
+        text = _WHITESPACE.sub(' ', text)
+        if self.at_line_start or self.pending_newlines or self.last_space:
+            text = text.lstrip(' ')
+        if text:
+            self.raw(text)
+
+    def getvalue(self, start: int = 0, end: Optional[int] = None) -> str:
+        body = ''.join(self.chunks[start:end]).strip('\n')
+        # 行末の空白を除去
+        lines = [line.rstrip() for line in body.split('\n')]
+        return '\n'.join(lines) + '\n\n' if body else ''
+
+
+def _parse_lxml(body: bytes, encoding: Optional[str]):
+    """バイト列をlxmlのHTMLツリーにパース"""
+    if not encoding:
+        # 文字コード不明の場合はUTF-8を試し、だめならlxmlのmeta charset判定に任せる
+        try:
+            body.decode('utf-8')
+            encoding = 'utf-8'
+        except UnicodeDecodeError:
+            encoding = None
+    try:
+        parser = lxml.html.HTMLParser(encoding=encoding, remove_comments=True)
+    except LookupError:
+        parser = lxml.html.HTMLParser(remove_comments=True)
+    return lxml.html.document_fromstring(body, parser=parser)
+
+
+def _extract_raw_lxml(body: bytes, encoding: Optional[str], style: str,
+                      timings: Optional[Dict[str, float]] = None) -> RawExtraction:
+    """
+    lxmlのツリーを1回だけ走査してテキスト・タイトル・説明・画像URLを同時に抽出
+
+    BeautifulSoup → str(soup) → html2text のような再パースを行わない。
+    出力は従来のhtml2text形式に近いMarkdown風テキスト。
+    """
+    start = time.perf_counter()
+    try:
+        root = _parse_lxml(body, encoding)
+    except (lxml.etree.ParserError, ValueError):
+        # 空のドキュメントなど
+        return _empty_result(style)
+    parsed = time.perf_counter()
+    result = _walk_lxml(root, style)
+    if timings is not None:
+        timings['parse'] = parsed - start
+        timings['convert'] = time.perf_counter() - parsed
+    return result
+
+
+def _empty_result(style: str) -> RawExtraction:
+    return ("# No Title\n\n" if style == STYLE_MAIN else ""), [], []
+
+
+def _walk_lxml(root, style: str) -> RawExtraction:
+    """パース済みのツリーを走査して extract_page_raw() と同じ形式の結果を作成"""
+    out = _MarkdownWriter()
+    title_text = None
+    description = ''
+    image_refs: List[Tuple[str, str]] = []
+    meta_refs: List[str] = []
+    # main/article/bodyの出力範囲（チャンク位置）
+    regions = {}
+
+    in_head = 0
+    in_pre = 0
+    lists: List[List] = []   # [タグ名, 連番]
+    links: List[Optional[str]] = []
+
+    stack = [(root, False)]
+    while stack:
+        el, closing = stack.pop()
+        tag = el.tag
+
+        if closing:
+            # --- 終了タグ ---
+            if tag == 'head':
+                in_head -= 1
+            elif tag in _HEADING_TAGS or tag in _BLOCK_TAGS:
+                out.block()
+            elif tag in _EMPHASIS_TAGS:
+                if not in_head:
+                    out.raw(_EMPHASIS_TAGS[tag])
+            elif tag == 'a':
+                href = links.pop()
+                if href is not None:
+                    out.raw(f"]({href})")
+            elif tag in ('ul', 'ol'):
+                lists.pop()
+                out.block(2 if not lists else 1)
+            elif tag == 'li':
+                out.block(1)
+            elif tag == 'pre':
+                in_pre -= 1
+                out.block()
+            elif tag in ('tr', 'dt', 'dd'):
+                out.block(1)
+            if tag in regions and regions[tag][1] is None:
+                regions[tag][1] = len(out.chunks)
+            if el.tail and not in_head:
+                if in_pre:
+                    out.raw(el.tail)
+                else:
+                    out.text(el.tail)
+            continue
+
+        if not isinstance(tag, str) or tag in _DROP_TAGS:
+            # コメント・処理命令・script/style等は中身を捨てて後続テキストのみ出力（pre内は空白を保つ）
+            if el.tail and not in_head:
+                if in_pre:
+                    out.raw(el.tail)
+                else:
+                    out.text(el.tail)
+            continue
+
+        # --- 開始タグ ---
+        if tag == 'head':
+            in_head += 1
+        elif tag == 'title':
+            if title_text is None:
+                title_text = el.text_content().strip()
+            if el.tail and not in_head:
+                out.text(el.tail)
+            continue
+        elif tag == 'meta':
+            name = (el.get('name') or '').lower()
+            if name == 'description' and not description:
+                description = el.get('content', '')
+        elif tag == 'img':
+            src = _image_src(el.get)
+            if src and not in_head:
+                out.raw(f"![{(el.get('alt') or '').strip()}]({src})")
+        elif tag in _HEADING_TAGS:
+            out.block()
+            out.line_prefix = '#' * _HEADING_TAGS[tag] + ' '
+        elif tag in _BLOCK_TAGS:
+            out.block()
+        elif tag == 'br':
+            out.raw('\n')
+        elif tag == 'hr':
+            out.block()
+            out.raw('* * *')
+            out.block()
+        elif tag in _EMPHASIS_TAGS:
+            if not in_head:
+                out.raw(_EMPHASIS_TAGS[tag])
+        elif tag == 'a':
+            href = el.get('href')
+            if href and not href.startswith('#') and not in_head:
+                links.append(href)
+                out.raw('[')
+            else:
+                links.append(None)
+        elif tag in ('ul', 'ol'):
+            out.block(2 if not lists else 1)
+            lists.append([tag, 0])
+        elif tag == 'li':
+            out.block(1)
+            if lists:
+                kind = lists[-1]
+                kind[1] += 1
+                bullet = f"{kind[1]}." if kind[0] == 'ol' else '*'
+                out.line_prefix = '  ' * len(lists) + bullet + ' '
+            else:
+                out.line_prefix = '  * '
+        elif tag == 'pre':
+            out.block()
+            in_pre += 1
+        elif tag in ('tr', 'dt', 'dd'):
+            out.block(1)
+        elif tag in ('td', 'th'):
+            if not out.at_line_start and not out.pending_newlines:
+                out.raw(' | ')
+
+        _collect_images(tag, el.get, image_refs, meta_refs)
+
+        if tag in _MAIN_TAGS and tag not in regions:
+            regions[tag] = [len(out.chunks), None]
+
+        if el.text and not in_head:
+            if in_pre:
+                out.raw(el.text)
+            else:
+                out.text(el.text)
+
+        stack.append((el, True))
+        stack.extend((child, False) for child in reversed(el))
+
+    if style == STYLE_MAIN:
+        # mainタグ、articleタグ、またはbodyタグの範囲を本文とする
+        text_content = None
+        for tag in _MAIN_TAGS:
+            if tag in regions:
+                start, end = regions[tag]
+                text_content = out.getvalue(start, end)
+                break
+        if text_content is None:
+            text_content = out.getvalue()
+
+        # テキストの前にタイトルと説明を追加
+        content = f"# {title_text if title_text is not None else 'No Title'}\n\n"
+        if description:
+            content += f"**説明**: {description}\n\n"
+        content += text_content
+    else:
+        content = out.getvalue()
+
+    return content, image_refs, meta_refs
+
+
+# 文字コードの指定を探す範囲（先頭のバイト数）
+_SNIFF_BYTES = 1024
+_META_CHARSET = re.compile(rb'<meta[^>]+charset', re.IGNORECASE)
+
+
+class StreamingExtractor:
+    """
+    ダウンロード中のチャンクを順にlxmlのフィードパーサーへ渡す抽出器
+
+    本文全体のバイト列を保持せず、最後のチャンクが届いた時点でほぼ解析が終わっている。
+    close() で残りの解析とツリーの走査を行い、extract_page_raw() と同じ形式の結果を返す。
+
+    使用例:
+        extractor = StreamingExtractor(STYLE_FULL)
+        extractor.start(response.charset)
+        async for chunk in response.content.iter_chunked(65536):
+            extractor.feed(chunk)
+        content, image_refs, meta_refs = extractor.close()
+    """
+
+    def __init__(self, style: str = STYLE_FULL, digest=None):
+        """
+        Args:
+            style: 抽出スタイル（STYLE_FULL / STYLE_MAIN）
+            digest: 受け取ったチャンクで更新するハッシュオブジェクト（抽出結果キャッシュのキー用）
+        """
+        self.style = style
+        self.digest = digest
+        self.encoding: Optional[str] = None
+        self.size = 0
+        # 段階ごとの所要時間（parse: フィードパーサーでの解析, convert: ツリーの走査）
+        self.timings: Dict[str, float] = {'parse': 0.0, 'convert': 0.0}
+        self._parser = None
+        self._head = b''
+
+    def start(self, encoding: Optional[str]):
+        """レスポンスの文字コードを設定（最初のチャンクの前に呼び出す）"""
+        self.encoding = encoding
+
+    def _create_parser(self, encoding: Optional[str]):
+        try:
+            self._parser = lxml.html.HTMLParser(encoding=encoding, remove_comments=True)
+        except LookupError:
+            self._parser = lxml.html.HTMLParser(remove_comments=True)
+
+    def _sniff_encoding(self, head: bytes) -> Optional[str]:
+        """文字コード不明の場合、BOMかmeta charsetがあればlxmlの判定に任せ、なければUTF-8とする"""
+        if head.startswith((codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return None
+        if _META_CHARSET.search(head):
+            return None
+        return 'utf-8'
+
+    def feed(self, chunk: bytes):
+        """受信したチャンクをパーサーに渡す"""
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.digest is not None:
+            self.digest.update(chunk)
+
+        if self._parser is None:
+            if self.encoding:
+                self._create_parser(self.encoding)
+            else:
+                # 文字コードを判定できるまで先頭のチャンクを溜める
+                self._head += chunk
+                if len(self._head) < _SNIFF_BYTES:
+                    return
+                chunk, self._head = self._head, b''
+                self._create_parser(self._sniff_encoding(chunk))
+        start = time.perf_counter()
+        self._parser.feed(chunk)
+        self.timings['parse'] += time.perf_counter() - start
+
+    def close(self) -> RawExtraction:
+        """解析を完了して extract_page_raw() と同じ形式の結果を返す"""
+        if self._parser is None:
+            if not self._head:
+                return _empty_result(self.style)
+            self._create_parser(self.encoding or self._sniff_encoding(self._head))
+            self._parser.feed(self._head)
+            self._head = b''
+        parser, self._parser = self._parser, None
+        start = time.perf_counter()
+        try:
+            root = parser.close()
+        except (lxml.etree.ParserError, lxml.etree.XMLSyntaxError, ValueError):
+            return _empty_result(self.style)
+        finally:
+            parsed = time.perf_counter()
+            self.timings['parse'] += parsed - start
+        if root is None:
+            return _empty_result(self.style)
+        result = _walk_lxml(root, self.style)
+        self.timings['convert'] = time.perf_counter() - parsed
+        return result
+
+
+def create_executor(kind: str = 'process', max_workers: Optional[int] = None) -> concurrent.futures.Executor:
+    """
+    抽出処理用のエグゼキューターを作成
+
+    Args:
+        kind: 'process'（プロセスプール）または 'thread'（スレッドプール）
+        max_workers: ワーカー数（省略時はCPUコア数）
+
+    Returns:
+        エグゼキューター（プロセスプールが使えない環境ではスレッドプール）
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    if kind == 'process':
+        try:
+            return concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+        except (OSError, NotImplementedError, ImportError) as e:
+            # マルチプロセスが使えない環境（一部のサンドボックス等）ではスレッドにフォールバック
+            logger.warning(f"⚠️ プロセスプールを作成できません（{e}）。スレッドプールを使用します")
+    elif kind != 'thread':
+        raise ValueError(f"Unknown executor kind: {kind}")
+
+    return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extract')
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+抽出結果のメモ化
+レスポンスボディのハッシュと抽出設定をキーに extract_page_raw() の結果をキャッシュし、
+同じボディ（ミラーページ・未更新ページ・複数クエリで取得したページ）の解析を省略する
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from extraction import RawExtraction
+
+# 抽出結果の形式のバージョン（形式を変えたら上げて、古い退避ファイルを使わないようにする）
+_FORMAT_VERSION = 2
+
+
+class _OwnerCancelled(Exception):
+    """同じキーの抽出をしていた呼び出しがキャンセルされた（待っていた呼び出しは抽出し直す）"""
+
+
+class ExtractionCache:
+    """
+    抽出結果のLRUキャッシュ
+
+    - メモリに max_entries 件まで保持
+    - spill_dir を指定すると、メモリからあふれたエントリをディスクに退避して再利用
+    """
+
+    def __init__(self, max_entries: int = 2048, spill_dir: Optional[str] = None):
+        """
+        Args:
+            max_entries: メモリに保持する最大件数
+            spill_dir: あふれたエントリの退避先ディレクトリ（省略時は破棄）
+        """
+        self.max_entries = max_entries
+        self.spill_dir = spill_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._memory: 'OrderedDict[str, RawExtraction]' = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(body: bytes, encoding: Optional[str], style: str, engine: str) -> str:
+        """ボディのハッシュと抽出設定からキーを作成"""
+        return ExtractionCache.key_from_digest(ExtractionCache.new_digest(body), encoding, style, engine)
+
+    @staticmethod
+    def new_digest(body: bytes = b''):
+        """キー用のハッシュオブジェクト（ボディを分割して update() してもよい）"""
+        return hashlib.blake2b(body, digest_size=16)
+
+    @staticmethod
+    def key_from_digest(digest, encoding: Optional[str], style: str, engine: str) -> str:
+        """ボディ全体で更新したハッシュオブジェクトと抽出設定からキーを作成"""
+        digest = digest.copy()
+        digest.update(f"\0{encoding or ''}\0{style}\0{engine}\0{_FORMAT_VERSION}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, key + '.json')
+
+    def get(self, key: str) -> Optional[RawExtraction]:
+        """キャッシュされた抽出結果を取得（なければNone）"""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self._load_spilled(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            evicted = self._remember(key, value)
+            self.disk_hits += 1
+        self._spill(evicted)
+        return value
+
+    async def aget(self, key: str) -> Optional[RawExtraction]:
+        """get() の非同期版（メモリになければ退避ファイルをスレッドで読む）"""
+        if not self.spill_dir:
+            return self.get(key)
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, key)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[RawExtraction]]) -> RawExtraction:
+        """
+        キャッシュにあればその結果を、なければ compute() の結果を返して保存
+
+        同じキーの抽出が実行中なら、その完了を待って結果を共有する。
+        抽出していた呼び出しがキャンセルされた場合（締め切りなど）は、待っていた呼び出しが抽出し直す。
+        """
+        while True:
+            pending = self._pending.get(key)
+            if pending is None:
+                break
+            try:
+                value = await asyncio.shield(pending)
+            except _OwnerCancelled:
+                # 抽出していた呼び出しのキャンセルは受け継がずに抽出し直す
+                continue
+            self.coalesced += 1
+            return value
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # 退避ファイルを読んでいる間に来た呼び出しもまとめられるよう、先に登録する
+        self._pending[key] = future
+        try:
+            value = await self.aget(key)
+            if value is None:
+                value = await compute()
+        except asyncio.CancelledError:
+            # キャンセルは呼び出し元の都合なので、待っている呼び出しには伝えない（抽出し直させる）
+            future.set_exception(_OwnerCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 待っている呼び出しがない場合に警告が出ないよう取得済みにする
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+        with self._lock:
+            evicted = self._remember(key, value)
+        future.set_result(value)
+        if evicted:
+            await loop.run_in_executor(None, self._spill, evicted)
+        return value
+
+    def put(self, key: str, value: RawExtraction):
+        """抽出結果を保存"""
+        with self._lock:
+            evicted = self._remember(key, value)
+        self._spill(evicted)
+
+    def _remember(self, key: str, value: RawExtraction) -> List[Tuple[str, RawExtraction]]:
+        """メモリに保存し、あふれたエントリ（退避先がなければ空）を返す"""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        evicted = []
+        while len(self._memory) > self.max_entries:
+            item = self._memory.popitem(last=False)
+            if self.spill_dir:
+                evicted.append(item)
+        return evicted
+
+    def _load_spilled(self, key: str) -> Optional[RawExtraction]:
+        if not self.spill_dir:
+            return None
+        try:
+            with open(self._spill_path(key), 'r', encoding='utf-8') as f:
+                content, image_refs, meta_refs = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return content, [tuple(ref) for ref in image_refs], meta_refs
+
+    def _spill(self, evicted: List[Tuple[str, RawExtraction]]):
+        """あふれたエントリをディスクに書き出す（書き終えるまで読まれないよう一時ファイルから置き換える）"""
+        for key, value in evicted:
+            path = self._spill_path(key)
+            if os.path.exists(path):
+                continue
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(value, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            except OSError:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        """メモリとディスクのキャッシュを全て削除"""
+        with self._lock:
+            self._memory.clear()
+            if self.spill_dir:
+                for name in os.listdir(self.spill_dir):
+                    if name.endswith('.json'):
+                        os.remove(os.path.join(self.spill_dir, name))
+
+    def stats(self) -> Dict[str, float]:
+        """ヒット率などの統計情報（キャッシュサイズの調整用）"""
+        reused = self.hits + self.disk_hits + self.coalesced
+        lookups = reused + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'coalesced': self.coalesced,
+            'misses': self.misses,
+            'entries': len(self._memory),
+            'hit_rate': reused / lookups if lookups else 0.0,
+        }
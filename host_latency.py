@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+ホストごとのレイテンシの学習
+観測した応答時間の指数移動平均（EWMA）とばらつきからホストごとのタイムアウトを決め、
+直近のTTFBのパーセンタイルからヘッジリクエストを送るまでの待ち時間を決める
+"""
+
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from scheduler import host_key
+
+
+class _HostStats:
+    __slots__ = ('ewma', 'deviation', 'samples', 'ttfb')
+
+    def __init__(self, window: int):
+        self.ewma: Optional[float] = None
+        self.deviation = 0.0
+        self.samples = 0
+        self.ttfb: Deque[float] = deque(maxlen=window)
+
+
+class HostLatencyTracker:
+    """
+    ホストごとの応答時間を学習してタイムアウトとヘッジの待ち時間を返す
+
+    タイムアウトは TCP の再送タイマーと同じ考え方で「平均 + deviation_factor × 平均偏差」とし、
+    固定の1つの値ではなく、速いホストは短く・遅いホストは長く待つ。
+    """
+
+    def __init__(self, default_timeout: float = 15.0, min_timeout: float = 2.0, max_timeout: float = 30.0,
+                 alpha: float = 0.2, deviation_factor: float = 4.0, min_samples: int = 5,
+                 hedge_percentile: float = 95, window: int = 64):
+        """
+        Args:
+            default_timeout: 学習前（観測が min_samples 件未満）のタイムアウト（秒）
+            min_timeout: タイムアウトの下限（秒）
+            max_timeout: タイムアウトの上限（秒）
+            alpha: EWMAの重み（大きいほど直近の観測を重視）
+            deviation_factor: 平均偏差の何倍までを許容するか
+            min_samples: 学習した値を使い始める観測数
+            hedge_percentile: ヘッジリクエストを送るまでの待ち時間に使うTTFBのパーセンタイル
+            window: パーセンタイルの計算に使う直近のTTFBの件数
+        """
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.alpha = alpha
+        self.deviation_factor = deviation_factor
+        self.min_samples = min_samples
+        self.hedge_percentile = hedge_percentile
+        self.window = window
+        self._hosts: Dict[str, _HostStats] = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, url: str) -> _HostStats:
+        host = host_key(url)
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = _HostStats(self.window)
+        return stats
+
+    def observe(self, url: str, elapsed: float):
+        """リクエスト全体（ヘッダー + 本文）の所要時間を記録"""
+        with self._lock:
+            stats = self._stats(url)
+            if stats.ewma is None:
+                stats.ewma = elapsed
+                stats.deviation = elapsed / 2
+            else:
+                stats.deviation += self.alpha * (abs(elapsed - stats.ewma) - stats.deviation)
+                stats.ewma += self.alpha * (elapsed - stats.ewma)
+            stats.samples += 1
+
+    def observe_ttfb(self, url: str, ttfb: float):
+        """レスポンスヘッダーを受信するまでの時間を記録"""
+        with self._lock:
+            self._stats(url).ttfb.append(ttfb)
+
+    def observe_timeout(self, url: str, timeout: float):
+        """タイムアウトした場合、次回はそれより長く待つよう偏差を広げる（再送タイマーのバックオフと同様）"""
+        with self._lock:
+            stats = self._stats(url)
+            if stats.ewma is not None:
+                stats.deviation = max(stats.deviation, timeout / self.deviation_factor)
+
+    def _timeout(self, stats: Optional[_HostStats]) -> float:
+        if stats is None or stats.ewma is None or stats.samples < self.min_samples:
+            return self.default_timeout
+        timeout = stats.ewma + self.deviation_factor * stats.deviation
+        return min(self.max_timeout, max(self.min_timeout, timeout))
+
+    def timeout(self, url: str) -> float:
+        """ホストのタイムアウト（秒）"""
+        with self._lock:
+            return self._timeout(self._hosts.get(host_key(url)))
+
+    def hedge_delay(self, url: str) -> Optional[float]:
+        """ヘッジリクエストを送るまでの待ち時間（観測が足りなければNone）"""
+        with self._lock:
+            stats = self._hosts.get(host_key(url))
+            if stats is None or len(stats.ttfb) < self.min_samples:
+                return None
+            ordered = sorted(stats.ttfb)
+        index = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))
+        return ordered[index]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """ホストごとの平均・平均偏差・タイムアウト・観測数"""
+        with self._lock:
+            return {
+                host: {
+                    'ewma': stats.ewma or 0.0,
+                    'deviation': stats.deviation,
+                    'samples': stats.samples,
+                    'timeout': self._timeout(stats),
+                }
+                for host, stats in self._hosts.items()
+            }
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+ディスク上のHTTPレスポンスキャッシュ
+正規化したURLをキーにボディとヘッダーを保存し、ETag / Last-Modified による条件付きリクエストで再検証する
+Cache-Control の no-store（保存しない）・no-cache（毎回再検証）・max-age（この秒数は再検証しない）に従う
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Mapping, Optional, Tuple
+
+from url_utils import normalize_url
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Cache-Control ヘッダーをディレクティブ名（小文字）→ 値（なければNone）の辞書に変換"""
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or '').split(','):
+        name, sep, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip().strip('"') if sep else None
+    return directives
+
+
+def freshness(headers: Mapping[str, str]) -> Tuple[Optional[float], bool]:
+    """レスポンスヘッダーから (max-age（秒。指定がなければNone）, no-cache か) を取得"""
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    max_age = None
+    if directives.get('max-age') is not None:
+        try:
+            max_age = max(0.0, float(directives['max-age']))
+        except ValueError:
+            max_age = 0.0
+    return max_age, 'no-cache' in directives
+
+
+class CacheEntry:
+    """キャッシュされたレスポンス"""
+    __slots__ = ('key', 'url', 'body', 'charset', 'etag', 'last_modified', 'stored_at', 'max_age', 'no_cache')
+
+    def __init__(self, key: str, url: str, body: bytes, charset: Optional[str],
+                 etag: Optional[str], last_modified: Optional[str], stored_at: float,
+                 max_age: Optional[float] = None, no_cache: bool = False):
+        self.key = key
+        self.url = url
+        self.body = body
+        self.charset = charset
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+        self.max_age = max_age
+        self.no_cache = no_cache
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """再検証用のリクエストヘッダー"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """
+    サイズ上限付きのディスクキャッシュ（LRUで削除）
+
+    - ttl 秒以内のエントリはそのまま使用（ネットワークアクセスなし）
+    - レスポンスの Cache-Control に max-age があれば ttl の代わりにその秒数、no-cache なら毎回再検証、
+      no-store なら保存しない（保存済みのエントリも削除）
+    - 期限を過ぎたエントリは If-None-Match / If-Modified-Since で再検証し、304なら保存済みのボディを使用
+    - 合計サイズが max_size を超えたら最後に使われたのが古い順に削除
+    """
+
+    def __init__(self, cache_dir: str = '.http_cache', ttl: float = 3600,
+                 max_size: int = 512 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: キャッシュディレクトリ
+            ttl: 再検証なしで使用できる期間（秒）
+            max_size: キャッシュ全体の最大サイズ（バイト）
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index: 'OrderedDict[str, int]' = OrderedDict()   # キー → ボディサイズ（LRU順）
+        self._total_size = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    # --- インデックス ---
+
+    def _load_index(self):
+        """既存のキャッシュファイルから最終アクセス順のインデックスを作成"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.body'):
+                continue
+            key = name[:-5]
+            if not os.path.exists(self._meta_path(key)):
+                continue
+            st = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((st.st_mtime, key, st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_size += size
+
+    @staticmethod
+    def cache_key(url: str) -> str:
+        return hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest()
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.body')
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.meta')
+
+    def _remove(self, key: str):
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total_size -= size
+        for path in (self._body_path(key), self._meta_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        while self._total_size > self.max_size and self._index:
+            key = next(iter(self._index))
+            self._remove(key)
+            self.evictions += 1
+
+    # --- 読み書き ---
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """キャッシュからエントリを取得（なければNone）"""
+        key = self.cache_key(url)
+        with self._lock:
+            if key not in self._index:
+                return None
+            try:
+                with open(self._meta_path(key), 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                with open(self._body_path(key), 'rb') as f:
+                    body = f.read()
+            except (OSError, ValueError):
+                # 壊れたエントリは削除
+                self._remove(key)
+                return None
+            # 最終アクセス順を更新
+            self._index.move_to_end(key)
+            os.utime(self._body_path(key))
+        return CacheEntry(key, meta['url'], body, meta.get('charset'), meta.get('etag'),
+                          meta.get('last_modified'), meta['stored_at'], meta.get('max_age'),
+                          meta.get('no_cache', False))
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """再検証が不要か（max-age があればその秒数、なければTTL以内）"""
+        if entry.no_cache:
+            return False
+        lifetime = self.ttl if entry.max_age is None else entry.max_age
+        return time.time() - entry.stored_at < lifetime
+
+    def put(self, url: str, body: bytes, headers: Mapping[str, str], charset: Optional[str]):
+        """200レスポンスを保存（no-store なら保存せず、保存済みのエントリも削除）"""
+        key = self.cache_key(url)
+        if 'no-store' in parse_cache_control(headers.get('Cache-Control')):
+            with self._lock:
+                self._remove(key)
+            return
+        if len(body) > self.max_size:
+            return
+        max_age, no_cache = freshness(headers)
+        meta = {
+            'url': url,
+            'charset': charset,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'content_type': headers.get('Content-Type'),
+            'stored_at': time.time(),
+            'max_age': max_age,
+            'no_cache': no_cache,
+        }
+        with self._lock:
+            self._remove(key)
+            with open(self._body_path(key), 'wb') as f:
+                f.write(body)
+            with open(self._meta_path(key), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            self._index[key] = len(body)
+            self._total_size += len(body)
+            self.stores += 1
+            self._evict()
+
+    def refresh(self, entry: CacheEntry, headers: Mapping[str, str]):
+        """304レスポンスを受けてエントリの保存時刻（と検証子・Cache-Control）を更新"""
+        entry.stored_at = time.time()
+        if 'Cache-Control' in headers:
+            entry.max_age, entry.no_cache = freshness(headers)
+        entry.etag = headers.get('ETag') or entry.etag
+        entry.last_modified = headers.get('Last-Modified') or entry.last_modified
+        with self._lock:
+            self.revalidated += 1
+            if entry.key not in self._index:
+                return
+            try:
+                with open(self._meta_path(entry.key), 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                meta.update(stored_at=entry.stored_at, etag=entry.etag, last_modified=entry.last_modified,
+                            max_age=entry.max_age, no_cache=entry.no_cache)
+                with open(self._meta_path(entry.key), 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, ensure_ascii=False)
+            except (OSError, ValueError):
+                self._remove(entry.key)
+
+    def clear(self):
+        """キャッシュを全て削除"""
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+
+    # --- 非同期ラッパー（ファイルI/Oをスレッドで実行） ---
+
+    async def aget(self, url: str) -> Optional[CacheEntry]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, url)
+
+    async def aput(self, url: str, body: bytes, headers: Mapping[str, str], charset: Optional[str]):
+        # ヘッダーはレスポンス解放後も使えるよう必要なものだけコピー
+        headers = {name: headers[name] for name in ('Cache-Control', 'ETag', 'Last-Modified', 'Content-Type')
+                   if name in headers}
+        await asyncio.get_running_loop().run_in_executor(None, self.put, url, body, headers, charset)
+
+    async def arefresh(self, entry: CacheEntry, headers: Mapping[str, str]):
+        headers = {name: headers[name] for name in ('Cache-Control', 'ETag', 'Last-Modified') if name in headers}
+        await asyncio.get_running_loop().run_in_executor(None, self.refresh, entry, headers)
+
+    # --- 統計 ---
+
+    @property
+    def size(self) -> int:
+        """キャッシュの合計サイズ（バイト）"""
+        return self._total_size
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット・ミス・再検証などの統計情報"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'entries': len(self._index),
+            'size': self._total_size,
+        }
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+画像ダウンロード
+収集した画像URLを共有セッションで並列にダウンロードする
+（ストリーミングでディスクに書き込み、内容のハッシュで重複を除去し、前回の実行でダウンロード済みの画像は再取得しない）
+
+    images/
+    ├── 3f2a....jpg        # ファイル名は内容のSHA-256
+    ├── 9bc1....png
+    └── manifest.json      # URL → ファイル名・サイズ・Content-Type
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import uuid
+from functools import partial
+from typing import Dict, Iterable, List, Optional
+
+import aiohttp
+
+from scheduler import HostScheduler
+from scraper_session import ScraperSession
+from url_utils import normalize_url
+
+MANIFEST_FILENAME = "manifest.json"
+CHUNK_SIZE = 64 * 1024
+# ディスクへの書き込み単位（これだけ溜まったらまとめてスレッドプールで書き込む）
+WRITE_SIZE = 1024 * 1024
+
+# ダウンロードする画像のContent-Typeと拡張子
+DEFAULT_IMAGE_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/avif': '.avif',
+    'image/svg+xml': '.svg',
+    'image/bmp': '.bmp',
+    'image/x-icon': '.ico',
+    'image/vnd.microsoft.icon': '.ico',
+}
+
+# ダウンロード結果の状態
+DOWNLOADED = 'downloaded'        # 新しくダウンロード
+DUPLICATE = 'duplicate'          # 内容が既存のファイルと同じ（ファイルは共有）
+SKIPPED = 'skipped'              # 前回の実行でダウンロード済み
+TOO_LARGE = 'too_large'          # サイズ上限を超えたため中止
+TOO_SMALL = 'too_small'          # サイズ下限未満
+REJECTED_TYPE = 'rejected_type'  # 対象外のContent-Type
+HTTP_ERROR = 'http_error'        # 200以外のHTTPステータス
+TIMEOUT = 'timeout'
+ERROR = 'error'
+
+
+class ImageDownload:
+    """1枚分のダウンロード結果"""
+    __slots__ = ('url', 'status', 'file', 'size', 'content_type', 'sha256', 'error')
+
+    def __init__(self, url: str, status: str, file: Optional[str] = None, size: int = 0,
+                 content_type: Optional[str] = None, sha256: Optional[str] = None, error: Optional[str] = None):
+        self.url = url
+        self.status = status
+        self.file = file
+        self.size = size
+        self.content_type = content_type
+        self.sha256 = sha256
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """ファイルがディスクにあるか"""
+        return self.status in (DOWNLOADED, DUPLICATE, SKIPPED)
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"ImageDownload(url={self.url!r}, status={self.status}, file={self.file!r}, size={self.size})"
+
+
+class _Rejected(Exception):
+    """フィルターで除外（状態付き）"""
+
+    def __init__(self, status: str, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ImageDownloader:
+    """
+    画像URLを並列ダウンロードする
+
+    使い方:
+        downloader = ImageDownloader('images', max_bytes=2 * 1024 * 1024)
+        async with ScraperSession() as session:
+            downloads = await downloader.download(image_urls, session=session)
+        print(downloader.stats())
+    """
+
+    def __init__(self, output_dir: str = 'images', scheduler: Optional[HostScheduler] = None,
+                 max_bytes: Optional[int] = 10 * 1024 * 1024, min_bytes: int = 0,
+                 content_types: Optional[Iterable[str]] = None, timeout: float = 30,
+                 headers: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            output_dir: 保存先ディレクトリ
+            scheduler: 全体・ホストごとの同時実行数を制御するHostScheduler（省略時は全体16・ホストごと4）
+            max_bytes: 1枚の最大サイズ（超えたら中止して保存しない。Noneなら無制限）
+            min_bytes: 1枚の最小サイズ（アイコンなどの小さな画像を除外）
+            content_types: ダウンロードするContent-Type（省略時は DEFAULT_IMAGE_TYPES）
+            timeout: 1枚のタイムアウト（秒）
+            headers: リクエストヘッダー
+        """
+        self.output_dir = output_dir
+        self.scheduler = scheduler or HostScheduler(max_concurrency=16, per_host_limit=4)
+        self.max_bytes = max_bytes
+        self.min_bytes = min_bytes
+        self.content_types = frozenset(content_types) if content_types is not None else frozenset(DEFAULT_IMAGE_TYPES)
+        self.timeout = timeout
+        self.headers = headers or {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'image/avif,image/webp,image/*,*/*;q=0.8',
+        }
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.counts: Dict[str, int] = {}
+        self.bytes_downloaded = 0
+        self._file_lock = threading.Lock()
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+        # 内容のハッシュ → ファイル名（重複判定用）
+        self._by_hash = {entry['sha256']: entry['file'] for entry in self.manifest.values()}
+
+    # --- マニフェスト ---
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        """前回までのマニフェストを読み込む（ファイルが消えているエントリは除外）"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {url: entry for url, entry in manifest.items()
+                if os.path.exists(os.path.join(self.output_dir, entry['file']))}
+
+    def save_manifest(self):
+        """マニフェストを書き出す"""
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    # --- ダウンロード ---
+
+    def _extension(self, content_type: str) -> str:
+        return DEFAULT_IMAGE_TYPES.get(content_type, '.img')
+
+    def _place(self, tmp_path: str, file_name: str) -> bool:
+        """一時ファイルを file_name として保存（同じ内容のファイルが既にあれば一時ファイルを削除して False）"""
+        path = os.path.join(self.output_dir, file_name)
+        with self._file_lock:
+            if os.path.exists(path):
+                os.remove(tmp_path)
+                return False
+            os.replace(tmp_path, path)
+            return True
+
+    @staticmethod
+    def _write(f, chunks: List[bytes], close: bool = False):
+        f.write(b''.join(chunks))
+        if close:
+            f.close()
+
+    @staticmethod
+    def _discard(f, tmp_path: str):
+        """書きかけの一時ファイルを閉じて削除"""
+        if f is not None and not f.closed:
+            f.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    async def _fetch(self, http_session: aiohttp.ClientSession, url: str) -> ImageDownload:
+        """
+        1枚をダウンロード（一時ファイルにストリーミングで書き込み、ハッシュ名に変更）
+
+        ファイルの書き込み・名前の変更はスレッドプールで実行し、イベントループを止めない。
+        """
+        key = normalize_url(url)
+        entry = self.manifest.get(key)
+        if entry is not None:
+            return ImageDownload(url, SKIPPED, entry['file'], entry['size'], entry['content_type'], entry['sha256'])
+
+        loop = asyncio.get_running_loop()
+        tmp_path = os.path.join(self.output_dir, f".{uuid.uuid4().hex}.part")
+        f = None
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            async with http_session.get(url, headers=self.headers, timeout=timeout) as response:
+                if response.status != 200:
+                    return ImageDownload(url, HTTP_ERROR, error=f"HTTP {response.status}")
+                content_type = response.content_type
+                if content_type not in self.content_types:
+                    raise _Rejected(REJECTED_TYPE, f"Unsupported content type ({content_type})")
+                # Content-Lengthで判定できる場合は本文を読まずに除外
+                length = response.content_length
+                if length is not None:
+                    if self.max_bytes is not None and length > self.max_bytes:
+                        raise _Rejected(TOO_LARGE, f"{length} bytes")
+                    if length < self.min_bytes:
+                        raise _Rejected(TOO_SMALL, f"{length} bytes")
+
+                digest = hashlib.sha256()
+                size = 0
+                pending: List[bytes] = []
+                pending_size = 0
+                f = await loop.run_in_executor(None, open, tmp_path, 'wb')
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    if self.max_bytes is not None and size > self.max_bytes:
+                        raise _Rejected(TOO_LARGE, f"> {self.max_bytes} bytes")
+                    digest.update(chunk)
+                    pending.append(chunk)
+                    pending_size += len(chunk)
+                    if pending_size >= WRITE_SIZE:
+                        await loop.run_in_executor(None, self._write, f, pending)
+                        pending = []
+                        pending_size = 0
+                await loop.run_in_executor(None, partial(self._write, f, pending, close=True))
+            if size < self.min_bytes:
+                raise _Rejected(TOO_SMALL, f"{size} bytes")
+
+            sha256 = digest.hexdigest()
+            # 同じ内容の画像が同時に届いても同じファイル名になるよう、先に名前を決めておく
+            file_name = self._by_hash.setdefault(sha256, sha256 + self._extension(content_type))
+            if await loop.run_in_executor(None, self._place, tmp_path, file_name):
+                status = DOWNLOADED
+                self.bytes_downloaded += size
+            else:
+                # 同じ内容の画像が保存済み
+                status = DUPLICATE
+
+            self.manifest[key] = {
+                'url': url,
+                'file': file_name,
+                'size': size,
+                'content_type': content_type,
+                'sha256': sha256,
+            }
+            return ImageDownload(url, status, file_name, size, content_type, sha256)
+
+        except _Rejected as e:
+            return ImageDownload(url, e.status, error=str(e))
+        except asyncio.TimeoutError:
+            return ImageDownload(url, TIMEOUT, error="Timeout")
+        except Exception as e:
+            return ImageDownload(url, ERROR, error=str(e))
+        finally:
+            await asyncio.shield(loop.run_in_executor(None, self._discard, f, tmp_path))
+
+    @staticmethod
+    def _failed(url: str, error: BaseException) -> ImageDownload:
+        """_fetch() 自体が例外を送出した画像の結果（残りの画像はそのままダウンロードを続ける）"""
+        return ImageDownload(url, ERROR, error=str(error))
+
+    async def download(self, urls: Iterable[str], session: Optional[ScraperSession] = None) -> List[ImageDownload]:
+        """
+        画像URLをダウンロードしてマニフェストを保存
+
+        Args:
+            urls: 画像URL（正規化して重複を除いてから取得）
+            session: 共有するScraperSession（省略時は一時的に作成）
+
+        Returns:
+            入力順（重複を除いた順）のダウンロード結果
+        """
+        unique: Dict[str, str] = {}
+        for url in urls:
+            unique.setdefault(normalize_url(url), url)
+        targets = list(unique.values())
+
+        scraper_session = session
+        owns_session = scraper_session is None
+        if owns_session:
+            scraper_session = ScraperSession()
+
+        results: List[Optional[ImageDownload]] = [None] * len(targets)
+        try:
+            http_session = await scraper_session.get()
+            async for index, result in self.scheduler.iter_run(targets, partial(self._fetch, http_session),
+                                                              on_error=self._failed):
+                results[index] = result
+                self.counts[result.status] = self.counts.get(result.status, 0) + 1
+        finally:
+            if owns_session:
+                await scraper_session.close()
+            await asyncio.get_running_loop().run_in_executor(None, self.save_manifest)
+
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        """状態ごとの件数とダウンロードしたバイト数"""
+        return {**self.counts, 'bytes': self.bytes_downloaded, 'files': len(self._by_hash)}
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+処理段階ごとの計測
+検索・DNS・接続・最初のバイトまで（TTFB）・本文のダウンロード・HTML解析・テキスト変換・保存の時間を
+URL・クエリごとのイベントとして記録し、段階ごとのヒストグラムに集計する
+（ネットワークの段階は aiohttp の TraceConfig で計測）
+
+使い方:
+    metrics = ScrapeMetrics()
+    metrics.add_listener(lambda event: print(event.to_dict()))   # イベントを1件ずつ受け取る
+    scraper = FastWebScraper(metrics=metrics)
+    scraper.scrape("Python 非同期")
+    print(metrics.summary())                                      # 段階ごとの件数・平均・p50/p95/p99
+"""
+
+import bisect
+import logging
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# 計測する段階
+PHASE_SEARCH = 'search'       # 検索結果ページの取得・解析（クエリ単位）
+PHASE_DNS = 'dns'             # DNSの名前解決
+PHASE_CONNECT = 'connect'     # TCP/TLS接続（DNSを除く）
+PHASE_TTFB = 'ttfb'           # 接続の確保からレスポンスヘッダーの受信まで
+PHASE_DOWNLOAD = 'download'   # 本文の受信
+PHASE_PARSE = 'parse'         # HTMLのパース（BeautifulSoup / lxml）
+PHASE_CONVERT = 'convert'     # テキスト変換・画像参照の抽出（html2text / ツリーの走査）
+PHASE_PAGE = 'page'           # 1ページ全体（取得から抽出まで）
+PHASE_WRITE = 'write'         # 結果の保存（クエリ単位）
+PHASE_QUERY = 'query'         # 1クエリ全体（検索から保存まで）
+
+# カウンター（ScrapeMetrics.increment() で加算）
+COUNTER_PAGES = 'pages'                        # 取得したページ数（status）
+COUNTER_BYTES = 'bytes_downloaded'             # 受信した本文のバイト数
+COUNTER_ERRORS = 'errors'                      # エラー数（type: http / timeout / deadline / content_type / parse / network / cancelled / internal / search, status）
+COUNTER_SEARCHES = 'searches'                  # 検索の実行回数（engine, cached）
+
+# カウンターごとのラベル名（increment() で省略したラベルは空文字列にして、系列のラベルの組を揃える）
+COUNTER_LABELS: Dict[str, Tuple[str, ...]] = {
+    COUNTER_PAGES: ('status',),
+    COUNTER_BYTES: (),
+    COUNTER_ERRORS: ('type', 'status'),
+    COUNTER_SEARCHES: ('engine', 'cached'),
+}
+
+# ラベルの組（(名前, 値) をソートしたタプル）
+Labels = Tuple[Tuple[str, str], ...]
+
+# ヒストグラムのバケット境界（秒）
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class MetricEvent:
+    """1つの段階の計測結果"""
+    __slots__ = ('phase', 'duration', 'url', 'query', 'timestamp', 'attrs')
+
+    def __init__(self, phase: str, duration: float, url: Optional[str] = None, query: Optional[str] = None,
+                 timestamp: Optional[float] = None, attrs: Optional[Dict] = None):
+        self.phase = phase
+        self.duration = duration
+        self.url = url
+        self.query = query
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.attrs = attrs or {}
+
+    def to_dict(self) -> Dict:
+        return {
+            'phase': self.phase,
+            'duration': self.duration,
+            'url': self.url,
+            'query': self.query,
+            'timestamp': self.timestamp,
+            **self.attrs,
+        }
+
+    def __repr__(self) -> str:
+        target = self.url or self.query
+        return f"MetricEvent({self.phase}, {self.duration * 1000:.1f}ms, {target!r})"
+
+
+class Histogram:
+    """固定バケットのヒストグラム（件数・合計・最小・最大とパーセンタイルの推定値）"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # 最後は上限なし
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def cumulative(self) -> List[tuple]:
+        """[(バケット上限, その上限以下の件数)]（最後の上限は inf）"""
+        total = 0
+        result = []
+        for bound, count in zip((*self.buckets, float('inf')), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def percentile(self, p: float) -> float:
+        """パーセンタイルの推定値（バケット内は線形補間し、観測した最小・最大の範囲に収める）"""
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100
+        seen = 0
+        lower = 0.0
+        for i, count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if count and seen + count >= target:
+                lower = max(lower, self.min)
+                value = lower + (upper - lower) * (target - seen) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+            lower = upper
+        return self.max
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.mean,
+            'min': self.min or 0.0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max or 0.0,
+        }
+
+
+class ScrapeMetrics:
+    """
+    段階ごとの計測結果を受け取り、リスナーへの通知とヒストグラムへの集計を行う
+    （ページ数・バイト数・エラー数などはラベル付きのカウンターで集計）
+
+    record() / increment() はイベントループ・出力先のバックグラウンドスレッドのどちらからでも呼び出せる。
+    リスナーは record() を呼び出したスレッドで同期的に呼ばれるため、重い処理は避けること。
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets: ヒストグラムのバケット境界（秒）
+        """
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._listeners: List[Callable[[MetricEvent], None]] = []
+        self._lock = threading.Lock()
+
+    # --- イベント ---
+
+    def add_listener(self, listener: Callable[[MetricEvent], None]):
+        """イベントを受け取る関数を登録"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[MetricEvent], None]):
+        self._listeners.remove(listener)
+
+    def record(self, phase: str, duration: float, url: Optional[str] = None,
+               query: Optional[str] = None, **attrs) -> MetricEvent:
+        """段階の所要時間を記録"""
+        event = MetricEvent(phase, duration, url, query, attrs=attrs)
+        with self._lock:
+            histogram = self._histograms.get(phase)
+            if histogram is None:
+                histogram = self._histograms[phase] = Histogram(self.buckets)
+            histogram.observe(duration)
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("メトリクスのリスナーでエラーが発生しました")
+        return event
+
+    def record_timings(self, timings: Dict[str, float], url: Optional[str] = None, query: Optional[str] = None):
+        """{段階: 秒} をまとめて記録（抽出処理のワーカーから返された計測結果など）"""
+        for phase, duration in timings.items():
+            self.record(phase, duration, url=url, query=query)
+
+    def timer(self, phase: str, url: Optional[str] = None, query: Optional[str] = None, **attrs) -> '_Timer':
+        """
+        with ブロックの所要時間を記録するコンテキストマネージャ
+
+        使用例:
+            with metrics.timer(PHASE_WRITE, query=query):
+                writer.close()
+        """
+        return _Timer(self, phase, url, query, attrs)
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """
+        カウンターを加算（COUNTER_LABELS にあるラベルを省略した場合は空文字列）
+
+        使用例:
+            metrics.increment(COUNTER_ERRORS, type='http', status=503)
+            metrics.increment(COUNTER_ERRORS, type='timeout')   # status="" として記録
+        """
+        for label in COUNTER_LABELS.get(name, ()):
+            if labels.get(label) is None:
+                labels[label] = ''
+        key = tuple(sorted((label, str(label_value)) for label, label_value in labels.items()))
+        with self._lock:
+            series = self._counters.get(name)
+            if series is None:
+                series = self._counters[name] = {}
+            series[key] = series.get(key, 0) + value
+
+    # --- 集計 ---
+
+    def counters(self) -> Dict[str, Dict[Labels, float]]:
+        """{カウンター名: {ラベルの組: 値}}"""
+        with self._lock:
+            return {name: dict(series) for name, series in self._counters.items()}
+
+    def counter(self, name: str, **labels) -> float:
+        """カウンターの値（labels を指定すると、そのラベルを含む系列の合計）"""
+        wanted = {(label, str(value)) for label, value in labels.items()}
+        with self._lock:
+            return sum(value for key, value in self._counters.get(name, {}).items() if wanted <= set(key))
+
+    def histogram(self, phase: str) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get(phase)
+
+    def histograms(self) -> Dict[str, Histogram]:
+        """段階ごとのヒストグラム"""
+        with self._lock:
+            return dict(self._histograms)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """段階ごとの {'count', 'sum', 'mean', 'min', 'p50', 'p95', 'p99', 'max'}"""
+        with self._lock:
+            return {phase: histogram.to_dict() for phase, histogram in self._histograms.items()}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    # --- aiohttp ---
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """
+        DNS・接続・TTFBを記録する aiohttp の TraceConfig
+
+        事前接続のリクエスト（trace_request_ctx が {'prewarm': True}）は記録しない。
+
+        使用例:
+            session = ScraperSession(trace_configs=[metrics.trace_config()])
+        """
+        trace_config = aiohttp.TraceConfig()
+        clock = time.perf_counter
+
+        async def on_request_start(session, ctx: SimpleNamespace, params):
+            request_ctx = ctx.trace_request_ctx
+            ctx.skip = bool(request_ctx and request_ctx.get('prewarm'))
+            ctx.url = str(params.url)
+            ctx.start = ctx.ready = clock()
+            ctx.dns = 0.0
+            ctx.reused = False
+
+        async def on_dns_start(session, ctx, params):
+            ctx.dns_start = clock()
+
+        async def on_dns_end(session, ctx, params):
+            ctx.dns = clock() - ctx.dns_start
+            if not ctx.skip:
+                self.record(PHASE_DNS, ctx.dns, url=ctx.url, host=params.host)
+
+        async def on_connection_create_start(session, ctx, params):
+            ctx.connect_start = clock()
+
+        async def on_connection_create_end(session, ctx, params):
+            ctx.ready = clock()
+            if not ctx.skip:
+                self.record(PHASE_CONNECT, max(0.0, ctx.ready - ctx.connect_start - ctx.dns), url=ctx.url)
+
+        async def on_connection_reuseconn(session, ctx, params):
+            ctx.ready = clock()
+            ctx.reused = True
+
+        async def on_request_end(session, ctx, params):
+            # レスポンスヘッダーを受信した時点で呼ばれる
+            if not ctx.skip:
+                self.record(PHASE_TTFB, clock() - ctx.ready, url=ctx.url,
+                            status=params.response.status, reused=ctx.reused)
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_dns_resolvehost_start.append(on_dns_start)
+        trace_config.on_dns_resolvehost_end.append(on_dns_end)
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+
+class _Timer:
+    __slots__ = ('metrics', 'phase', 'url', 'query', 'attrs', 'start')
+
+    def __init__(self, metrics: ScrapeMetrics, phase: str, url: Optional[str], query: Optional[str], attrs: Dict):
+        self.metrics = metrics
+        self.phase = phase
+        self.url = url
+        self.query = query
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(self.phase, time.perf_counter() - self.start, self.url, self.query, **self.attrs)
+
+
+def format_summary(summary: Dict[str, Dict[str, float]], phases: Optional[Iterable[str]] = None) -> str:
+    """summary() の結果を表形式の文字列にする（ミリ秒表示）"""
+    lines = [f"{'段階':<10}{'件数':>8}{'平均':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'最大':>10}"]
+    for phase in (phases or summary):
+        stats = summary.get(phase)
+        if not stats:
+            continue
+        lines.append(
+            f"{phase:<10}{stats['count']:>8}"
+            + ''.join(f"{stats[key] * 1000:>8.1f}ms" for key in ('mean', 'p50', 'p95', 'p99', 'max'))
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Prometheus形式のメトリクスエンドポイント
+常駐するスクレイパーのプロセスで ScrapeMetrics の集計結果を /metrics から公開する
+（ページ数・受信バイト数・種類別のエラー数・キャッシュのヒット数・実行中のリクエスト数・
+イベントループの遅延・段階ごとの所要時間のヒストグラム）
+
+使い方:
+    metrics = ScrapeMetrics()
+    session = ScraperSession(trace_configs=[metrics.trace_config()])
+    scraper = FastWebScraper(session=session, metrics=metrics)
+
+    server = MetricsServer(metrics, port=9108)
+    server.watch_scraper(scraper)
+    session.run(server.start())      # スクレイピングと同じイベントループで起動（ループの遅延を計測）
+
+    # scrape_config:
+    #   - job_name: scraper
+    #     static_configs: [{targets: ['localhost:9108']}]
+"""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiohttp import web
+
+from metrics import (ScrapeMetrics, Histogram, COUNTER_PAGES, COUNTER_BYTES, COUNTER_ERRORS,
+                     COUNTER_SEARCHES)
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# カウンターの説明（HELP行）
+_COUNTER_HELP = {
+    COUNTER_PAGES: "Pages scraped, by result status.",
+    COUNTER_BYTES: "Response body bytes downloaded.",
+    COUNTER_ERRORS: "Errors by type (http, timeout, deadline, content_type, parse, network, cancelled, search) and HTTP status.",
+    COUNTER_SEARCHES: "Search engine queries, by engine and cache use.",
+}
+
+# イベントループの遅延のバケット境界（秒）
+_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# (サンプル名の接尾辞, ラベル, 値)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + '}'
+
+
+class _Exposition:
+    """Prometheusのテキスト形式を組み立てる"""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str, samples: Iterable[Sample]):
+        full_name = f"{self.namespace}_{name}"
+        self.lines.append(f"# HELP {full_name} {help_text}")
+        self.lines.append(f"# TYPE {full_name} {kind}")
+        for suffix, labels, value in samples:
+            self.lines.append(f"{full_name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+
+    def histogram(self, name: str, help_text: str, histograms: Iterable[Tuple[Dict[str, str], Histogram]]):
+        samples: List[Sample] = []
+        for labels, histogram in histograms:
+            for bound, count in histogram.cumulative():
+                samples.append(('_bucket', {**labels, 'le': _format_value(bound)}, count))
+            samples.append(('_sum', labels, histogram.sum))
+            samples.append(('_count', labels, histogram.count))
+        self.family(name, 'histogram', help_text, samples)
+
+    def text(self) -> str:
+        return '\n'.join(self.lines) + '\n'
+
+
+class MetricsServer:
+    """
+    /metrics でPrometheus形式のメトリクスを返すaiohttpサーバー
+
+    ScrapeMetrics のカウンターとヒストグラムに加え、watch_scraper() で登録したスクレイパーの
+    HostScheduler（実行中・待機中の数）とキャッシュ（ヒット・ミス数）、
+    サーバーを起動したイベントループの遅延を出力する。
+    """
+
+    def __init__(self, metrics: ScrapeMetrics, host: str = '127.0.0.1', port: int = 9108,
+                 namespace: str = 'scraper', lag_interval: float = 0.5):
+        """
+        Args:
+            metrics: 出力するScrapeMetrics
+            host: 待ち受けるアドレス
+            port: 待ち受けるポート（0なら空いているポート）
+            namespace: メトリクス名の接頭辞
+            lag_interval: イベントループの遅延を計測する間隔（秒）
+        """
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.namespace = namespace
+        self.lag_interval = lag_interval
+        self.loop_lag = Histogram(_LAG_BUCKETS)
+        self.last_loop_lag = 0.0
+        self.started_at = time.time()
+        self._schedulers: Dict[str, object] = {}
+        self._caches: Dict[Tuple[str, str], object] = {}
+        self._fetchers: Dict[str, object] = {}
+        self._prewarmers: Dict[str, object] = {}
+        self._search_routers: Dict[str, object] = {}
+        self._collectors: List[Callable[[_Exposition], None]] = []
+        self._runner: Optional[web.AppRunner] = None
+        self._lag_task: Optional[asyncio.Task] = None
+
+    # --- 監視対象 ---
+
+    def watch_scraper(self, scraper, name: Optional[str] = None):
+        """
+        スクレイパーのHostScheduler・PageFetcher（再試行・ヘッジの回数）・事前接続・検索エンジンのヘルス・
+        HTTP/検索/抽出/名前解決キャッシュを監視対象に追加
+        """
+        name = name or type(scraper).__name__
+        self.watch_scheduler(scraper.scheduler, name)
+        self._fetchers[name] = scraper.fetcher
+        self._search_routers[name] = scraper.search_router
+        if scraper.fetcher.prewarm is not None:
+            self._prewarmers[name] = scraper.fetcher.prewarm
+        dns_cache = scraper.dns_cache
+        if dns_cache is None and scraper.session is not None:
+            dns_cache = scraper.session.dns_cache
+        for kind, cache in (('http', scraper.fetcher.cache), ('search', scraper.search_cache),
+                            ('extraction', scraper.extraction_cache), ('dns', dns_cache)):
+            if cache is not None:
+                self.watch_cache(cache, kind, name)
+
+    def watch_scheduler(self, scheduler, name: str = 'default'):
+        """HostSchedulerの実行中・待機中の数を出力"""
+        self._schedulers[name] = scheduler
+
+    def watch_cache(self, cache, kind: str, name: str = 'default'):
+        """
+        hits / misses 属性を持つキャッシュのヒット・ミス数を出力（disk_hits があればヒット数に含める）
+
+        (kind, name) ごとに登録するため、複数のスクレイパーの同じ種類のキャッシュは
+        scraper ラベルで区別して出力する。
+        """
+        self._caches[(kind, name)] = cache
+
+    def add_collector(self, collector: Callable[[_Exposition], None]):
+        """出力時に呼ばれる関数を追加（collector(exposition) で exposition.family(...) を呼び出す）"""
+        self._collectors.append(collector)
+
+    # --- 出力 ---
+
+    def render(self) -> str:
+        """Prometheusのテキスト形式で全メトリクスを出力"""
+        out = _Exposition(self.namespace)
+
+        counters = self.metrics.counters()
+        for name, series in sorted(counters.items()):
+            out.family(f"{name}_total", 'counter', _COUNTER_HELP.get(name, f"Counter {name}."),
+                       [('', dict(labels), value) for labels, value in sorted(series.items())])
+
+        histograms = self.metrics.histograms()
+        if histograms:
+            out.histogram('phase_duration_seconds',
+                          "Time spent in each scraping phase (search, dns, connect, ttfb, download, parse, convert, ...).",
+                          [({'phase': phase}, histogram) for phase, histogram in sorted(histograms.items())])
+
+        if self._schedulers:
+            stats = {name: scheduler.stats() for name, scheduler in self._schedulers.items()}
+            out.family('in_flight_requests', 'gauge', "Requests currently running.",
+                       [('', {'scheduler': name}, s['in_flight']) for name, s in stats.items()])
+            out.family('queued_requests', 'gauge', "Requests waiting for a concurrency slot.",
+                       [('', {'scheduler': name}, s['queued']) for name, s in stats.items()])
+            out.family('active_hosts', 'gauge', "Hosts with queued or running requests.",
+                       [('', {'scheduler': name}, s['active_hosts']) for name, s in stats.items()])
+
+        if self._fetchers:
+            stats = {name: fetcher.stats() for name, fetcher in self._fetchers.items()}
+            out.family('retries_total', 'counter', "Requests retried after a transient failure.",
+                       [('', {'scraper': name}, s['retries']) for name, s in stats.items()])
+            out.family('hedged_requests_total', 'counter', "Hedge requests sent after the host's p95 TTFB.",
+                       [('', {'scraper': name}, s['hedged']) for name, s in stats.items()])
+            out.family('hedge_wins_total', 'counter', "Hedge requests that answered before the original.",
+                       [('', {'scraper': name}, s['hedge_wins']) for name, s in stats.items()])
+
+        if self._prewarmers:
+            stats = {name: prewarm.stats() for name, prewarm in self._prewarmers.items()}
+            out.family('prewarm_connections_total', 'counter',
+                       "Connections opened ahead of the page request (warmed, failed) and later reused (used).",
+                       [('', {'scraper': name, 'result': result}, s[result])
+                        for name, s in stats.items() for result in ('warmed', 'failed', 'used')])
+            out.family('prewarm_saved_seconds_total', 'counter',
+                       "DNS and connection setup time taken off the page request path by pre-warming.",
+                       [('', {'scraper': name}, s['saved_time']) for name, s in stats.items()])
+
+        if self._search_routers:
+            up: List[Sample] = []
+            failures: List[Sample] = []
+            for name, router in self._search_routers.items():
+                for provider, health in router.stats().items():
+                    labels = {'scraper': name, 'provider': provider}
+                    up.append(('', labels, 1 if health['available'] else 0))
+                    failures.append(('', labels, health['failures']))
+            out.family('search_provider_up', 'gauge',
+                       "1 if the search provider is used, 0 while it is skipped after repeated failures or rate limiting.", up)
+            out.family('search_provider_failures_total', 'counter', "Failed queries by search provider.", failures)
+
+        if self._caches:
+            hits: List[Sample] = []
+            misses: List[Sample] = []
+            for (kind, name), cache in sorted(self._caches.items()):
+                labels = {'cache': kind, 'scraper': name}
+                hits.append(('', labels, cache.hits + getattr(cache, 'disk_hits', 0)))
+                misses.append(('', labels, cache.misses))
+            out.family('cache_hits_total', 'counter', "Cache hits by cache.", hits)
+            out.family('cache_misses_total', 'counter', "Cache misses by cache.", misses)
+
+        if self._lag_task is not None:
+            out.family('event_loop_lag_last_seconds', 'gauge', "Most recent event loop scheduling delay.",
+                       [('', {}, self.last_loop_lag)])
+            out.histogram('event_loop_lag_seconds', "Event loop scheduling delay.", [({}, self.loop_lag)])
+
+        out.family('start_time_seconds', 'gauge', "Unix time the metrics server started.",
+                   [('', {}, self.started_at)])
+
+        for collector in self._collectors:
+            collector(out)
+        return out.text()
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+    # --- イベントループの遅延 ---
+
+    async def _measure_loop_lag(self):
+        """一定間隔で sleep し、予定より遅れて再開した時間をイベントループの遅延として記録"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            lag = max(0.0, loop.time() - expected)
+            self.last_loop_lag = lag
+            self.loop_lag.observe(lag)
+
+    # --- 起動・停止 ---
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        return app
+
+    async def start(self) -> int:
+        """サーバーとループ遅延の計測を現在のイベントループで開始し、待ち受けポートを返す"""
+        if self._runner is not None:
+            return self.port
+        runner = web.AppRunner(self.create_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, self.port)
+        await site.start()
+        self._runner = runner
+        # port=0 の場合は割り当てられたポート
+        self.port = runner.addresses[0][1]
+        self._lag_task = asyncio.create_task(self._measure_loop_lag())
+        logger.info(f"📈 メトリクスを公開しました: http://{self.host}:{self.port}/metrics")
+        return self.port
+
+    async def stop(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
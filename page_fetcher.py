@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+ページ取得処理
+FastWebScraper / FastWebScraperV2 共通のHTTP取得（レスポンスキャッシュ・サイズ上限対応）
+"""
+
+import asyncio
+import time
+from typing import Dict, Iterable, Optional, Protocol, Tuple
+
+import aiohttp
+
+from deadline import Deadline
+from host_latency import HostLatencyTracker
+from prewarm import ConnectionPrewarmer
+from http_cache import CacheEntry, HttpCache
+from retry_policy import RetryPolicy, parse_retry_after
+
+
+class HttpStatusError(Exception):
+    """200以外のHTTPステータス"""
+
+    def __init__(self, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class ContentTypeRejected(Exception):
+    """HTML以外のContent-Type（本文は読まずに中止）"""
+
+    def __init__(self, content_type: str):
+        super().__init__(f"Unsupported content type ({content_type})")
+        self.content_type = content_type
+
+
+# 1ページあたりの最大ダウンロードサイズ（展開後のバイト数）
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+# 本文を読み込むContent-Type
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+# 本文を読み込む単位
+CHUNK_SIZE = 64 * 1024
+
+
+class BodySink(Protocol):
+    """本文のチャンクを受信した順に受け取るオブジェクト（extraction.StreamingExtractor など）"""
+
+    def start(self, encoding: Optional[str]): ...
+
+    def feed(self, chunk: bytes): ...
+
+
+class FetchedPage:
+    """
+    取得したページ（sink を指定して取得した場合、body はHTTPキャッシュへの保存時のみ保持）
+
+    download_time はレスポンスヘッダーの受信後、本文を読み終えるまでの秒数、size は受信したバイト数
+    （キャッシュから返した場合はどちらも0）。
+    """
+    __slots__ = ('body', 'encoding', 'truncated', 'from_cache', 'download_time', 'size')
+
+    def __init__(self, body: Optional[bytes], encoding: Optional[str], truncated: bool = False,
+                 from_cache: bool = False, download_time: float = 0.0, size: int = 0):
+        self.body = body
+        self.encoding = encoding
+        self.truncated = truncated
+        self.from_cache = from_cache
+        self.download_time = download_time
+        self.size = size
+
+
+class _Attempt:
+    """1回の試行の状態（本文を sink に渡し始めたら再試行できない）"""
+    __slots__ = ('body_started',)
+
+    def __init__(self):
+        self.body_started = False
+
+
+class PageFetcher:
+    """ページのHTMLを取得してバイト列と文字コードを返す"""
+
+    def __init__(self, headers: Dict[str, str], timeout: float = 15,
+                 ssl: Optional[bool] = None, cache: Optional[HttpCache] = None,
+                 max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+                 content_types: Iterable[str] = HTML_CONTENT_TYPES,
+                 retry: Optional[RetryPolicy] = None, latency: Optional[HostLatencyTracker] = None,
+                 hedge: bool = False, prewarm: Optional[ConnectionPrewarmer] = None):
+        """
+        Args:
+            headers: リクエストヘッダー
+            timeout: 1リクエストのタイムアウト（秒。latency を指定した場合は学習前の値）
+            ssl: Falseなら証明書を検証しない（Noneならaiohttpのデフォルト）
+            cache: HTTPレスポンスキャッシュ
+            max_bytes: 1ページの最大サイズ（超えた分は読まずに打ち切る。Noneなら無制限）
+            content_types: 本文を読み込むContent-Type（それ以外は本文を読まずに中止）
+            retry: 一時的な失敗を再試行するポリシー（省略時は再試行しない）
+            latency: ホストごとの応答時間からタイムアウトを決めるトラッカー（省略時は固定の timeout）
+            hedge: True なら、ホストのTTFBのp95を過ぎてもヘッダーが届かない場合に2つ目のリクエストを送り、
+                先に応答した方を使う
+            prewarm: 事前接続のプリウォーマー（リクエストの前に、準備中の接続があれば完了を待って再利用する）
+        """
+        self.headers = headers
+        self.timeout = timeout
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.content_types = frozenset(content_types)
+        self.retry = retry
+        self.adaptive_timeout = latency is not None
+        if latency is None and hedge:
+            # ヘッジの待ち時間を学習するだけで、タイムアウトは固定
+            latency = HostLatencyTracker(default_timeout=timeout, min_timeout=timeout, max_timeout=timeout)
+        self.latency = latency
+        self.hedge = hedge
+        self.prewarm = prewarm
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._request_kwargs = {} if ssl is None else {'ssl': ssl}
+
+    def stats(self) -> Dict[str, int]:
+        """再試行・ヘッジの回数"""
+        return {'retries': self.retries, 'hedged': self.hedged, 'hedge_wins': self.hedge_wins}
+
+    def warm(self, session: aiohttp.ClientSession, urls: Iterable[str]):
+        """プリウォーマーがあれば、URLのオリジンへの名前解決と接続を先に始める（実行中のイベントループで呼び出す）"""
+        if self.prewarm is not None:
+            self.prewarm.warm(session, urls, ssl=self._request_kwargs.get('ssl'))
+
+    def timeout_for(self, url: str) -> float:
+        """URLのホストに使うタイムアウト（秒）"""
+        if self.adaptive_timeout:
+            return self.latency.timeout(url)
+        return self.timeout
+
+    async def _read_body(self, response: aiohttp.ClientResponse,
+                         sink: Optional[BodySink] = None, keep: bool = True) -> Tuple[Optional[bytes], bool, int]:
+        """
+        本文をチャンク単位で max_bytes まで読み込み、(本文, 打ち切ったか, 受信したバイト数) を返す
+
+        sink を指定すると受信したチャンクをその場で渡す。keep=False なら本文を保持しない。
+        """
+        if self.max_bytes is None and sink is None:
+            body = await response.read()
+            return body, False, len(body)
+
+        chunks = []
+        size = 0
+        truncated = False
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            if self.max_bytes is not None and len(chunk) > self.max_bytes - size:
+                # 上限を超える分は読まずに打ち切る（接続は破棄される）
+                chunk = chunk[:self.max_bytes - size]
+                truncated = True
+            if sink is not None:
+                sink.feed(chunk)
+            if keep:
+                chunks.append(chunk)
+            size += len(chunk)
+            if truncated:
+                break
+        return (b''.join(chunks) if keep else None), truncated, size
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str,
+                    sink: Optional[BodySink] = None, deadline: Optional[Deadline] = None) -> FetchedPage:
+        """
+        ページを取得
+
+        Args:
+            sink: 本文のチャンクを受信しながら渡す先（ダウンロードと解析を並行させる場合）
+            deadline: 全体の締め切り（タイムアウトを残り時間で頭打ちにし、間に合わない再試行はしない）
+
+        Raises:
+            HttpStatusError: 200以外のステータス
+            ContentTypeRejected: HTML以外のContent-Type
+            asyncio.TimeoutError: タイムアウト
+        """
+        headers = self.headers
+        entry = None
+        if self.cache is not None:
+            entry = await self.cache.aget(url)
+            if entry is not None and self.cache.is_fresh(entry):
+                self.cache.hits += 1
+                return self._from_cache(entry, sink)
+            if entry is not None:
+                # 期限切れのエントリは条件付きリクエストで再検証
+                headers = {**self.headers, **entry.conditional_headers()}
+        if self.prewarm is not None:
+            await self.prewarm.ready(session, url)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            state = _Attempt()
+            try:
+                return await self._fetch_once(session, url, headers, entry, sink, state, deadline)
+            except Exception as e:
+                delay = self._retry_delay(attempt, e, state, sink)
+                if delay is None or (deadline is not None and delay >= deadline.remaining()):
+                    raise
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, attempt: int, error: Exception, state: _Attempt,
+                     sink: Optional[BodySink]) -> Optional[float]:
+        """再試行までの待ち時間（再試行しない場合はNone）"""
+        # 本文の一部をsinkに渡した後は、同じsinkでやり直せない
+        if self.retry is None or (state.body_started and sink is not None):
+            return None
+        if isinstance(error, HttpStatusError):
+            return self.retry.delay(attempt, error, error.status, error.retry_after)
+        return self.retry.delay(attempt, error)
+
+    async def _fetch_once(self, session: aiohttp.ClientSession, url: str, headers: Dict[str, str],
+                          entry: Optional[CacheEntry], sink: Optional[BodySink], state: _Attempt,
+                          deadline: Optional[Deadline] = None) -> FetchedPage:
+        """1回分のリクエスト"""
+        timeout = self.timeout_for(url)
+        # 締め切りで短くしたタイムアウトはホストの遅さではないので学習に使わない
+        capped = deadline is not None and deadline.remaining() < timeout
+        if capped:
+            timeout = deadline.remaining()
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+        start = time.perf_counter()
+        try:
+            response = await self._open(session, url, headers, timeout)
+        except asyncio.TimeoutError:
+            if self.latency is not None and not capped:
+                self.latency.observe_timeout(url, timeout)
+            raise
+        try:
+            if response.status == 304 and entry is not None:
+                await self.cache.arefresh(entry, response.headers)
+                return self._from_cache(entry, sink)
+            if response.status != 200:
+                raise HttpStatusError(response.status, parse_retry_after(response.headers.get('Retry-After')))
+            # Content-TypeがHTMLでなければ本文を読まずに中止（ヘッダーがない場合は読み込む）
+            if 'Content-Type' in response.headers and response.content_type not in self.content_types:
+                raise ContentTypeRejected(response.content_type)
+
+            encoding = response.charset
+            if sink is not None:
+                sink.start(encoding)
+            state.body_started = True
+            # sinkに渡す場合、本文はキャッシュに保存するときだけ保持する
+            body_start = time.perf_counter()
+            try:
+                body, truncated, size = await self._read_body(response, sink, keep=sink is None or self.cache is not None)
+            except asyncio.TimeoutError:
+                if self.latency is not None and not capped:
+                    self.latency.observe_timeout(url, timeout)
+                raise
+            download_time = time.perf_counter() - body_start
+            if self.latency is not None:
+                self.latency.observe(url, time.perf_counter() - start)
+            if self.cache is not None:
+                self.cache.misses += 1
+                if not truncated:
+                    await self.cache.aput(url, body, response.headers, encoding)
+        finally:
+            response.release()
+
+        return FetchedPage(body, encoding, truncated, download_time=download_time, size=size)
+
+    async def _request(self, session: aiohttp.ClientSession, url: str, headers: Dict[str, str],
+                       timeout: float) -> aiohttp.ClientResponse:
+        """リクエストを送り、レスポンスヘッダーを受信するまで待つ（TTFBを記録）"""
+        start = time.perf_counter()
+        response = await session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout),
+                                     **self._request_kwargs)
+        if self.latency is not None:
+            self.latency.observe_ttfb(url, time.perf_counter() - start)
+        return response
+
+    async def _open(self, session: aiohttp.ClientSession, url: str, headers: Dict[str, str],
+                    timeout: float) -> aiohttp.ClientResponse:
+        """レスポンスヘッダーを受信する（ヘッジが有効なら遅いリクエストを2つ目のリクエストと競わせる）"""
+        hedge_delay = self.latency.hedge_delay(url) if self.hedge else None
+        if hedge_delay is None:
+            return await self._request(session, url, headers, timeout)
+
+        first = asyncio.ensure_future(self._request(session, url, headers, timeout))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done:
+                tasks = set()
+                return first.result()
+            # p95を過ぎてもヘッダーが届かないので2つ目のリクエストを送る
+            self.hedged += 1
+            tasks.add(asyncio.ensure_future(self._request(session, url, headers, timeout)))
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task
+                    else:
+                        task.result().close()
+                if winner is not None:
+                    if winner is not first:
+                        self.hedge_wins += 1
+                    return winner.result()
+            raise error
+        finally:
+            # 負けたリクエストは中止（既に応答していれば接続を閉じる）
+            for task in tasks:
+                task.cancel()
+                task.add_done_callback(_close_response)
+
+    @staticmethod
+    def _from_cache(entry: CacheEntry, sink: Optional[BodySink]) -> FetchedPage:
+        if sink is not None:
+            sink.start(entry.charset)
+            sink.feed(entry.body)
+        return FetchedPage(entry.body, entry.charset, from_cache=True)
+
+
+def _close_response(task: asyncio.Future):
+    if not task.cancelled() and task.exception() is None:
+        task.result().close()
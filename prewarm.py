@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+接続の事前準備（プリウォーム）
+検索結果のURLが分かった時点で、ページの取得より先にオリジンへHEADリクエストを送って
+名前解決とTCP/TLS接続を済ませ、コネクションプールに戻った接続を取得時に再利用する
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from typing import Dict, Iterable, Optional
+
+import aiohttp
+from yarl import URL
+
+logger = logging.getLogger(__name__)
+
+# 事前接続のHEADリクエストに付ける trace_request_ctx（TraceConfig のコールバックで ctx.trace_request_ctx として参照できる）
+PREWARM_TRACE_CTX = {'prewarm': True}
+
+
+class _Warmup:
+    """1つのオリジン（スキーム + ホスト + ポート）の事前接続"""
+    __slots__ = ('task', 'started', 'handshake')
+
+    def __init__(self, started: float):
+        self.task: Optional[asyncio.Task] = None
+        self.started = started
+        self.handshake: Optional[float] = None     # 成功した場合、名前解決 + 接続（+ HEADの応答）にかかった秒数
+
+
+class ConnectionPrewarmer:
+    """
+    オリジンごとに1本の接続を先に確立するプリウォーマー
+
+    ページの取得直前に ready() を呼ぶと、準備中の接続があればその完了を待つ
+    （同じオリジンへ2本目の接続を張らない）。接続を待たずに済んだ時間を saved_time に加算する。
+    scraper_api の default_prewarmer のように複数のイベントループ（スレッド）で共有できる。
+
+    使用例:
+        scraper = FastWebScraper(session=ScraperSession(dns_cache=DnsCache()), prewarm=ConnectionPrewarmer())
+        # スクレイパーは PageFetcher.warm() 経由で warm() を呼び出す
+    """
+
+    def __init__(self, timeout: float = 5.0, max_hosts: int = 16, max_idle: float = 15.0):
+        """
+        Args:
+            timeout: 1つの事前接続のタイムアウト（秒）
+            max_hosts: 1回の warm() で接続するオリジンの最大数
+            max_idle: 使われなかった事前接続を記録しておく時間（秒。コネクションプールの keepalive_timeout 以下）
+        """
+        self.timeout = timeout
+        self.max_hosts = max_hosts
+        self.max_idle = max_idle
+        self.warmed = 0
+        self.failed = 0
+        self.used = 0
+        self.handshake_time = 0.0   # 事前接続にかかった時間の合計（秒）
+        self.saved_time = 0.0       # 取得時に待たずに済んだ名前解決・接続の時間の合計（秒）
+        # セッションはイベントループごとに別なので、記録はセッション単位（カウンターと辞書の更新はロックで保護）
+        self._warmups: 'weakref.WeakKeyDictionary[aiohttp.ClientSession, Dict[str, _Warmup]]' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def origin(url: str) -> Optional[URL]:
+        parsed = URL(url)
+        if parsed.scheme not in ('http', 'https') or not parsed.host:
+            return None
+        return parsed.origin()
+
+    def stats(self) -> Dict[str, float]:
+        """事前接続の成功・失敗・使用回数と、かかった時間・短縮した時間"""
+        with self._lock:
+            return {
+                'warmed': self.warmed,
+                'failed': self.failed,
+                'used': self.used,
+                'handshake_time': self.handshake_time,
+                'saved_time': self.saved_time,
+            }
+
+    def warm(self, session: aiohttp.ClientSession, urls: Iterable[str], ssl: Optional[bool] = None):
+        """
+        URLのオリジンへの名前解決と接続をバックグラウンドで開始（実行中のイベントループで呼び出す）
+
+        Args:
+            ssl: Falseなら証明書を検証しない（取得時のリクエストと同じ値でないと接続が再利用されない）
+        """
+        now = time.perf_counter()
+        origins = []
+        with self._lock:
+            warmups = self._warmups.setdefault(session, {})
+            # 使われないまま古くなった記録は捨てる（プールの接続も閉じられている）
+            for key in [key for key, warmup in warmups.items() if now - warmup.started > self.max_idle]:
+                del warmups[key]
+
+            for url in urls:
+                origin = self.origin(url)
+                if origin is None:
+                    continue
+                key = str(origin)
+                if key in warmups:
+                    continue
+                if len(origins) >= self.max_hosts:
+                    break
+                warmups[key] = _Warmup(now)
+                origins.append((origin, warmups[key]))
+
+        for origin, warmup in origins:
+            warmup.task = asyncio.ensure_future(self._connect(session, origin, warmup, ssl))
+
+    async def _connect(self, session: aiohttp.ClientSession, origin: URL, warmup: _Warmup,
+                       ssl: Optional[bool]):
+        """
+        オリジンへHEADリクエストを送り、確立した接続をプールに戻す
+
+        応答のステータスは問わない（405などでも接続は再利用できる）。
+        trace_request_ctx で事前接続と分かるようにし、取得のメトリクスには含めない。
+        """
+        start = time.perf_counter()
+        timeout = aiohttp.ClientTimeout(total=self.timeout, sock_connect=self.timeout)
+        try:
+            async with session.head(origin, timeout=timeout, allow_redirects=False,
+                                    ssl=True if ssl is None else ssl, trace_request_ctx=PREWARM_TRACE_CTX):
+                pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            logger.debug(f"事前接続に失敗しました: {origin} ({e})")
+            return
+        warmup.handshake = time.perf_counter() - start
+        with self._lock:
+            self.warmed += 1
+            self.handshake_time += warmup.handshake
+
+    async def ready(self, session: aiohttp.ClientSession, url: str):
+        """URLのオリジンへの事前接続が準備中なら完了を待つ（なければすぐ戻る）"""
+        origin = self.origin(url)
+        if origin is None:
+            return
+        with self._lock:
+            warmups = self._warmups.get(session)
+            warmup = warmups.pop(str(origin), None) if warmups else None
+        if warmup is None:
+            return
+
+        requested = time.perf_counter()
+        if not warmup.task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(warmup.task), self.timeout)
+            except asyncio.TimeoutError:
+                return
+        if warmup.handshake is None:
+            return
+        # 取得を始める前に済んでいた分（待った分は除く）
+        with self._lock:
+            self.used += 1
+            self.saved_time += max(0.0, min(warmup.handshake, requested - warmup.started))
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+SQLiteの結果データベース
+実行・クエリ・ページ・画像をテーブルに保存し、ページ本文にFTS5の全文検索インデックスを張る
+（all_content.txt をgrepする代わりに、コーパス全体をインデックスで検索する）
+"""
+
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from result_sink import BackgroundSink
+from url_utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    page_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    query_id INTEGER REFERENCES queries(id),
+    url TEXT NOT NULL,
+    normalized_url TEXT NOT NULL,
+    status TEXT,
+    content TEXT NOT NULL,
+    scraped_at TEXT,
+    elapsed REAL
+);
+CREATE INDEX IF NOT EXISTS pages_normalized_url ON pages(normalized_url, id);
+CREATE INDEX IF NOT EXISTS pages_query ON pages(query_id);
+CREATE TABLE IF NOT EXISTS images (
+    page_id INTEGER NOT NULL REFERENCES pages(id),
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    alt TEXT,
+    PRIMARY KEY (page_id, position)
+);
+"""
+
+# 日本語は空白で区切られないため、部分一致で検索できるtrigramトークナイザーを優先
+_FTS_TOKENIZERS = ('trigram', 'unicode61')
+
+
+class ResultDB:
+    """
+    スクレイピング結果のSQLiteデータベース
+
+    使い方:
+        db = ResultDB('scrape_results.db')
+        scraper = FastWebScraper(sink_factory=db.open_run)   # save_results() の保存先にする
+        db.save(query, results)                              # または結果のリストを直接保存
+
+        db.search("非同期 スクレイピング")
+        db.images_for_query("Python 入門")
+        db.latest("https://example.com/")
+    """
+
+    def __init__(self, path: str = 'scrape_results.db'):
+        """
+        Args:
+            path: データベースファイルのパス
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._migrate()
+        self.tokenizer = self._create_fts()
+        self._db.commit()
+
+    def _migrate(self):
+        """古いスキーマのデータベースに列を追加"""
+        columns = {row['name'] for row in self._db.execute("PRAGMA table_info(images)")}
+        if 'alt' not in columns:
+            self._db.execute("ALTER TABLE images ADD COLUMN alt TEXT")
+
+    def _create_fts(self) -> Optional[str]:
+        """FTS5インデックスを作成し、使用したトークナイザーを返す（FTS5が使えなければNone）"""
+        row = self._db.execute("SELECT sql FROM sqlite_master WHERE name = 'pages_fts'").fetchone()
+        if row is not None:
+            return 'trigram' if 'trigram' in row['sql'] else 'unicode61'
+        for tokenizer in _FTS_TOKENIZERS:
+            try:
+                self._db.execute(
+                    "CREATE VIRTUAL TABLE pages_fts USING fts5("
+                    f"content, content='pages', content_rowid='id', tokenize='{tokenizer}')"
+                )
+                return tokenizer
+            except sqlite3.OperationalError:
+                continue
+        logger.warning("⚠️ SQLiteがFTS5に対応していないため、全文検索はLIKEで行います")
+        return None
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- 書き込み ---
+
+    def begin_run(self) -> int:
+        """実行を登録してIDを返す"""
+        with self._lock, self._db:
+            cursor = self._db.execute("INSERT INTO runs (started_at) VALUES (?)", (datetime.now().isoformat(),))
+        return cursor.lastrowid
+
+    def finish_run(self, run_id: int):
+        """実行の終了時刻とページ数を記録"""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE runs SET finished_at = ?, page_count = (SELECT COUNT(*) FROM pages WHERE run_id = ?)"
+                " WHERE id = ?",
+                (datetime.now().isoformat(), run_id, run_id)
+            )
+
+    def _query_id(self, query: Optional[str]) -> Optional[int]:
+        if query is None:
+            return None
+        self._db.execute("INSERT OR IGNORE INTO queries (text) VALUES (?)", (query,))
+        return self._db.execute("SELECT id FROM queries WHERE text = ?", (query,)).fetchone()[0]
+
+    def add_results(self, run_id: int, query: Optional[str], results: Iterable[Dict]):
+        """結果をまとめて1トランザクションで保存"""
+        results = list(results)
+        if not results:
+            return
+        with self._lock, self._db:
+            query_id = self._query_id(query)
+            page_ids = []
+            for result in results:
+                cursor = self._db.execute(
+                    "INSERT INTO pages (run_id, query_id, url, normalized_url, status, content, scraped_at, elapsed)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, query_id, result['url'], normalize_url(result['url']), result.get('status'),
+                     result['content'], result.get('scraped_at'), result.get('elapsed'))
+                )
+                page_ids.append(cursor.lastrowid)
+            self._db.executemany(
+                "INSERT INTO images (page_id, position, url, alt) VALUES (?, ?, ?, ?)",
+                [(page_id, position, url, (result.get('image_alts') or {}).get(url))
+                 for page_id, result in zip(page_ids, results)
+                 for position, url in enumerate(result['images'])]
+            )
+            if self.tokenizer is not None:
+                self._db.executemany(
+                    "INSERT INTO pages_fts (rowid, content) VALUES (?, ?)",
+                    [(page_id, result['content']) for page_id, result in zip(page_ids, results)]
+                )
+
+    def save(self, query: Optional[str], results: Iterable[Dict]) -> int:
+        """結果のリストを1回の実行として保存し、実行IDを返す"""
+        run_id = self.begin_run()
+        self.add_results(run_id, query, results)
+        self.finish_run(run_id)
+        return run_id
+
+    def open_run(self, query: str, total: int) -> 'DBRun':
+        """結果を1件ずつ受け取って保存する出力先（スクレイパーの sink_factory として使用可能）"""
+        return DBRun(self, query, total)
+
+    # --- 検索 ---
+
+    def search(self, text: str, limit: int = 20, query: Optional[str] = None) -> List[Dict]:
+        """
+        ページ本文を全文検索（空白区切りの語をすべて含むページ）
+
+        Args:
+            text: 検索語
+            limit: 最大件数
+            query: 指定すると、その検索キーワードで取得したページに限定
+
+        Returns:
+            [{'page_id', 'url', 'query', 'scraped_at', 'snippet'}]（関連度順。LIKE検索時は新しい順）
+        """
+        terms = text.split()
+        if not terms:
+            return []
+        # trigramは3文字未満の語を検索できないためLIKEで検索
+        use_fts = self.tokenizer is not None and not (
+            self.tokenizer == 'trigram' and any(len(term) < 3 for term in terms))
+
+        params: List = []
+        if use_fts:
+            match = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+            sql = ("SELECT p.id AS page_id, p.url, q.text AS query, p.scraped_at,"
+                   " snippet(pages_fts, 0, '[', ']', '…', 16) AS snippet"
+                   " FROM pages_fts JOIN pages p ON p.id = pages_fts.rowid"
+                   " LEFT JOIN queries q ON q.id = p.query_id"
+                   " WHERE pages_fts MATCH ?")
+            params.append(match)
+        else:
+            sql = ("SELECT p.id AS page_id, p.url, q.text AS query, p.scraped_at,"
+                   " substr(p.content, 1, 200) AS snippet"
+                   " FROM pages p LEFT JOIN queries q ON q.id = p.query_id"
+                   " WHERE " + ' AND '.join("p.content LIKE ? ESCAPE '\\'" for _ in terms))
+            for term in terms:
+                escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                params.append(f"%{escaped}%")
+        if query is not None:
+            sql += " AND q.text = ?"
+            params.append(query)
+        sql += " ORDER BY bm25(pages_fts)" if use_fts else " ORDER BY p.id DESC"
+        sql += " LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def images_for_query(self, query: str) -> List[str]:
+        """検索キーワードで取得したページの画像URL（重複なし・取得順）"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT i.url FROM images i"
+                " JOIN pages p ON p.id = i.page_id JOIN queries q ON q.id = p.query_id"
+                " WHERE q.text = ? GROUP BY i.url ORDER BY MIN(p.id), MIN(i.position)",
+                (query,)
+            ).fetchall()
+        return [row['url'] for row in rows]
+
+    def latest(self, url: str) -> Optional[Dict]:
+        """URLの最新の取得結果（従来と同じ形式の辞書。なければNone）"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM pages WHERE normalized_url = ? ORDER BY id DESC LIMIT 1",
+                (normalize_url(url),)
+            ).fetchone()
+            if row is None:
+                return None
+            image_rows = self._db.execute(
+                "SELECT url, alt FROM images WHERE page_id = ? ORDER BY position", (row['id'],)).fetchall()
+        return {
+            'url': row['url'],
+            'content': row['content'],
+            'images': [r['url'] for r in image_rows],
+            'status': row['status'],
+            'scraped_at': row['scraped_at'],
+            'elapsed': row['elapsed'],
+            'image_alts': {r['url']: r['alt'] for r in image_rows if r['alt']},
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """テーブルごとの件数"""
+        with self._lock:
+            return {
+                table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('runs', 'queries', 'pages', 'images')
+            }
+
+
+class DBRun(BackgroundSink):
+    """
+    1回分の実行結果をResultDBに保存する出力先
+
+    結果はバックグラウンドスレッドでまとめ、flush_every 件ごとに1トランザクションで挿入する。
+    """
+
+    def __init__(self, db: ResultDB, query: str, total: int, flush_every: int = 64):
+        self.db = db
+        self.query = query
+        self.total = total
+        self.run_id = db.begin_run()
+        self._batch: List[Dict] = []
+        super().__init__(flush_every=flush_every)
+
+    @property
+    def output_dir(self) -> str:
+        """データベースファイルのパス"""
+        return self.db.path
+
+    def _write_record(self, record: Dict):
+        self._batch.append(record)
+
+    def _flush(self):
+        batch, self._batch = self._batch, []
+        self.db.add_results(self.run_id, self.query, batch)
+
+    def _finish(self):
+        self._flush()
+        self.db.finish_run(self.run_id)
+
+    def close(self) -> str:
+        """保存の完了を待ち、データベースファイルのパスを返す"""
+        if self.closed:
+            return self.output_dir
+        self.closed = True
+        self._join()
+        logger.info(f"\n🗄️ 結果をデータベースに保存しました: {self.db.path}（実行ID: {self.run_id}）")
+        return self.output_dir
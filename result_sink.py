@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+ストリーミング結果出力
+結果を完了した順に results.jsonl へ1行ずつ追記する（書き込みはバックグラウンドスレッド）
+従来のディレクトリ構成（all_content.txt など）は同じスレッドで並行して書き込むビューとして扱う（JSONLから後で生成することもできる）
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+from result_writer import ResultWriter, make_output_dir
+
+logger = logging.getLogger(__name__)
+
+JSONL_FILENAME = "results.jsonl"
+
+_STOP = object()
+
+
+class BackgroundSink:
+    """
+    結果の書き込みをバックグラウンドスレッドで行う出力先の基底クラス
+
+    write() はキューに積むだけですぐ戻る。サブクラスは _write_record() / _flush() / _finish() を実装する。
+    """
+
+    def __init__(self, flush_every: int = 32, flush_interval: float = 1.0):
+        """
+        Args:
+            flush_every: フラッシュするまでの件数
+            flush_interval: フラッシュするまでの最大秒数
+        """
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.count = 0
+        self.closed = False
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name='result-sink', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, result: Dict):
+        """結果を1件追加（キューに積んですぐ戻る）"""
+        if self.closed:
+            raise ValueError(f"{type(self).__name__} is closed")
+        if self._error is not None:
+            raise self._error
+        self.count += 1
+        self._queue.put(self._record(result))
+
+    def _record(self, result: Dict) -> Dict:
+        return result
+
+    def _write_record(self, record: Dict):
+        raise NotImplementedError
+
+    def _flush(self):
+        pass
+
+    def _finish(self):
+        """全件の書き込み後に呼ばれる（バックグラウンドスレッドで実行）"""
+
+    def _run(self):
+        """バックグラウンドスレッド: キューの結果を書き込む"""
+        pending = 0
+        last_flush = time.monotonic()
+        while True:
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                record = None
+            if record is _STOP:
+                break
+            if self._error is not None:
+                continue
+            try:
+                if record is not None:
+                    self._write_record(record)
+                    pending += 1
+                if pending and (pending >= self.flush_every or time.monotonic() - last_flush >= self.flush_interval):
+                    self._flush()
+                    pending = 0
+                    last_flush = time.monotonic()
+            except BaseException as e:
+                self._error = e
+        if self._error is None:
+            try:
+                self._finish()
+            except BaseException as e:
+                self._error = e
+
+    def _join(self):
+        """書き込みの完了を待つ（エラーがあれば送出）"""
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+class JsonlSink(BackgroundSink):
+    """
+    スクレイピング結果を <出力ディレクトリ>/results.jsonl に追記する出力先
+
+    - write() はキューに積むだけで、ファイルI/Oはバックグラウンドスレッドで実行（イベントループを止めない）
+    - flush_every 件ごと、または flush_interval 秒ごとにフラッシュし、途中経過もディスクに残す
+    - view を指定すると、同じバックグラウンドスレッドで従来形式のファイルにも1件ずつ書き込む
+
+    使い方:
+        with JsonlSink(query, total=len(urls), view=ResultWriter) as sink:
+            async for result in scraper.iter_scrape(urls):
+                sink.write(result)
+        output_dir = sink.output_dir
+    """
+
+    def __init__(self, query: str, total: int, output_dir: Optional[str] = None,
+                 view: Optional[Callable[..., ResultWriter]] = None,
+                 flush_every: int = 32, flush_interval: float = 1.0):
+        """
+        Args:
+            query: 検索キーワード（各行に記録）
+            total: 取得予定のサイト数
+            output_dir: 出力先ディレクトリ（省略時は scraping_results_<キーワード>_<タイムスタンプ>）
+            view: 従来形式のファイルを書き込むライター（ResultWriter / ResultWriterV2。Noneなら生成しない）
+            flush_every: フラッシュするまでの件数
+            flush_interval: フラッシュするまでの最大秒数
+        """
+        self.query = query
+        self.total = total
+        self.view = view
+        self.output_dir = output_dir or make_output_dir(query)
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.path = os.path.join(self.output_dir, JSONL_FILENAME)
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._view: Optional[ResultWriter] = None
+        super().__init__(flush_every, flush_interval)
+
+    def _record(self, result: Dict) -> Dict:
+        return {'query': self.query, **result}
+
+    def _open_view(self) -> ResultWriter:
+        """従来形式のライター（バックグラウンドスレッドで最初に使うときに作成）"""
+        if self._view is None:
+            self._view = self.view(self.query, self.total, output_dir=self.output_dir)
+        return self._view
+
+    def _write_record(self, record: Dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        if self.view is not None:
+            self._open_view().write(record)
+
+    def _flush(self):
+        self._file.flush()
+
+    def _finish(self):
+        if self.view is not None:
+            self._open_view().close()
+
+    def close(self) -> str:
+        """書き込みの完了を待ってファイルを閉じ、出力ディレクトリを返す"""
+        if self.closed:
+            return self.output_dir
+        self.closed = True
+        try:
+            self._join()
+        finally:
+            self._file.close()
+
+        if self.view is None:
+            logger.info(f"\n📁 結果を保存しました: {self.output_dir}/")
+        logger.info(f"  - {JSONL_FILENAME}: 全結果（1行1件のJSON）")
+        return self.output_dir
+
+
+def read_jsonl(path: str) -> Iterator[Dict]:
+    """results.jsonl を1件ずつ読み込む"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def render_view(path: str, writer: Callable[..., ResultWriter] = ResultWriter,
+                output_dir: Optional[str] = None) -> str:
+    """
+    results.jsonl から従来形式のファイル（all_content.txt / site_*_content.txt /
+    all_image_urls.txt / ai_data.json）を生成
+
+    Args:
+        path: results.jsonl のパス
+        writer: 出力形式（ResultWriter / ResultWriterV2）
+        output_dir: 出力先ディレクトリ（省略時はJSONLと同じディレクトリ）
+
+    Returns:
+        出力ディレクトリ
+    """
+    total = 0
+    query = ''
+    for record in read_jsonl(path):
+        if not total:
+            query = record.get('query', '')
+        total += 1
+
+    output_dir = output_dir or os.path.dirname(path) or '.'
+    with writer(query, total, output_dir=output_dir) as view:
+        for record in read_jsonl(path):
+            view.write(record)
+    return output_dir
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+コンテンツアドレス方式の結果ストア
+抽出したテキストをハッシュをキーに圧縮して1回だけ保存し、実行ごとには小さなマニフェストだけを書く
+（複数のクエリ・実行で同じページを取得しても本文は重複して保存されない）
+
+    .result_store/
+    ├── blobs/ab/abcdef....gz     # 本文（ハッシュ名・圧縮済み）
+    └── manifests/<実行ID>.json   # 実行ごとの結果一覧（本文はハッシュで参照）
+
+コマンドライン:
+    python result_store.py list
+    python result_store.py gc
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from result_sink import BackgroundSink
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_ZSTD = 'zstd'
+
+_EXTENSIONS = {COMPRESSION_GZIP: '.gz', COMPRESSION_ZSTD: '.zst'}
+
+
+def content_hash(content: str) -> str:
+    """本文のハッシュ（blobのキー）"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class ResultStore:
+    """
+    圧縮・重複排除された結果ストア
+
+    使い方:
+        store = ResultStore()
+        scraper = FastWebScraper(sink_factory=store.open_run)
+        output = scraper.save_results(query, results)   # 実行ID付きのマニフェストを保存
+
+        for run in store.runs():
+            results = store.load(run['run_id'])           # 従来と同じ結果の辞書のリスト
+    """
+
+    def __init__(self, root: str = '.result_store', compression: Optional[str] = None, level: int = 6):
+        """
+        Args:
+            root: ストアのディレクトリ
+            compression: 'zstd' または 'gzip'（省略時は zstandard があれば zstd、なければ gzip）
+            level: 圧縮レベル
+        """
+        if compression is None:
+            compression = COMPRESSION_ZSTD if zstandard is not None else COMPRESSION_GZIP
+        if compression not in _EXTENSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == COMPRESSION_ZSTD and zstandard is None:
+            raise ImportError("zstd圧縮には zstandard パッケージが必要です（pip install zstandard）")
+
+        self.root = root
+        self.compression = compression
+        self.level = level
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.manifest_dir = os.path.join(root, 'manifests')
+        self.stores = 0
+        self.dedup_hits = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.manifest_dir, exist_ok=True)
+
+    # --- blob ---
+
+    def _blob_path(self, digest: str, compression: Optional[str] = None) -> str:
+        ext = _EXTENSIONS[compression or self.compression]
+        return os.path.join(self.blob_dir, digest[:2], digest + ext)
+
+    def _find_blob(self, digest: str) -> Optional[Tuple[str, str]]:
+        """保存済みのblobを探す（圧縮形式が変わっていても読めるようにすべての拡張子を確認）"""
+        for compression in (self.compression, *_EXTENSIONS):
+            path = self._blob_path(digest, compression)
+            if os.path.exists(path):
+                return path, compression
+        return None
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == COMPRESSION_ZSTD:
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    @staticmethod
+    def _decompress(data: bytes, compression: str) -> bytes:
+        if compression == COMPRESSION_ZSTD:
+            if zstandard is None:
+                raise ImportError("zstd圧縮のblobを読むには zstandard パッケージが必要です")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def put_content(self, content: str) -> str:
+        """本文を保存してハッシュを返す（保存済みなら書き込まない）"""
+        digest = content_hash(content)
+        found = self._find_blob(digest)
+        if found is not None:
+            try:
+                # 更新日時を新しくして、マニフェストを書く前に gc() で削除されないようにする
+                os.utime(found[0])
+            except FileNotFoundError:
+                pass    # gc() が削除中なので書き直す
+            else:
+                with self._lock:
+                    self.dedup_hits += 1
+                return digest
+
+        path = self._blob_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 一時ファイルに書いてから置き換え（同じblobを並行して書いても壊れない）
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self._compress(content.encode('utf-8')))
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.stores += 1
+        return digest
+
+    def get_content(self, digest: str) -> str:
+        """ハッシュから本文を取得"""
+        found = self._find_blob(digest)
+        if found is None:
+            raise KeyError(digest)
+        path, compression = found
+        with open(path, 'rb') as f:
+            return self._decompress(f.read(), compression).decode('utf-8')
+
+    # --- マニフェスト ---
+
+    def _manifest_path(self, run_id: str) -> str:
+        return os.path.join(self.manifest_dir, run_id + '.json')
+
+    def new_run_id(self, query: str) -> str:
+        """<タイムスタンプ>_<キーワード>_<ランダム> 形式の実行ID"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_query = re.sub(r'[^\w-]', '_', query)[:50]
+        return f"{timestamp}_{safe_query}_{uuid.uuid4().hex[:8]}"
+
+    def write_manifest(self, manifest: Dict):
+        path = self._manifest_path(manifest['run_id'])
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _manifests(self):
+        """読み込めるマニフェストを順に返す（壊れたマニフェストは警告して読み飛ばす）"""
+        for name in os.listdir(self.manifest_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                manifest = self.read_manifest(name[:-5])
+                if not isinstance(manifest, dict) or not isinstance(manifest.get('results'), list):
+                    raise ValueError("マニフェストの形式が不正です")
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ マニフェストを読み飛ばしました: {name} ({e})")
+                continue
+            yield manifest
+
+    def read_manifest(self, run_id: str) -> Dict:
+        with open(self._manifest_path(run_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def open_run(self, query: str, total: int) -> 'StoreRun':
+        """1回分の実行結果の書き込み先を作成（スクレイパーの sink_factory として使用可能）"""
+        return StoreRun(self, query, total)
+
+    # --- 読み込み ---
+
+    def runs(self, query: Optional[str] = None) -> List[Dict]:
+        """保存済みの実行の一覧（新しい順。本文・結果は含まない）"""
+        runs = []
+        for manifest in self._manifests():
+            if query is not None and manifest['query'] != query:
+                continue
+            runs.append({
+                'run_id': manifest['run_id'],
+                'query': manifest['query'],
+                'created_at': manifest['created_at'],
+                'total': len(manifest['results']),
+            })
+        runs.sort(key=lambda run: run['created_at'], reverse=True)
+        return runs
+
+    def load(self, run_id: str) -> List[Dict]:
+        """実行IDの結果を従来と同じ形式の辞書のリストで返す"""
+        manifest = self.read_manifest(run_id)
+        results = []
+        for entry in manifest['results']:
+            result = {key: value for key, value in entry.items() if key not in ('content_hash', 'content_length')}
+            result['content'] = self.get_content(entry['content_hash'])
+            results.append(result)
+        return results
+
+    def delete_run(self, run_id: str):
+        """マニフェストを削除（本文は gc() で削除）"""
+        os.remove(self._manifest_path(run_id))
+
+    # --- ガベージコレクション ---
+
+    def referenced(self) -> set:
+        """いずれかのマニフェストから参照されているハッシュ（runs() と同じく壊れたマニフェストは読み飛ばす）"""
+        digests = set()
+        for manifest in self._manifests():
+            digests.update(entry['content_hash'] for entry in manifest['results']
+                           if isinstance(entry, dict) and 'content_hash' in entry)
+        return digests
+
+    def gc(self, min_age: float = 3600) -> Dict[str, int]:
+        """
+        どのマニフェストからも参照されていないblobを削除
+
+        Args:
+            min_age: この時間内に保存・再利用されたblobは削除しない（秒。マニフェストを書く前の実行のblobを守るため）
+
+        Returns:
+            {'removed': 削除件数, 'freed': 解放したバイト数, 'kept': 残った件数}
+        """
+        referenced = self.referenced()
+        threshold = time.time() - min_age
+        removed = freed = kept = 0
+        for prefix in os.listdir(self.blob_dir):
+            prefix_dir = os.path.join(self.blob_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, name)
+                digest = name.split('.', 1)[0]
+                if name.endswith('.gc'):
+                    continue    # 別の gc() が確認中
+                st = os.stat(path)
+                if digest in referenced or st.st_mtime > threshold:
+                    kept += 1
+                    continue
+                # 退避してから更新日時を確かめ直す（確認の間に put_content() が再利用したblobは戻す）
+                tombstone = path + '.gc'
+                try:
+                    os.rename(path, tombstone)
+                except FileNotFoundError:
+                    continue
+                st = os.stat(tombstone)
+                if st.st_mtime > threshold:
+                    os.replace(tombstone, path)
+                    kept += 1
+                    continue
+                os.remove(tombstone)
+                removed += 1
+                freed += st.st_size
+            if not os.listdir(prefix_dir):
+                os.rmdir(prefix_dir)
+        return {'removed': removed, 'freed': freed, 'kept': kept}
+
+    def stats(self) -> Dict[str, int]:
+        """blob数・合計サイズ・重複排除の件数"""
+        blobs = size = 0
+        for dirpath, _, filenames in os.walk(self.blob_dir):
+            for name in filenames:
+                blobs += 1
+                size += os.path.getsize(os.path.join(dirpath, name))
+        return {
+            'blobs': blobs,
+            'size': size,
+            'runs': sum(1 for name in os.listdir(self.manifest_dir) if name.endswith('.json')),
+            'stores': self.stores,
+            'dedup_hits': self.dedup_hits,
+        }
+
+
+class StoreRun(BackgroundSink):
+    """
+    1回分の実行結果をストアに書き込む出力先（圧縮・ファイルI/Oはバックグラウンドスレッドで実行）
+
+    本文はblobとして保存し、close() 時にマニフェストを書き出す。
+    """
+
+    def __init__(self, store: ResultStore, query: str, total: int):
+        self.store = store
+        self.query = query
+        self.total = total
+        self.run_id = store.new_run_id(query)
+        self.created_at = datetime.now().isoformat()
+        self._entries: List[Dict] = []
+        super().__init__()
+
+    @property
+    def output_dir(self) -> str:
+        """マニフェストのパス"""
+        return self.store._manifest_path(self.run_id)
+
+    def _record(self, result: Dict) -> Dict:
+        return {'query': self.query, **result}
+
+    def _write_record(self, record: Dict):
+        content = record.pop('content')
+        record['content_hash'] = self.store.put_content(content)
+        record['content_length'] = len(content)
+        self._entries.append(record)
+
+    def _finish(self):
+        self.store.write_manifest({
+            'run_id': self.run_id,
+            'query': self.query,
+            'created_at': self.created_at,
+            'total': self.total,
+            'results': self._entries,
+        })
+
+    def close(self) -> str:
+        """書き込みの完了を待ってマニフェストを保存し、そのパスを返す"""
+        if self.closed:
+            return self.output_dir
+        self.closed = True
+        self._join()
+        logger.info(f"\n📁 結果をストアに保存しました: {self.output_dir}")
+        return self.output_dir
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """コマンドラインの処理（終了コードを返す）"""
+    parser = argparse.ArgumentParser(description="スクレイピング結果ストアの管理")
+    parser.add_argument('--root', default='.result_store', help="ストアのディレクトリ")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="保存済みの実行を表示")
+    gc_parser = sub.add_parser('gc', help="参照されていない本文を削除")
+    gc_parser.add_argument('--min-age', type=float, default=3600, help="これより新しい本文は削除しない（秒）")
+    sub.add_parser('stats', help="ストアの統計情報を表示")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    try:
+        store = ResultStore(args.root)
+        if args.command == 'list':
+            for run in store.runs():
+                print(f"{run['created_at']}  {run['run_id']}  {run['query']} ({run['total']}件)")
+        elif args.command == 'gc':
+            result = store.gc(min_age=args.min_age)
+            print(f"🧹 {result['removed']}件のblobを削除しました（{result['freed']:,}バイト解放、残り{result['kept']}件）")
+        elif args.command == 'stats':
+            for key, value in store.stats().items():
+                print(f"  {key}: {value}")
+    except Exception as e:
+        print(f"❌ {args.command} に失敗しました: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+スクレイピング結果の出力
+結果を1件ずつ受け取り、到着した順に出力ディレクトリへ書き込む
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from scrape_result import is_success
+
+logger = logging.getLogger(__name__)
+
+
+def make_output_dir(query: str) -> str:
+    """出力ディレクトリ scraping_results_<キーワード>_<タイムスタンプ> を作成してパスを返す"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    safe_query = re.sub(r'[^\w\s-]', '', query)[:50]
+    output_dir = f"scraping_results_{safe_query}_{timestamp}"
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+
+class ResultWriter:
+    """
+    スクレイピング結果を scraping_results_<キーワード>_<タイムスタンプ>/ に書き込む（FastWebScraper形式）
+
+    使い方:
+        with ResultWriter(query, total=len(urls)) as writer:
+            for result in results:
+                writer.write(result)
+        output_dir = writer.output_dir
+    """
+
+    def __init__(self, query: str, total: int, output_dir: Optional[str] = None):
+        """
+        Args:
+            query: 検索キーワード
+            total: 取得予定のサイト数（ヘッダーに記載）
+            output_dir: 出力先ディレクトリ（省略時は scraping_results_<キーワード>_<タイムスタンプ>）
+        """
+        self.query = query
+        self.total = total
+        self.count = 0
+        self.closed = False
+        self._ai_results: List[Dict] = []
+
+        # 出力ディレクトリを作成
+        if output_dir is None:
+            output_dir = make_output_dir(query)
+        else:
+            os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+
+        # メイン結果ファイル（全サイトのテキスト）と画像URLリストファイル
+        self._content_file = open(os.path.join(self.output_dir, "all_content.txt"), 'w', encoding='utf-8')
+        self._images_file = open(os.path.join(self.output_dir, "all_image_urls.txt"), 'w', encoding='utf-8')
+        self._write_content_header()
+        self._write_images_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- ヘッダー ---
+
+    def _write_content_header(self):
+        f = self._content_file
+        f.write(f"スクレイピング結果\n")
+        f.write(f"検索キーワード: {self.query}\n")
+        f.write(f"実行日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"取得サイト数: {self.total}\n")
+        f.write("="*80 + "\n\n")
+
+    def _write_images_header(self):
+        f = self._images_file
+        f.write(f"画像URL一覧\n")
+        f.write(f"検索キーワード: {self.query}\n")
+        f.write("="*80 + "\n\n")
+
+    # --- 1件ごとの出力 ---
+
+    def write(self, result: Dict):
+        """結果を1件書き込む"""
+        self.count += 1
+        i = self.count
+        self._write_content(i, result)
+        self._write_site(i, result)
+        self._write_images(i, result)
+        entry = self._ai_entry(result)
+        if entry is not None:
+            self._ai_results.append(entry)
+
+    def _write_content(self, i: int, result: Dict):
+        f = self._content_file
+        f.write(f"\n{'='*80}\n")
+        f.write(f"サイト {i}: {result['url']}\n")
+        f.write(f"取得日時: {result['scraped_at']}\n")
+        f.write(f"画像数: {len(result['images'])}\n")
+        f.write("-"*80 + "\n\n")
+        f.write(result['content'][:50000])  # 最大50000文字まで
+        if len(result['content']) > 50000:
+            f.write("\n\n[... コンテンツが長すぎるため省略 ...]\n")
+        f.write("\n\n")
+
+    def _write_site(self, i: int, result: Dict):
+        # 個別サイトごとのファイル
+        site_file = os.path.join(self.output_dir, f"site_{i}_content.txt")
+        with open(site_file, 'w', encoding='utf-8') as f:
+            f.write(f"URL: {result['url']}\n")
+            f.write(f"取得日時: {result['scraped_at']}\n")
+            f.write("="*80 + "\n\n")
+            f.write(result['content'])
+
+    def _write_images(self, i: int, result: Dict):
+        f = self._images_file
+        f.write(f"\nサイト {i}: {result['url']}\n")
+        f.write(f"画像数: {len(result['images'])}\n")
+        f.write("-"*40 + "\n")
+
+        if result['images']:
+            for j, img_url in enumerate(result['images'], 1):
+                f.write(f"{j}. {img_url}\n")
+        else:
+            f.write("画像なし\n")
+        f.write("\n")
+
+    def _ai_entry(self, result: Dict):
+        return {
+            'url': result['url'],
+            'content_preview': result['content'][:1000],  # プレビューのみ
+            'full_content_length': len(result['content']),
+            'image_urls': result['images'][:20],  # 最大20個の画像URL
+            'total_images': len(result['images']),
+            'scraped_at': result['scraped_at']
+        }
+
+    # --- 終了処理 ---
+
+    def _ai_data(self) -> Dict:
+        return {
+            'query': self.query,
+            'scraped_at': datetime.now().isoformat(),
+            'results': self._ai_results
+        }
+
+    def _finish_content(self):
+        self._content_file.close()
+
+    def _finish_images(self):
+        self._images_file.close()
+
+    def close(self) -> str:
+        """ファイルを閉じてAI用JSONを書き出し、出力ディレクトリを返す"""
+        if self.closed:
+            return self.output_dir
+        self.closed = True
+
+        self._finish_content()
+        self._finish_images()
+
+        # AI用のJSON形式でも保存
+        ai_data_file = os.path.join(self.output_dir, "ai_data.json")
+        with open(ai_data_file, 'w', encoding='utf-8') as f:
+            json.dump(self._ai_data(), f, ensure_ascii=False, indent=2)
+
+        logger.info(f"\n📁 結果を保存しました: {self.output_dir}/")
+        logger.info(f"  - all_content.txt: 全サイトのテキスト")
+        logger.info(f"  - site_*_content.txt: 個別サイトのテキスト")
+        logger.info(f"  - all_image_urls.txt: 全画像URLリスト")
+        logger.info(f"  - ai_data.json: AI処理用データ")
+
+        return self.output_dir
+
+
+class ResultWriterV2(ResultWriter):
+    """
+    FastWebScraperV2形式の出力
+    エラーになったサイトは個別ファイル・AI用JSONに含めず、成功/失敗件数を記載する
+    """
+
+    def __init__(self, query: str, total: int, output_dir: Optional[str] = None):
+        self.success_count = 0
+        self.total_images = 0
+        super().__init__(query, total, output_dir)
+
+    def _write_content_header(self):
+        # 成功/失敗件数はヘッダーに入るため、本文は一時ファイルに書いて最後に結合する
+        self._content_path = self._content_file.name
+        self._content_file.close()
+        self._content_file = open(self._content_path + '.part', 'w', encoding='utf-8')
+
+    def _write_images_header(self):
+        f = self._images_file
+        f.write(f"🖼️ 画像URL一覧\n")
+        f.write(f"検索キーワード: {self.query}\n")
+        f.write("="*80 + "\n\n")
+
+    def write(self, result: Dict):
+        if is_success(result):
+            self.success_count += 1
+        super().write(result)
+
+    def _write_content(self, i: int, result: Dict):
+        f = self._content_file
+        f.write(f"\n{'='*80}\n")
+        f.write(f"サイト {i}: {result['url']}\n")
+        f.write(f"取得日時: {result['scraped_at']}\n")
+        f.write(f"画像数: {len(result['images'])}\n")
+        f.write("-"*80 + "\n\n")
+
+        if not is_success(result):
+            f.write(f"⚠️ {result['content']}\n")
+        else:
+            f.write(result['content'][:50000])  # 最大50000文字まで
+            if len(result['content']) > 50000:
+                f.write("\n\n[... コンテンツが長すぎるため省略 ...]\n")
+        f.write("\n\n")
+
+    def _write_site(self, i: int, result: Dict):
+        if is_success(result):
+            super()._write_site(i, result)
+
+    def _write_images(self, i: int, result: Dict):
+        if result['images']:
+            f = self._images_file
+            f.write(f"\nサイト {i}: {result['url']}\n")
+            f.write(f"画像数: {len(result['images'])}\n")
+            f.write("-"*40 + "\n")
+
+            for j, img_url in enumerate(result['images'], 1):
+                f.write(f"{j}. {img_url}\n")
+            self.total_images += len(result['images'])
+            f.write("\n")
+
+    def _ai_entry(self, result: Dict):
+        if not is_success(result):
+            return None
+        return super()._ai_entry(result)
+
+    def _ai_data(self) -> Dict:
+        return {
+            'query': self.query,
+            'scraped_at': datetime.now().isoformat(),
+            'total_sites': self.count,
+            'successful_sites': self.success_count,
+            'results': self._ai_results
+        }
+
+    def _finish_content(self):
+        self._content_file.close()
+        part_path = self._content_path + '.part'
+        with open(self._content_path, 'w', encoding='utf-8') as f:
+            f.write(f"🚀 スクレイピング結果\n")
+            f.write(f"検索キーワード: {self.query}\n")
+            f.write(f"実行日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"取得サイト数: {self.count}\n")
+            f.write("="*80 + "\n\n")
+
+            f.write(f"成功: {self.success_count}件 / 失敗: {self.count - self.success_count}件\n")
+            f.write("="*80 + "\n\n")
+
+            with open(part_path, 'r', encoding='utf-8') as part:
+                shutil.copyfileobj(part, f)
+        os.remove(part_path)
+
+    def _finish_images(self):
+        self._images_file.write(f"\n総画像数: {self.total_images}\n")
+        self._images_file.close()
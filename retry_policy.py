@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+リトライポリシー
+一時的な失敗（接続リセット・タイムアウト・429/502/503/504など）を
+ジッター付きの指数バックオフで再試行する（Retry-After ヘッダーがあればその秒数を待つ）
+"""
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Optional
+
+import aiohttp
+
+# 再試行するHTTPステータス
+RETRY_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After ヘッダー（秒数またはHTTP日付）を待ち時間（秒）に変換"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """
+    再試行の条件と待ち時間
+
+    使用例:
+        scraper = FastWebScraper(retry=RetryPolicy(max_attempts=3, base_delay=0.5))
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 10.0,
+                 multiplier: float = 2.0, jitter: bool = True,
+                 retry_statuses: Iterable[int] = RETRY_STATUSES, retry_timeouts: bool = True,
+                 max_retry_after: float = 60.0):
+        """
+        Args:
+            max_attempts: 最大試行回数（初回を含む。1なら再試行しない）
+            base_delay: 最初の再試行までの待ち時間（秒）
+            max_delay: 待ち時間の上限（秒）
+            multiplier: 再試行ごとに待ち時間を何倍にするか
+            jitter: True なら 0〜待ち時間 の間でランダムに待つ（full jitter。同時に失敗したリクエストの再試行を分散）
+            retry_statuses: 再試行するHTTPステータス
+            retry_timeouts: タイムアウトを再試行するか
+            max_retry_after: Retry-After がこれより長ければ再試行しない（秒）
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_timeouts = retry_timeouts
+        self.max_retry_after = max_retry_after
+
+    def backoff(self, attempt: int) -> float:
+        """attempt 回目の失敗後の待ち時間（秒）"""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def is_retryable(self, error: BaseException, status: Optional[int] = None) -> bool:
+        """再試行の対象となる失敗か（status はHTTPステータスエラーの場合のステータス）"""
+        if status is not None:
+            return status in self.retry_statuses
+        if isinstance(error, asyncio.TimeoutError):
+            return self.retry_timeouts
+        # 接続の失敗・リセット、本文の途中での切断
+        return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError))
+
+    def delay(self, attempt: int, error: BaseException, status: Optional[int] = None,
+              retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        再試行するまでの待ち時間（再試行しない場合はNone）
+
+        Args:
+            attempt: これまでの試行回数
+            error: 発生した例外
+            status: HTTPステータスエラーの場合のステータス
+            retry_after: Retry-After ヘッダーの秒数
+        """
+        if attempt >= self.max_attempts or not self.is_retryable(error, status):
+            return None
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            return retry_after
+        return self.backoff(attempt)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+ホスト単位の同時実行数を考慮したスクレイピングスケジューラ
+全体の同時実行数とホストごとの同時実行数を制限し、ホスト間をラウンドロビンで公平に処理する
+"""
+
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from deadline import Deadline
+
+
+def host_key(url: str) -> str:
+    """URLからホスト単位のキー（ホスト名:ポート）を取得"""
+    return urlparse(url).netloc.lower()
+
+
+class JobCancelled(Exception):
+    """ジョブのタスク自体はキャンセルされていないのに、ワーカーから CancelledError が送出された"""
+
+    def __init__(self, url: str):
+        super().__init__(f"処理がキャンセルされました: {url}")
+        self.url = url
+
+
+class _Run:
+    """iter_run() 1回分の状態"""
+    __slots__ = ('results', 'tasks', 'cancelled')
+
+    def __init__(self):
+        self.results: asyncio.Queue = asyncio.Queue()
+        self.tasks: set = set()
+        self.cancelled = False              # _cancel() で実行中のタスクをキャンセルした
+
+
+class _Job:
+    __slots__ = ('run', 'index', 'url', 'worker')
+
+    def __init__(self, run: _Run, index: int, url: str, worker: Callable[[str], Awaitable[Any]]):
+        self.run = run
+        self.index = index
+        self.url = url
+        self.worker = worker
+
+
+class HostScheduler:
+    """
+    URLバッチ用のスケジューラ
+
+    - 全体の同時実行数を max_concurrency に制限
+    - 同一ホストへの同時実行数を per_host_limit に制限
+    - 待ち行列のあるホスト間をラウンドロビンで処理
+
+    同じインスタンスを複数のバッチで共有した場合も制限は全体にかかる。
+    """
+
+    def __init__(self, max_concurrency: int = 50, per_host_limit: int = 4):
+        """
+        Args:
+            max_concurrency: 全体の最大同時実行数
+            per_host_limit: ホストごとの最大同時実行数
+        """
+        if max_concurrency < 1 or per_host_limit < 1:
+            raise ValueError("max_concurrency と per_host_limit は1以上を指定してください")
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self._queues: Dict[str, deque] = {}
+        self._ready: deque = deque()          # 待ち行列のあるホスト（ラウンドロビン順）
+        self._host_in_flight: Dict[str, int] = {}
+        self._in_flight = 0
+        self._completed = 0
+
+    @property
+    def queued(self) -> int:
+        """待ち行列にあるURL数"""
+        return sum(len(q) for q in self._queues.values())
+
+    @property
+    def in_flight(self) -> int:
+        """実行中のURL数"""
+        return self._in_flight
+
+    def stats(self) -> Dict[str, Any]:
+        """キューの深さ・実行中の数などの統計情報"""
+        hosts = set(self._queues) | set(self._host_in_flight)
+        return {
+            'queued': self.queued,
+            'in_flight': self._in_flight,
+            'completed': self._completed,
+            'active_hosts': len(hosts),
+            'hosts': {
+                host: {
+                    'queued': len(self._queues.get(host, ())),
+                    'in_flight': self._host_in_flight.get(host, 0),
+                }
+                for host in hosts
+            },
+        }
+
+    def _enqueue(self, job: _Job):
+        host = host_key(job.url)
+        queue = self._queues.get(host)
+        if queue is None:
+            queue = self._queues[host] = deque()
+            self._ready.append(host)
+        queue.append(job)
+
+    def _dispatch(self):
+        """空きがある限り、ラウンドロビンで次のホストのジョブを開始"""
+        blocked = []
+        while self._in_flight < self.max_concurrency and self._ready:
+            host = self._ready.popleft()
+            if self._host_in_flight.get(host, 0) >= self.per_host_limit:
+                # このホストは上限に達しているので次のホストへ
+                blocked.append(host)
+                continue
+
+            queue = self._queues[host]
+            job = queue.popleft()
+            if queue:
+                self._ready.append(host)
+            else:
+                del self._queues[host]
+            self._start(host, job)
+
+        # 上限に達していたホストは順番を保ったまま先頭に戻す
+        self._ready.extendleft(reversed(blocked))
+
+    def _start(self, host: str, job: _Job):
+        self._in_flight += 1
+        self._host_in_flight[host] = self._host_in_flight.get(host, 0) + 1
+        task = asyncio.ensure_future(self._run_job(host, job))
+        job.run.tasks.add(task)
+        task.add_done_callback(job.run.tasks.discard)
+
+    async def _run_job(self, host: str, job: _Job):
+        result: Any = None
+        error: Optional[BaseException] = None
+        try:
+            result = await job.worker(job.url)
+        except asyncio.CancelledError:
+            if job.run.cancelled:
+                raise
+            # ジョブ自体はキャンセルされていない（共有の処理のキャンセルが伝わった）。
+            # 結果を返さないとバッチが待ち続けるため、エラーとして返す
+            error = JobCancelled(job.url)
+        except Exception as e:
+            error = e
+        finally:
+            self._in_flight -= 1
+            remaining = self._host_in_flight[host] - 1
+            if remaining:
+                self._host_in_flight[host] = remaining
+            else:
+                del self._host_in_flight[host]
+            self._completed += 1
+            self._dispatch()
+        job.run.results.put_nowait((job.index, result, error))
+
+    def _cancel(self, run: _Run):
+        """中断されたバッチの待ち行列と実行中タスクを破棄"""
+        run.cancelled = True
+        for host in list(self._queues):
+            queue = deque(job for job in self._queues[host] if job.run is not run)
+            if queue:
+                self._queues[host] = queue
+            else:
+                del self._queues[host]
+                self._ready.remove(host)
+        for task in list(run.tasks):
+            task.cancel()
+
+    @staticmethod
+    async def _next_result(run: _Run, deadline: Optional[Deadline]) -> Optional[Tuple[int, Any, Optional[BaseException]]]:
+        """次に完了した結果（締め切りを過ぎても結果がなければNone）"""
+        if deadline is None or not run.results.empty():
+            return await run.results.get()
+        try:
+            return await asyncio.wait_for(run.results.get(), deadline.remaining())
+        except asyncio.TimeoutError:
+            # 締め切りと同時に完了した結果は取りこぼさない
+            return None if run.results.empty() else run.results.get_nowait()
+
+    async def iter_run(self, urls: List[str], worker: Callable[[str], Awaitable[Any]],
+                       deadline: Optional[Deadline] = None,
+                       on_error: Optional[Callable[[str, BaseException], Any]] = None) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        URLごとに worker を実行し、完了した順に (インデックス, 結果) を返す
+
+        worker が例外を送出したURLは on_error(URL, 例外) の戻り値（省略時は例外オブジェクト）を
+        結果として返し、残りのURLの処理はそのまま続ける。
+        途中でイテレーションを抜けた場合、未処理のURLはキャンセルされる。
+        deadline を過ぎた場合も未処理のURLをキャンセルし、それまでに完了した分だけで終了する。
+        """
+        run = _Run()
+        for index, url in enumerate(urls):
+            self._enqueue(_Job(run, index, url, worker))
+        self._dispatch()
+
+        try:
+            for _ in range(len(urls)):
+                item = await self._next_result(run, deadline)
+                if item is None:
+                    return
+                index, result, error = item
+                if error is not None:
+                    result = on_error(urls[index], error) if on_error is not None else error
+                yield index, result
+        finally:
+            self._cancel(run)
+
+    async def run(self, urls: List[str], worker: Callable[[str], Awaitable[Any]],
+                  deadline: Optional[Deadline] = None,
+                  on_error: Optional[Callable[[str, BaseException], Any]] = None) -> List[Any]:
+        """URLごとに worker を実行し、入力順の結果リストを返す（deadline までに完了しなかったURLはNone）"""
+        results: List[Any] = [None] * len(urls)
+        async for index, result in self.iter_run(urls, worker, deadline, on_error):
+            results[index] = result
+        return results
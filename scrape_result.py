@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+スクレイピング結果の型
+"""
+
+import time
+from collections.abc import Mapping
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class ScrapeStatus(str, Enum):
+    """1ページ分の取得結果の状態"""
+    OK = 'ok'                                   # 正常に取得
+    TRUNCATED = 'truncated'                     # サイズ上限で打ち切り（途中までの内容を抽出）
+    REJECTED_CONTENT_TYPE = 'rejected_content_type'  # HTML以外のContent-Typeのため本文を読まずに中止
+    HTTP_ERROR = 'http_error'                   # 200以外のHTTPステータス
+    TIMEOUT = 'timeout'                         # タイムアウト
+    DEADLINE_EXCEEDED = 'deadline_exceeded'     # 全体の締め切りまでに完了しなかった（取得を打ち切り）
+    ERROR = 'error'                             # その他のエラー
+
+    @property
+    def ok(self) -> bool:
+        """コンテンツを取得できたか（打ち切りを含む）"""
+        return self in (ScrapeStatus.OK, ScrapeStatus.TRUNCATED)
+
+
+class ScrapeResult(Mapping):
+    """
+    1ページ分のスクレイピング結果
+
+    属性で参照できるほか、従来の辞書と同じキー（url / content / images / status / scraped_at / elapsed / image_alts）でも参照できる。
+    scraped_at は属性ではUNIX時刻（float）、辞書としての参照・シリアライズ時はISO形式の文字列。
+    """
+    __slots__ = ('url', 'content', 'images', 'status', 'scraped_at', 'elapsed', 'image_alts')
+
+    _KEYS = ('url', 'content', 'images', 'status', 'scraped_at', 'elapsed', 'image_alts')
+
+    def __init__(self, url: str, content: str, images: List[str], status: ScrapeStatus = ScrapeStatus.OK,
+                 scraped_at: Optional[float] = None, elapsed: float = 0.0,
+                 image_alts: Optional[Dict[str, str]] = None):
+        self.url = url
+        self.content = content
+        self.images = images
+        self.status = status
+        self.scraped_at = time.time() if scraped_at is None else scraped_at
+        self.elapsed = elapsed
+        # altテキストのある画像だけ {画像URL: altテキスト}（1件もなければNone。辞書としての参照では空の辞書）
+        self.image_alts = image_alts or None
+
+    @property
+    def ok(self) -> bool:
+        """コンテンツを取得できたか"""
+        return self.status.ok
+
+    @property
+    def scraped_at_iso(self) -> str:
+        return datetime.fromtimestamp(self.scraped_at).isoformat()
+
+    # --- 辞書互換 ---
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'scraped_at':
+            return self.scraped_at_iso
+        if key == 'image_alts':
+            return self.image_alts or {}
+        if key in self._KEYS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSONに変換できる辞書（statusは文字列、scraped_atはISO形式）"""
+        return {
+            'url': self.url,
+            'content': self.content,
+            'images': list(self.images),
+            'status': self.status.value,
+            'scraped_at': self.scraped_at_iso,
+            'elapsed': self.elapsed,
+            'image_alts': dict(self.image_alts or {}),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> 'ScrapeResult':
+        """to_dict() や従来形式の辞書から作成"""
+        scraped_at = data.get('scraped_at')
+        if isinstance(scraped_at, str):
+            scraped_at = datetime.fromisoformat(scraped_at).timestamp()
+        return cls(data['url'], data['content'], list(data.get('images', [])),
+                   ScrapeStatus(data['status']) if data.get('status') else _legacy_status(data['content']),
+                   scraped_at, data.get('elapsed', 0.0), dict(data.get('image_alts') or {}) or None)
+
+    def __repr__(self) -> str:
+        return f"ScrapeResult(url={self.url!r}, status={self.status.value}, content={len(self.content)} chars, images={len(self.images)})"
+
+
+def _legacy_status(content: str) -> ScrapeStatus:
+    return ScrapeStatus.ERROR if content.startswith("Error:") else ScrapeStatus.OK
+
+
+def is_success(result: Mapping) -> bool:
+    """結果（ScrapeResult・辞書・JSONLから読んだ辞書）がエラーでないか"""
+    if isinstance(result, ScrapeResult):
+        return result.ok
+    status = result.get('status')
+    if status:
+        return ScrapeStatus(status).ok
+    # status のない古い形式の結果
+    return not result['content'].startswith("Error:")
@@ -2,27 +2,119 @@
 """
 プログラマブルWebスクレイピングAPI
 他のPythonスクリプトから呼び出し可能
+
+非同期コード（FastAPI・Jupyter など）では a で始まる関数を await する:
+    text = await aquick_scrape("Python 入門")
+同期関数は共有のバックグラウンドループ・セッションで同じ処理を実行する
 """
 
 from fast_scraper import FastWebScraper
+from result_db import ResultDB
+from image_downloader import ImageDownloader
+from scraper_session import ScraperSession
+from deadline import Deadline
+from search_cache import SearchCache, normalize_query
+from dns_cache import DnsCache
+from prewarm import ConnectionPrewarmer
+from search_providers import SearchRouter, BingSearch, DuckDuckGoSearch
+from url_utils import normalize_url
+from functools import partial
+from typing import Dict, List, Optional
+import asyncio
+import atexit
+import logging
 import json
 import os
+import weakref
+
+# API関数で共有する検索結果キャッシュ（quick_scrape と get_all_image_urls で同じクエリを再検索しない）
+default_search_cache = SearchCache(ttl=600)
+# API関数で共有する名前解決キャッシュと事前接続（session を省略した呼び出しでも名前解決をクエリ間で再利用）
+default_dns_cache = DnsCache(ttl=300)
+default_prewarmer = ConnectionPrewarmer()
+# API関数で共有する検索エンジン（Bingが失敗したらDuckDuckGo。失敗が続いたエンジンはすべての呼び出しでスキップ）
+default_search_router = SearchRouter([BingSearch(), DuckDuckGoSearch()], cache=default_search_cache)
+# session を省略した同期関数の呼び出しで共有するセッション（バックグラウンドループ上でkeep-alive接続を再利用）
+default_session = ScraperSession(dns_cache=default_dns_cache)
+atexit.register(default_session.close_sync)
+# session を省略した非同期関数の呼び出しで共有するセッション（イベントループごとに1つ）
+_loop_sessions: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]' = weakref.WeakKeyDictionary()
+
+async def _close_with_loop(loop: asyncio.AbstractEventLoop, session: ScraperSession):
+    """イベントループの終了時（asyncio.run() の loop.shutdown_asyncgens()）にセッションを閉じる非同期ジェネレーター"""
+    try:
+        yield
+    finally:
+        _loop_sessions.pop(loop, None)
+        await session.close()
+
+async def default_loop_session() -> ScraperSession:
+    """
+    呼び出し元のイベントループで共有するScraperSession（session を省略した a で始まる関数が使用）
+    
+    ループごとに最初の呼び出しで作成し、keep-alive接続・事前接続をクエリ間で再利用する。
+    asyncio.run() などでループが終了するときに閉じる（aclose_default_loop_session() で明示的に閉じることもできる）。
+    """
+    loop = asyncio.get_running_loop()
+    entry = _loop_sessions.get(loop)
+    if entry is None:
+        session = ScraperSession(dns_cache=default_dns_cache)
+        closer = _close_with_loop(loop, session)
+        # 1回進めておくと、ループの終了時に aclose() が呼ばれる
+        await closer.__anext__()
+        entry = _loop_sessions[loop] = (session, closer)
+    return entry[0]
+
+async def aclose_default_loop_session():
+    """呼び出し元のイベントループの共有セッションを閉じる（FastAPI の終了処理など）"""
+    entry = _loop_sessions.get(asyncio.get_running_loop())
+    if entry is not None:
+        await entry[1].aclose()
+
+def _create_scraper(session: Optional[ScraperSession], search_cache: Optional[SearchCache]) -> FastWebScraper:
+    """API関数で使うスクレイパー（search_cache を指定した場合も検索エンジンのヘルスは共有）"""
+    router = default_search_router if search_cache is None else default_search_router.with_cache(search_cache)
+    return FastWebScraper(session=session, search_router=router,
+                          dns_cache=default_dns_cache, prewarm=default_prewarmer)
+
+def _run_sync(afunc, *args, session: Optional[ScraperSession] = None, **kwargs):
+    """非同期API関数を session（省略時は default_session）のイベントループで実行して結果を返す"""
+    session = session or default_session
+    return session.run(afunc(*args, session=session, **kwargs))
 
-def scrape_with_query(query: str, save_to_file: bool = True) -> dict:
+async def _run_blocking(func, *args):
+    """ファイル・DBへの保存をイベントループの外で実行"""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+async def ascrape_with_query(query: str, save_to_file: bool = True,
+                             session: Optional[ScraperSession] = None,
+                             search_cache: Optional[SearchCache] = None,
+                             result_db: Optional[ResultDB] = None,
+                             deadline: Optional[float] = None, as_dicts: bool = False) -> dict:
     """
-    指定されたクエリでWebスクレイピングを実行
+    指定されたクエリでWebスクレイピングを実行（呼び出し元のイベントループで実行）
     
     Args:
         query: 検索キーワード
         save_to_file: ファイルに保存するかどうか
+        session: 接続を再利用するためのScraperSession（省略時は default_loop_session()）
+        search_cache: 検索結果キャッシュ（省略時は default_search_cache）
+        result_db: 結果を保存するResultDB（save_to_file とは独立）
+        deadline: 検索とページ取得の持ち時間（秒）。過ぎた時点で取得済みの結果を返し、
+            間に合わなかったURLは status が deadline_exceeded になる
+        as_dicts: results の各要素を ScrapeResult.to_dict() で辞書に変換して返す（JSONへの変換・変更用）
     
     Returns:
-        スクレイピング結果の辞書
+        スクレイピング結果の辞書（results の各要素は ScrapeResult）
     """
-    scraper = FastWebScraper()
+    if session is None:
+        session = await default_loop_session()
+    
+    scraper = _create_scraper(session, search_cache)
+    deadline = Deadline.coerce(deadline)
     
     # URLを取得
-    urls = scraper.search_bing(query, num_results=5)
+    urls = await scraper.search_async(query, num_results=5, deadline=deadline)
     
     if not urls:
         return {
@@ -33,41 +125,41 @@ def scrape_with_query(query: str, save_to_file: bool = True) -> dict:
         }
     
     # スクレイピング実行
-    import asyncio
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    results = loop.run_until_complete(scraper.scrape_urls_async(urls))
-    loop.close()
+    results = await scraper.scrape_urls_async(urls, deadline=deadline)
     
     # ファイルに保存
     output_dir = None
     if save_to_file:
-        output_dir = scraper.save_results(query, results)
+        output_dir = await _run_blocking(scraper.save_results, query, results)
+    if result_db is not None:
+        await _run_blocking(result_db.save, query, results)
     
     # 結果を返す
     return {
         'success': True,
         'query': query,
         'output_dir': output_dir,
-        'results': results
+        'results': [result.to_dict() for result in results] if as_dicts else results
     }
 
-def quick_scrape(query: str) -> str:
+def scrape_with_query(query: str, save_to_file: bool = True,
+                      session: Optional[ScraperSession] = None,
+                      search_cache: Optional[SearchCache] = None,
+                      result_db: Optional[ResultDB] = None,
+                      deadline: Optional[float] = None, as_dicts: bool = False) -> dict:
     """
-    クイックスクレイピング - テキストのみを結合して返す
-    
-    Args:
-        query: 検索キーワード
+    指定されたクエリでWebスクレイピングを実行（ascrape_with_query の同期版）
     
-    Returns:
-        全サイトのテキストを結合した文字列
+    session を省略した場合は default_session で実行する。引数・戻り値は ascrape_with_query と同じ。
     """
-    result = scrape_with_query(query, save_to_file=False)
-    
+    return _run_sync(ascrape_with_query, query, save_to_file, session=session, search_cache=search_cache,
+                     result_db=result_db, deadline=deadline, as_dicts=as_dicts)
+
+def _combine_text(result: dict) -> str:
+    """全サイトのテキストを結合"""
     if not result['success']:
         return f"Error: {result.get('error', 'Unknown error')}"
     
-    # 全テキストを結合
     combined_text = []
     for i, site_result in enumerate(result['results'], 1):
         combined_text.append(f"\n{'='*80}")
@@ -77,31 +169,231 @@ def quick_scrape(query: str) -> str:
     
     return '\n'.join(combined_text)
 
-def get_all_image_urls(query: str) -> list:
+def _collect_images(result: dict) -> list:
+    """全サイトの画像URLを収集"""
+    all_images = []
+    for site_result in result['results']:
+        all_images.extend(site_result['images'])
+    return all_images
+
+async def aquick_scrape(query: str, session: Optional[ScraperSession] = None,
+                        search_cache: Optional[SearchCache] = None, deadline: Optional[float] = None) -> str:
     """
-    指定クエリで検索して全画像URLを取得
+    クイックスクレイピング - テキストのみを結合して返す（呼び出し元のイベントループで実行）
     
     Args:
         query: 検索キーワード
+        session: 複数クエリで接続を再利用するためのScraperSession（省略時は default_loop_session()）
+        search_cache: 検索結果キャッシュ（省略時は default_search_cache）
+        deadline: 検索とページ取得の持ち時間（秒）
     
     Returns:
-        全画像URLのリスト
+        全サイトのテキストを結合した文字列
     """
-    result = scrape_with_query(query, save_to_file=False)
+    result = await ascrape_with_query(query, save_to_file=False, session=session, search_cache=search_cache,
+                                      deadline=deadline)
+    return _combine_text(result)
+
+def quick_scrape(query: str, session: Optional[ScraperSession] = None,
+                 search_cache: Optional[SearchCache] = None, deadline: Optional[float] = None) -> str:
+    """クイックスクレイピング - テキストのみを結合して返す（aquick_scrape の同期版）"""
+    return _run_sync(aquick_scrape, query, session=session, search_cache=search_cache, deadline=deadline)
+
+async def aget_all_image_urls(query: str, session: Optional[ScraperSession] = None,
+                              search_cache: Optional[SearchCache] = None, deadline: Optional[float] = None) -> list:
+    """
+    指定クエリで検索して全画像URLを取得（呼び出し元のイベントループで実行）
+    
+    Args:
+        query: 検索キーワード
+        session: 複数クエリで接続を再利用するためのScraperSession（省略時は default_loop_session()）
+        search_cache: 検索結果キャッシュ（省略時は default_search_cache）
+        deadline: 検索とページ取得の持ち時間（秒）
     
+    Returns:
+        全画像URLのリスト
+    """
+    result = await ascrape_with_query(query, save_to_file=False, session=session, search_cache=search_cache,
+                                      deadline=deadline)
     if not result['success']:
         return []
+    return _collect_images(result)
+
+def get_all_image_urls(query: str, session: Optional[ScraperSession] = None,
+                       search_cache: Optional[SearchCache] = None, deadline: Optional[float] = None) -> list:
+    """指定クエリで検索して全画像URLを取得（aget_all_image_urls の同期版）"""
+    return _run_sync(aget_all_image_urls, query, session=session, search_cache=search_cache, deadline=deadline)
+
+async def adownload_images(image_urls: List[str], output_dir: str = 'images',
+                           session: Optional[ScraperSession] = None, **kwargs) -> dict:
+    """
+    画像URLをまとめてダウンロード（呼び出し元のイベントループで実行）
     
-    # 全画像URLを収集
-    all_images = []
-    for site_result in result['results']:
-        all_images.extend(site_result['images'])
+    同じ内容の画像は1ファイルにまとめ、output_dir にダウンロード済みの画像は再取得しない。
     
-    return all_images
+    Args:
+        image_urls: 画像URLのリスト（get_all_image_urls の結果など）
+        output_dir: 保存先ディレクトリ（manifest.json にURL → ファイルの対応を記録）
+        session: 接続を再利用するためのScraperSession（省略時は default_loop_session()）
+        **kwargs: ImageDownloader に渡す引数（max_bytes, min_bytes, content_types など）
+    
+    Returns:
+        {'output_dir', 'downloads': [ImageDownload], 'stats': 状態ごとの件数}
+    """
+    # 前回のマニフェストの読み込みもイベントループの外で実行
+    downloader = await _run_blocking(partial(ImageDownloader, output_dir, **kwargs))
+    downloads = await downloader.download(image_urls, session=session or await default_loop_session())
+    
+    return {
+        'output_dir': output_dir,
+        'downloads': downloads,
+        'stats': downloader.stats()
+    }
+
+def download_images(image_urls: List[str], output_dir: str = 'images',
+                    session: Optional[ScraperSession] = None, **kwargs) -> dict:
+    """画像URLをまとめてダウンロード（adownload_images の同期版）"""
+    return _run_sync(adownload_images, image_urls, output_dir, session=session, **kwargs)
+
+async def _scrape_batch_async(scraper: FastWebScraper, queries: List[str], num_results: int,
+                              search_concurrency: int, deadline: Optional[Deadline] = None) -> Dict:
+    """複数クエリの検索を並行実行し、重複を除いたURLを1回ずつ取得"""
+    semaphore = asyncio.Semaphore(search_concurrency)
+    
+    async def search(query: str) -> List[str]:
+        async with semaphore:
+            return await scraper.search_async(query, num_results, deadline)
+    
+    # 同じクエリ（正規化後）は1回だけ検索
+    unique_queries: Dict[str, str] = {}
+    for query in queries:
+        unique_queries.setdefault(normalize_query(query), query)
+    url_lists = await asyncio.gather(*(search(q) for q in unique_queries.values()))
+    urls_by_query = dict(zip(unique_queries.keys(), url_lists))
+    
+    # クエリをまたいで同じページは1回だけ取得
+    unique_urls: Dict[str, str] = {}
+    for urls in url_lists:
+        for url in urls:
+            unique_urls.setdefault(normalize_url(url), url)
+    
+    pages: Dict[str, Dict] = {}
+    if unique_urls:
+        results = await scraper.scrape_urls_async(list(unique_urls.values()), deadline=deadline)
+        pages = dict(zip(unique_urls.keys(), results))
+    
+    return {'urls_by_query': urls_by_query, 'pages': pages}
+
+async def ascrape_batch(queries: List[str], save_to_file: bool = False,
+                        session: Optional[ScraperSession] = None,
+                        num_results: int = 5, search_concurrency: int = 8,
+                        search_cache: Optional[SearchCache] = None,
+                        result_db: Optional[ResultDB] = None,
+                        deadline: Optional[float] = None, as_dicts: bool = False) -> dict:
+    """
+    複数のクエリをまとめてスクレイピング（呼び出し元のイベントループで実行）
+    
+    検索は並行して実行し、複数のクエリで同じURLが出てきた場合も取得は1回だけ行う。
+    取得結果はクエリごとに振り分けて返す（同じページの結果はクエリ間で共有される）。
+    
+    Args:
+        queries: 検索キーワードのリスト
+        save_to_file: クエリごとにファイルに保存するかどうか
+        session: 接続を再利用するためのScraperSession（省略時は default_loop_session()）
+        num_results: クエリごとの検索結果数
+        search_concurrency: 同時に実行する検索の数
+        search_cache: 検索結果キャッシュ（省略時は default_search_cache）
+        result_db: 結果を保存するResultDB（バッチ全体を1回の実行として記録）
+        deadline: バッチ全体の検索とページ取得の持ち時間（秒）
+        as_dicts: 各ページの結果を ScrapeResult.to_dict() で辞書に変換して返す（ページごとに1回だけ変換）
+    
+    Returns:
+        {'success', 'total_queries', 'unique_urls', 'total_urls', 'queries': [scrape_with_query と同じ形式の辞書]}
+    """
+    if session is None:
+        session = await default_loop_session()
+    
+    scraper = _create_scraper(session, search_cache)
+    batch = await _scrape_batch_async(scraper, queries, num_results, search_concurrency, Deadline.coerce(deadline))
+    # ファイル・DBへの保存はイベントループの外で実行
+    return await _run_blocking(_split_batch, scraper, queries, batch, save_to_file, result_db, as_dicts)
+
+def _split_batch(scraper: FastWebScraper, queries: List[str], batch: Dict, save_to_file: bool,
+                 result_db: Optional[ResultDB], as_dicts: bool = False) -> dict:
+    """バッチの取得結果をクエリごとに振り分けて保存"""
+    # クエリごとに結果を振り分け（同じページの結果はクエリ間で共有）
+    pages = batch['pages']
+    if as_dicts:
+        pages = {key: page.to_dict() for key, page in pages.items()}
+    run_id = result_db.begin_run() if result_db is not None else None
+    query_results = []
+    total_urls = 0
+    for query in queries:
+        urls = batch['urls_by_query'][normalize_query(query)]
+        if not urls:
+            query_results.append({
+                'success': False,
+                'error': 'No search results found',
+                'query': query,
+                'results': []
+            })
+            continue
+        
+        results = [pages[normalize_url(url)] for url in urls]
+        total_urls += len(results)
+        output_dir = None
+        if save_to_file:
+            output_dir = scraper.save_results(query, results)
+        if result_db is not None:
+            result_db.add_results(run_id, query, results)
+        query_results.append({
+            'success': True,
+            'query': query,
+            'output_dir': output_dir,
+            'results': results
+        })
+    
+    if result_db is not None:
+        result_db.finish_run(run_id)
+    
+    return {
+        'success': any(r['success'] for r in query_results),
+        'total_queries': len(queries),
+        'unique_urls': len(pages),
+        'total_urls': total_urls,
+        'queries': query_results
+    }
+
+def scrape_batch(queries: List[str], save_to_file: bool = False,
+                 session: Optional[ScraperSession] = None,
+                 num_results: int = 5, search_concurrency: int = 8,
+                 search_cache: Optional[SearchCache] = None,
+                 result_db: Optional[ResultDB] = None,
+                 deadline: Optional[float] = None, as_dicts: bool = False) -> dict:
+    """複数のクエリをまとめてスクレイピング（ascrape_batch の同期版）"""
+    return _run_sync(ascrape_batch, queries, save_to_file, session=session, num_results=num_results,
+                     search_concurrency=search_concurrency, search_cache=search_cache,
+                     result_db=result_db, deadline=deadline, as_dicts=as_dicts)
+
+def scrape_batch_file(path: str, **kwargs) -> dict:
+    """
+    ファイルに書かれたクエリ（1行1クエリ、空行と#で始まる行は無視）をまとめてスクレイピング
+    
+    Args:
+        path: クエリファイルのパス
+        **kwargs: scrape_batch に渡す引数
+    
+    Returns:
+        scrape_batch の結果
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        queries = [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+    return scrape_batch(queries, **kwargs)
 
 # 使用例
 if __name__ == "__main__":
     # テスト実行
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     test_query = "Python web scraping"
     
     print("テスト実行中...")
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+スクレイパーの共通部分
+FastWebScraper / FastWebScraperV2 が共有する検索・取得・抽出・保存の非同期パイプライン
+"""
+
+import asyncio
+import aiohttp
+import logging
+import time
+from urllib.parse import urlparse
+from typing import List, Dict, Tuple, Optional, AsyncIterator, AsyncIterable, Callable, Any
+import concurrent.futures
+from functools import partial
+
+from extraction import (extract_page_raw_timed, resolve_page_images, create_executor, StreamingExtractor,
+                        STYLE_FULL, ENGINE_BS4, ENGINE_STREAM)
+from extraction_cache import ExtractionCache
+from scraper_session import ScraperSession, run_sync
+from scheduler import HostScheduler, JobCancelled
+from http_cache import HttpCache
+from search_cache import SearchCache
+from page_fetcher import PageFetcher, HttpStatusError, ContentTypeRejected, DEFAULT_MAX_BYTES
+from retry_policy import RetryPolicy
+from host_latency import HostLatencyTracker
+from deadline import Deadline
+from dns_cache import DnsCache
+from prewarm import ConnectionPrewarmer
+from search_providers import SearchRouter, SearchOutcome, SearchProvider, BingSearch
+from scrape_result import ScrapeStatus, ScrapeResult
+from result_writer import ResultWriter
+from result_sink import JsonlSink
+from metrics import (ScrapeMetrics, PHASE_SEARCH, PHASE_DOWNLOAD, PHASE_PAGE, PHASE_WRITE, PHASE_QUERY,
+                     COUNTER_PAGES, COUNTER_BYTES, COUNTER_ERRORS, COUNTER_SEARCHES)
+
+logger = logging.getLogger(__name__)
+
+
+class BaseScraper:
+    """
+    FastWebScraper / FastWebScraperV2 共通の非同期パイプライン
+    （検索 → 事前接続 → ページ取得 → 抽出 → 保存。再試行・締め切り・メトリクスを含む）
+
+    サブクラスでは抽出スタイル・出力形式・既定値などのクラス属性と、
+    同期の検索メソッド・scrape() の引数だけを定義する。
+    """
+    STYLE = STYLE_FULL                  # 抽出スタイル（extraction.STYLE_FULL / STYLE_MAIN）
+    RESULT_VIEW = ResultWriter          # 従来形式の出力（JsonlSink の view）
+    DEFAULT_TIMEOUT = 15.0              # 1ページのタイムアウトの既定値（秒）
+    VERIFY_SSL = True                   # False なら証明書を検証しない
+    BANNER = "🚀 高速Webスクレイピング開始"
+
+    def default_search_providers(self) -> List[SearchProvider]:
+        """search_router を省略した場合に使う検索エンジン"""
+        return [BingSearch()]
+
+    def __init__(self, executor: Optional[str] = None, max_workers: Optional[int] = None,
+                 engine: str = ENGINE_BS4, session: Optional[ScraperSession] = None,
+                 scheduler: Optional[HostScheduler] = None, http_cache: Optional[HttpCache] = None,
+                 search_cache: Optional[SearchCache] = None,
+                 extraction_cache: Optional[ExtractionCache] = None,
+                 max_page_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+                 sink_factory: Optional[Callable[[str, int], Any]] = None,
+                 metrics: Optional[ScrapeMetrics] = None, timeout: Optional[float] = None,
+                 retry: Optional[RetryPolicy] = None, latency: Optional[HostLatencyTracker] = None,
+                 hedge: bool = False, dns_cache: Optional[DnsCache] = None,
+                 prewarm: Optional[ConnectionPrewarmer] = None,
+                 search_router: Optional[SearchRouter] = None):
+        """
+        Args:
+            executor: HTML解析の実行先（None: イベントループ内, 'process': プロセスプール, 'thread': スレッドプール。
+                engine='stream' では受信後の解析とツリーの走査を実行し、解析途中の状態はプロセス間で
+                受け渡せないため 'process' もスレッドプールになる）
+            max_workers: エグゼキューターのワーカー数（省略時はCPUコア数）
+            engine: 抽出エンジン（'bs4': BeautifulSoup+html2text, 'lxml': シングルパス, 'stream': ダウンロードしながら解析）
+            session: 複数回のスクレイピングで共有するScraperSession（省略時は呼び出しごとに作成）
+            scheduler: 全体・ホストごとの同時実行数を制御するHostScheduler
+            http_cache: ディスク上のHTTPレスポンスキャッシュ（省略時はキャッシュしない）
+            search_cache: 検索結果キャッシュ（省略時はキャッシュしない）
+            extraction_cache: ボディのハッシュをキーにした抽出結果キャッシュ（省略時はキャッシュしない）
+            max_page_bytes: 1ページの最大ダウンロードサイズ（超えた分は打ち切り。Noneなら無制限）
+            sink_factory: (キーワード, 件数) から結果の出力先を作成する関数
+                （省略時は results.jsonl に追記し、終了時に従来形式のファイルを生成）
+            metrics: 検索・DNS・接続・TTFB・ダウンロード・解析・保存の所要時間を記録するScrapeMetrics（省略時は計測しない）
+            timeout: 1ページのタイムアウト（秒。省略時は DEFAULT_TIMEOUT。latency を指定した場合は学習前の値）
+            retry: 接続エラー・タイムアウト・429/5xxを再試行するRetryPolicy（省略時は再試行しない）
+            latency: ホストごとの応答時間のEWMAからタイムアウトを決めるHostLatencyTracker（省略時は固定の timeout）
+            hedge: True なら、ホストのTTFBのp95を過ぎても応答がないリクエストに2つ目のリクエストを並行して送る
+            dns_cache: スクレイパーが作成するセッションで共有する名前解決キャッシュ（session を指定した場合はそちらの設定を使う）
+            prewarm: 検索結果のURLが分かった時点で名前解決と接続を始めるConnectionPrewarmer（省略時は事前接続しない）
+            search_router: 検索エンジンの使い分け（省略時は default_search_providers()。cache のないルーターには search_cache を使う）
+        """
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'ja,en-US;q=0.9,en;q=0.8',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'DNT': '1',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1'
+        }
+        self.engine = engine
+        self.session = session
+        self.scheduler = scheduler or HostScheduler()
+        if search_router is None:
+            search_router = SearchRouter(self.default_search_providers(), cache=search_cache)
+        elif search_router.cache is None and search_cache is not None:
+            search_router = search_router.with_cache(search_cache)
+        self.search_router = search_router
+        self.search_cache = search_router.cache
+        self.extraction_cache = extraction_cache
+        self.metrics = metrics
+        self.dns_cache = dns_cache
+        self.sink_factory = sink_factory or partial(JsonlSink, view=self.RESULT_VIEW)
+        self.fetcher = PageFetcher(self.headers, timeout=self.DEFAULT_TIMEOUT if timeout is None else timeout,
+                                   ssl=None if self.VERIFY_SSL else False, cache=http_cache,
+                                   max_bytes=max_page_bytes, retry=retry, latency=latency, hedge=hedge,
+                                   prewarm=prewarm)
+        if engine == ENGINE_STREAM and executor == 'process':
+            logger.warning("⚠️ engine='stream' ではプロセスプールを使えないため、スレッドプールで解析します")
+            executor = 'thread'
+        self.executor_kind = executor
+        self.max_workers = max_workers
+        self._executor: Optional[concurrent.futures.Executor] = None
+        
+    def close(self):
+        """エグゼキューターを終了"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    async def extract_async(self, body: bytes, url: str, encoding: Optional[str] = None) -> Tuple[str, List[str]]:
+        """HTMLの解析・テキスト変換を実行（executorモードではワーカーに委譲）"""
+        content, images = await self._extract_images_async(body, url, encoding)
+        return content, list(images)
+    
+    async def _extract_images_async(self, body: bytes, url: str, encoding: Optional[str]) -> Tuple[str, Dict[str, str]]:
+        """(テキストコンテンツ, {画像URL: altテキスト}) を抽出"""
+        if self.extraction_cache is None:
+            raw = await self._extract_raw(body, encoding, url)
+        else:
+            # 同じボディ・設定の抽出結果があれば解析を省略
+            cache_key = self.extraction_cache.make_key(body, encoding, self.STYLE, self.engine)
+            raw = await self.extraction_cache.get_or_compute(cache_key, partial(self._extract_raw, body, encoding, url))
+        return resolve_page_images(raw, url)
+    
+    async def _extract_raw(self, body: bytes, encoding: Optional[str], url: Optional[str] = None):
+        if self.executor_kind is None:
+            raw, timings = extract_page_raw_timed(body, encoding, self.STYLE, self.engine)
+        else:
+            if self._executor is None:
+                self._executor = create_executor(self.executor_kind, self.max_workers)
+            loop = asyncio.get_running_loop()
+            raw, timings = await loop.run_in_executor(
+                self._executor, partial(extract_page_raw_timed, body, encoding, self.STYLE, self.engine))
+        if self.metrics is not None:
+            self.metrics.record_timings(timings, url=url)
+        return raw
+    
+    def _new_stream_extractor(self) -> Optional[StreamingExtractor]:
+        """'stream'エンジンならダウンロード中に解析する抽出器を作成"""
+        if self.engine != ENGINE_STREAM:
+            return None
+        digest = self.extraction_cache.new_digest() if self.extraction_cache is not None else None
+        return StreamingExtractor(self.STYLE, digest=digest)
+    
+    async def _finish_stream(self, extractor: StreamingExtractor, url: str) -> Tuple[str, Dict[str, str]]:
+        """
+        逐次解析を完了して抽出結果を返す
+
+        受信中のチャンクはイベントループ内でパーサーに渡し、残りの解析とツリーの走査は
+        executorモードならスレッドプールで実行する
+        """
+        if self.extraction_cache is None:
+            raw = await self._close_stream(extractor, url)
+        else:
+            # 同じボディ・設定の抽出結果があればツリーの走査を省略
+            cache_key = self.extraction_cache.key_from_digest(extractor.digest, extractor.encoding, self.STYLE, self.engine)
+            raw = await self.extraction_cache.get_or_compute(cache_key, partial(self._close_stream, extractor, url))
+        return resolve_page_images(raw, url)
+    
+    async def _close_stream(self, extractor: StreamingExtractor, url: str):
+        if self.executor_kind is None:
+            raw = extractor.close()
+        else:
+            if self._executor is None:
+                self._executor = create_executor(self.executor_kind, self.max_workers)
+            raw = await asyncio.get_running_loop().run_in_executor(self._executor, extractor.close)
+        if self.metrics is not None:
+            self.metrics.record_timings(extractor.timings, url=url)
+        return raw
+    
+    def _record(self, phase: str, duration: float, **kwargs):
+        """メトリクスが有効なら段階の所要時間を記録"""
+        if self.metrics is not None:
+            self.metrics.record(phase, duration, **kwargs)
+    
+    def _count(self, name: str, value: float = 1, **labels):
+        """メトリクスが有効ならカウンターを加算"""
+        if self.metrics is not None:
+            self.metrics.increment(name, value, **labels)
+    
+    def _trace_configs(self) -> Optional[List[aiohttp.TraceConfig]]:
+        """スクレイパーが作成するセッションに付けるTraceConfig（DNS・接続・TTFBの計測用）"""
+        return [self.metrics.trace_config()] if self.metrics is not None else None
+    
+    def _report_search(self, outcome: SearchOutcome, query: str, elapsed: float):
+        """検索結果のログ出力とメトリクスの記録"""
+        for provider, error in outcome.errors:
+            logger.error(f"❌ 検索エラー ({provider}): {str(error) or type(error).__name__}")
+            # 429/503 などはレート制限の兆候としてステータス付きで集計
+            self._count(COUNTER_ERRORS, type='search', status=getattr(error, 'status', None))
+        if outcome.skipped:
+            logger.warning(f"⏭️ 失敗が続いている検索エンジンをスキップしました: {', '.join(outcome.skipped)}")
+        if outcome.expired:
+            logger.warning("⏰ 締め切りを過ぎたため検索を中止しました")
+            self._count(COUNTER_ERRORS, type='deadline')
+        if outcome.provider is None:
+            error = str(outcome.errors[-1][1]) if outcome.errors else 'no results'
+            self._record(PHASE_SEARCH, elapsed, query=query, cached=False, results=0, error=error)
+            return
+        
+        if outcome.cached:
+            logger.info(f"✅ キャッシュから{len(outcome.urls)}件のURLを取得しました")
+        else:
+            logger.info(f"✅ {len(outcome.urls)}件のURLを取得しました ({outcome.provider})")
+        self._record(PHASE_SEARCH, elapsed, query=query, engine=outcome.provider, cached=outcome.cached,
+                     results=len(outcome.urls))
+        self._count(COUNTER_SEARCHES, engine=outcome.provider, cached=outcome.cached)
+    
+    async def search_async(self, query: str, num_results: int = 5, deadline: Optional[Deadline] = None,
+                           session: Optional[ScraperSession] = None) -> List[str]:
+        """
+        search_router の検索エンジンで検索して上位のURLを取得
+        
+        共有セッションで検索した場合は、ページの取得より先に結果のホストへの名前解決と接続を始める（prewarm 指定時）。
+        """
+        started = time.perf_counter()
+        logger.info(f"\n🔍 検索実行中 ({self.search_router.name}): '{query}'")
+        deadline = Deadline.coerce(deadline)
+        
+        scraper_session = session or self.session
+        owns_session = scraper_session is None
+        if owns_session:
+            scraper_session = ScraperSession(dns_cache=self.dns_cache)
+        
+        try:
+            http_session = await scraper_session.get()
+            outcome = await self.search_router.search(http_session, query, num_results, deadline, headers=self.headers)
+            if not owns_session:
+                self.fetcher.warm(http_session, outcome.urls)
+        finally:
+            if owns_session:
+                await scraper_session.close()
+        
+        self._report_search(outcome, query, time.perf_counter() - started)
+        return outcome.urls
+    
+    def _run(self, coro):
+        """同期メソッドからコルーチンを実行（session のイベントループ、省略時は共有のバックグラウンドループ）"""
+        if self.session is not None:
+            # 共有セッションのイベントループで実行（接続を再利用）
+            return self.session.run(coro)
+        return run_sync(coro)
+    
+    async def fetch_page_async(self, session: aiohttp.ClientSession, url: str) -> Tuple[str, str, List[str]]:
+        """非同期でページを取得してコンテンツと画像URLを抽出"""
+        url, content, images, _ = await self._fetch_page(session, url)
+        return url, content, list(images)
+    
+    async def _fetch_page(self, session: aiohttp.ClientSession, url: str,
+                          deadline: Optional[Deadline] = None) -> Tuple[str, str, Dict[str, str], ScrapeStatus]:
+        """ページを取得して (URL, コンテンツ, {画像URL: altテキスト}, 状態) を返す"""
+        page = None
+        try:
+            extractor = self._new_stream_extractor()
+            page = await self.fetcher.fetch(session, url, sink=extractor, deadline=deadline)
+            if not page.from_cache:
+                self._record(PHASE_DOWNLOAD, page.download_time, url=url, truncated=page.truncated)
+                self._count(COUNTER_BYTES, page.size)
+            
+            # 解析・テキスト変換・画像URL抽出（接続を解放してから実行）
+            if extractor is not None:
+                text_content, images = await self._finish_stream(extractor, url)
+            else:
+                text_content, images = await self._extract_images_async(page.body, url, page.encoding)
+            status = ScrapeStatus.TRUNCATED if page.truncated else ScrapeStatus.OK
+            return url, text_content, images, status
+                    
+        except HttpStatusError as e:
+            self._count(COUNTER_ERRORS, type='http', status=e.status)
+            return url, f"Error: HTTP {e.status}", {}, ScrapeStatus.HTTP_ERROR
+        except ContentTypeRejected as e:
+            self._count(COUNTER_ERRORS, type='content_type')
+            return url, f"Error: {e}", {}, ScrapeStatus.REJECTED_CONTENT_TYPE
+        except asyncio.TimeoutError:
+            if deadline is not None and deadline.expired:
+                # 残り時間で頭打ちにしたタイムアウト
+                self._count(COUNTER_ERRORS, type='deadline')
+                return url, "Error: Deadline exceeded", {}, ScrapeStatus.DEADLINE_EXCEEDED
+            self._count(COUNTER_ERRORS, type='timeout')
+            return url, self._timeout_message(url), {}, ScrapeStatus.TIMEOUT
+        except Exception as e:
+            # 取得後の例外は解析エラー、取得中の例外は接続エラーとして集計
+            self._count(COUNTER_ERRORS, type='parse' if page is not None else 'network')
+            return url, f"Error: {str(e)}", {}, ScrapeStatus.ERROR
+    
+    def _timeout_message(self, url: str) -> str:
+        """タイムアウトした結果の content"""
+        return "Error: Timeout"
+    
+    async def _scrape_one(self, http_session: aiohttp.ClientSession, url: str,
+                          deadline: Optional[Deadline] = None) -> ScrapeResult:
+        """1件のURLを取得して結果を作成（処理時間付き）"""
+        start = time.perf_counter()
+        url, content, images, status = await self._fetch_page(http_session, url, deadline)
+        elapsed = time.perf_counter() - start
+        self._record(PHASE_PAGE, elapsed, url=url, status=status.value)
+        self._count(COUNTER_PAGES, status=status.value)
+        image_alts = {image_url: alt for image_url, alt in images.items() if alt} or None
+        return ScrapeResult(url, content, list(images), status, time.time(), round(elapsed, 3), image_alts)
+    
+    def _deadline_result(self, url: str, elapsed: float) -> ScrapeResult:
+        """締め切りまでに完了しなかったURLの結果"""
+        self._count(COUNTER_ERRORS, type='deadline')
+        self._count(COUNTER_PAGES, status=ScrapeStatus.DEADLINE_EXCEEDED.value)
+        return ScrapeResult(url, "Error: Deadline exceeded", [], ScrapeStatus.DEADLINE_EXCEEDED, elapsed=round(elapsed, 3))
+    
+    def _error_result(self, url: str, error: BaseException) -> ScrapeResult:
+        """_scrape_one() 自体が例外を送出したURLの結果（バッチの残りのURLはそのまま処理を続ける）"""
+        self._count(COUNTER_PAGES, status=ScrapeStatus.ERROR.value)
+        if isinstance(error, JobCancelled):
+            # このページの処理はキャンセルされていない（共有の処理のキャンセルが伝わった）
+            self._count(COUNTER_ERRORS, type='cancelled')
+            return ScrapeResult(url, "Error: Cancelled", [], ScrapeStatus.ERROR)
+        self._count(COUNTER_ERRORS, type='internal')
+        return ScrapeResult(url, f"Error: {error}", [], ScrapeStatus.ERROR)
+    
+    async def _iter_scrape_indexed(self, urls: List[str], session: Optional[ScraperSession] = None,
+                                   deadline: Optional[Deadline] = None) -> AsyncIterator[Tuple[int, ScrapeResult]]:
+        """完了した順に (入力順のインデックス, 結果) を返す（締め切りを過ぎたら残りを DEADLINE_EXCEEDED として返す）"""
+        start = time.perf_counter()
+        scraper_session = session or self.session
+        owns_session = scraper_session is None
+        if owns_session:
+            scraper_session = ScraperSession(trace_configs=self._trace_configs(), dns_cache=self.dns_cache)
+        
+        try:
+            http_session = await scraper_session.get()
+            # 同時実行数の上限で待たされるURLも含め、取得より先に名前解決と接続を始める（prewarm 指定時）
+            self.fetcher.warm(http_session, urls)
+            # 全体・ホストごとの同時実行数を制限しながら取得
+            pending = set(range(len(urls)))
+            worker = partial(self._scrape_one, http_session, deadline=deadline)
+            async for index, result in self.scheduler.iter_run(urls, worker, deadline, self._error_result):
+                pending.discard(index)
+                yield index, result
+            # 締め切りで打ち切られたURL（実行中・待機中の取得はキャンセル済み）
+            for index in sorted(pending):
+                yield index, self._deadline_result(urls[index], time.perf_counter() - start)
+        finally:
+            if owns_session:
+                await scraper_session.close()
+    
+    async def iter_scrape(self, urls: List[str], session: Optional[ScraperSession] = None,
+                          deadline: Optional[float] = None) -> AsyncIterator[ScrapeResult]:
+        """
+        複数のURLをスクレイピングし、完了したものから1件ずつ返す
+        
+        deadline（秒数またはDeadline）を過ぎると未完了の取得をキャンセルし、
+        残りのURLを DEADLINE_EXCEEDED の結果として返して終了する。
+        
+        使用例:
+            async for result in scraper.iter_scrape(urls):
+                print(result['url'], result['elapsed'])
+        """
+        async for _, result in self._iter_scrape_indexed(urls, session, Deadline.coerce(deadline)):
+            yield result
+    
+    async def scrape_urls_async(self, urls: List[str], session: Optional[ScraperSession] = None,
+                                deadline: Optional[float] = None) -> List[ScrapeResult]:
+        """複数のURLを非同期で高速スクレイピング（deadline を過ぎたらそれまでの結果を返す）"""
+        logger.info(f"\n⚡ {len(urls)}件のサイトを並列スクレイピング中...")
+        
+        results: List[Optional[ScrapeResult]] = [None] * len(urls)
+        done = 0
+        prewarm = self.fetcher.prewarm
+        saved_before = prewarm.saved_time if prewarm is not None else 0.0
+        async for index, result in self._iter_scrape_indexed(urls, session, Deadline.coerce(deadline)):
+            done += 1
+            status = "✅" if result.ok else "⚠️"
+            logger.info(f"  [{done}/{len(urls)}] {status} {urlparse(result['url']).netloc} ({result['elapsed']:.2f}秒)")
+            results[index] = result
+        
+        missed = sum(1 for result in results if result.status is ScrapeStatus.DEADLINE_EXCEEDED)
+        if missed:
+            logger.warning(f"⏰ 締め切りまでに{missed}件の取得が完了しませんでした")
+        if prewarm is not None and prewarm.saved_time > saved_before:
+            logger.info(f"🔥 事前接続で短縮した接続時間: {prewarm.saved_time - saved_before:.2f}秒")
+        return results
+    
+    def open_result_writer(self, query: str, total: int):
+        """結果を1件ずつ書き込む出力先を作成（write() / close() / output_dir を持つ）"""
+        return self.sink_factory(query, total)
+    
+    def save_results(self, query: str, results: List[Dict]):
+        """スクレイピング結果をファイルに保存"""
+        start = time.perf_counter()
+        with self.open_result_writer(query, len(results)) as writer:
+            for result in results:
+                writer.write(result)
+        self._record(PHASE_WRITE, time.perf_counter() - start, query=query, results=len(results))
+        return writer.output_dir
+    
+    async def save_results_async(self, query: str, results: AsyncIterable[Dict], total: int):
+        """iter_scrape() の結果を到着した順にファイルへ保存"""
+        writer = self.open_result_writer(query, total)
+        # 保存にかかった時間（結果の到着待ちは含めない）
+        write_time = 0.0
+        try:
+            async for result in results:
+                start = time.perf_counter()
+                writer.write(result)
+                write_time += time.perf_counter() - start
+        finally:
+            # 書き込みの完了待ちと従来形式の生成はイベントループの外で実行
+            start = time.perf_counter()
+            await asyncio.get_running_loop().run_in_executor(None, writer.close)
+            write_time += time.perf_counter() - start
+            self._record(PHASE_WRITE, write_time, query=query, results=total)
+        return writer.output_dir
+    
+    async def _scrape_pipeline(self, query: Optional[str], urls: Optional[List[str]],
+                               deadline: Optional[float], session: Optional[ScraperSession]):
+        """
+        検索（urls を指定した場合は省略）・ページ取得・保存を実行して出力ディレクトリを返す
+
+        session を省略した場合は、検索とページ取得で1つのセッションを使う。
+        """
+        start_time = time.time()
+        deadline = Deadline.coerce(deadline)
+        
+        logger.info("\n" + "="*80)
+        logger.info(self.BANNER)
+        logger.info("="*80)
+        
+        scraper_session = session or self.session
+        owns_session = scraper_session is None
+        if owns_session:
+            scraper_session = ScraperSession(trace_configs=self._trace_configs(), dns_cache=self.dns_cache)
+        
+        try:
+            # URLリストの取得
+            if urls:
+                # 直接URLが指定された場合
+                logger.info(f"📌 指定された{len(urls)}件のURLを使用")
+            else:
+                urls = await self.search_async(query, num_results=5, deadline=deadline, session=scraper_session)
+                if not urls:
+                    logger.warning("❌ 検索結果が見つかりませんでした")
+                    return None
+            
+            logger.info(f"\n取得するURL:")
+            for i, url in enumerate(urls, 1):
+                logger.info(f"  {i}. {url}")
+            
+            # 非同期でスクレイピング実行
+            results = await self.scrape_urls_async(urls, session=scraper_session, deadline=deadline)
+        finally:
+            if owns_session:
+                await scraper_session.close()
+        
+        # 結果を保存（ファイルへの書き込みはイベントループの外で実行）
+        output_dir = await asyncio.get_running_loop().run_in_executor(
+            None, self.save_results, query or "Direct URLs", results)
+        
+        elapsed_time = time.time() - start_time
+        self._record(PHASE_QUERY, elapsed_time, query=query, pages=len(results))
+        logger.info(f"\n⏱️ 処理時間: {elapsed_time:.2f}秒")
+        logger.info(f"✨ スクレイピング完了！")
+        
+        return output_dir
@@ -7,7 +7,11 @@ Streamlit GUI for Web Scraping Tool
 import streamlit as st
 import pandas as pd
 from fast_scraper import FastWebScraper
-import asyncio
+from scraper_session import ScraperSession
+from deadline import Deadline
+from dns_cache import DnsCache
+from prewarm import ConnectionPrewarmer
+from search_providers import SearchRouter, BingSearch, DuckDuckGoSearch
 import json
 import os
 from datetime import datetime
@@ -19,6 +23,21 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_resource
+def get_scraper_session() -> ScraperSession:
+    """再実行をまたいで共有するHTTPセッション（keep-alive接続と名前解決の結果を再利用）"""
+    return ScraperSession(dns_cache=DnsCache(ttl=300))
+
+@st.cache_resource
+def get_prewarmer() -> ConnectionPrewarmer:
+    """検索結果のURLが分かった時点で接続を始めるプリウォーマー"""
+    return ConnectionPrewarmer()
+
+@st.cache_resource
+def get_search_router() -> SearchRouter:
+    """再実行をまたいで共有する検索エンジン（Bingが失敗したらDuckDuckGo。失敗が続いたエンジンはスキップ）"""
+    return SearchRouter([BingSearch(), DuckDuckGoSearch()])
+
 # セッション状態の初期化
 if 'scraping_results' not in st.session_state:
     st.session_state.scraping_results = None
@@ -65,20 +84,31 @@ def main():
                 with st.spinner("スクレイピング実行中... (最大30秒)"):
                     try:
                         # スクレイピング実行
-                        scraper = FastWebScraper()
+                        scraper_session = get_scraper_session()
+                        scraper = FastWebScraper(session=scraper_session, prewarm=get_prewarmer(),
+                                                 search_router=get_search_router())
+                        # 検索とページ取得を合わせて30秒で打ち切る
+                        deadline = Deadline(30)
                         
                         # URL取得
-                        urls = scraper.search_bing(search_query, num_results=5)
+                        urls = scraper.search_bing(search_query, num_results=5, deadline=deadline)
                         
                         if urls:
-                            # 非同期スクレイピング
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            results = loop.run_until_complete(scraper.scrape_urls_async(urls))
-                            loop.close()
-                            
-                            # 結果を保存
-                            output_dir = scraper.save_results(search_query, results)
+                            # 完了したサイトから順に表示・保存（共有セッションのイベントループで実行）
+                            progress = st.progress(0.0, text=f"0/{len(urls)} 件完了")
+                            live_area = st.container()
+                            results = []
+                            with scraper.open_result_writer(search_query, len(urls)) as writer:
+                                for result in scraper_session.iterate(scraper.iter_scrape(urls, deadline=deadline)):
+                                    results.append(result)
+                                    writer.write(result)
+                                    progress.progress(
+                                        len(results) / len(urls),
+                                        text=f"{len(results)}/{len(urls)} 件完了"
+                                    )
+                                    status = "✅" if result.ok else "⚠️"
+                                    live_area.write(f"{status} {result['url']} ({result['elapsed']:.2f}秒)")
+                            output_dir = writer.output_dir
                             
                             # セッション状態に保存
                             st.session_state.scraping_results = results
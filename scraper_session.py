@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+再利用可能なスクレイピング用HTTPセッション
+keep-alive・DNSキャッシュ付きのコネクションプールを複数回のスクレイピングで共有する
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import aiohttp
+
+from dns_cache import DnsCache
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_lock = threading.Lock()
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """
+    同期APIで共有するバックグラウンドのイベントループ（初回の呼び出しでデーモンスレッドを起動）
+
+    同期関数の呼び出しごとにイベントループを作成・破棄せず、すべての呼び出しでこのループを使う。
+    """
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None or _background_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='scraper-loop', daemon=True).start()
+            _background_loop = loop
+        return _background_loop
+
+
+def run_sync(coro, loop: Optional[asyncio.AbstractEventLoop] = None):
+    """
+    コルーチンをバックグラウンドのイベントループで実行して結果を返す（同期コード用）
+
+    呼び出し元のスレッドでイベントループが動いていても（Jupyter など）使えるが、
+    完了までそのループは止まるため、非同期コードからは await を使う。
+
+    Args:
+        loop: 実行するイベントループ（省略時は background_loop()）
+    """
+    loop = loop or background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("イベントループ内から同期APIは呼び出せません。await を使用してください")
+    if not loop.is_running():
+        coro.close()
+        raise RuntimeError("イベントループが停止しています")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+class ScraperSession:
+    """
+    長寿命のHTTPセッション
+
+    非同期コンテキストマネージャとして使用:
+        async with ScraperSession() as session:
+            await scraper.scrape_urls_async(urls, session=session)
+
+    同期コードから使用（共有のバックグラウンドループで実行）:
+        session = ScraperSession()
+        results = session.run(scraper.scrape_urls_async(urls, session=session))
+        session.close_sync()
+    """
+
+    def __init__(self, pool_size: int = 100, limit_per_host: int = 0,
+                 dns_ttl: int = 300, keepalive_timeout: float = 30.0,
+                 trace_configs: Optional[List[aiohttp.TraceConfig]] = None,
+                 dns_cache: Optional[DnsCache] = None):
+        """
+        Args:
+            pool_size: コネクションプール全体の最大接続数
+            limit_per_host: ホストごとの最大接続数（0なら無制限）
+            dns_ttl: DNSキャッシュの有効期間（秒。dns_cache を指定した場合はそちらのTTLを使う）
+            keepalive_timeout: アイドル接続を保持する時間（秒）
+            trace_configs: リクエストの各段階を計測する aiohttp の TraceConfig（metrics.ScrapeMetrics.trace_config() など）
+            dns_cache: 複数のセッションで共有する名前解決キャッシュ（省略時はセッションごとのキャッシュ）
+        """
+        self.pool_size = pool_size
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.trace_configs = list(trace_configs or [])
+        self.dns_cache = dns_cache
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def __aenter__(self):
+        await self.get()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._session is None or self._session.closed
+
+    async def get(self) -> aiohttp.ClientSession:
+        """aiohttpセッションを取得（初回は現在のイベントループ上に作成）"""
+        if self._session is None or self._session.closed:
+            self._loop = asyncio.get_running_loop()
+            if self.dns_cache is not None:
+                # 共有キャッシュに任せる（コネクターごとのキャッシュは使わない）
+                dns_options = {'use_dns_cache': False, 'resolver': self.dns_cache}
+            else:
+                dns_options = {'use_dns_cache': True, 'ttl_dns_cache': self.dns_ttl}
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                **dns_options,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=self.trace_configs or None)
+        return self._session
+
+    async def close(self):
+        """セッションとコネクションプールを閉じる"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _current_loop(self) -> asyncio.AbstractEventLoop:
+        """セッションのイベントループ（まだ使われていなければ共有のバックグラウンドループ）"""
+        if self._loop is None or self._loop.is_closed():
+            self._loop = background_loop()
+        return self._loop
+
+    def run(self, coro):
+        """
+        コルーチンをセッションのイベントループで実行して結果を返す（同期コード用）
+
+        セッションがまだ使われていなければ共有のバックグラウンドループで実行する。
+        """
+        return run_sync(coro, self._current_loop())
+
+    def submit(self, coro) -> Optional[concurrent.futures.Future]:
+        """
+        コルーチンをセッションのイベントループで開始し、完了を待たずに戻る
+
+        セッションがまだ使われていなければ共有のバックグラウンドループで実行する。
+        ループが停止している場合は実行せずにNoneを返す。
+        """
+        loop = self._current_loop()
+        if not loop.is_running():
+            coro.close()
+            return None
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def iterate(self, aiterator: AsyncIterator[Any]) -> Iterator[Any]:
+        """
+        非同期イテレーターをセッションのイベントループで進め、同期的に1件ずつ返す（同期コード用）
+
+        使用例:
+            for result in session.iterate(scraper.iter_scrape(urls, session=session)):
+                print(result['url'])
+        """
+        async def next_item():
+            return await aiterator.__anext__()
+
+        try:
+            while True:
+                try:
+                    yield self.run(next_item())
+                except StopAsyncIteration:
+                    break
+        finally:
+            aclose = getattr(aiterator, 'aclose', None)
+            if aclose is not None:
+                self.run(aclose())
+
+    def close_sync(self):
+        """同期コードからセッションを閉じる（共有のバックグラウンドループは停止しない）"""
+        if self._loop is not None and self._loop.is_running() and not self.closed:
+            run_sync(self.close(), self._loop)
+        self._loop = None
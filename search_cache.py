@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+検索結果キャッシュ
+クエリ → URLリストを一定時間キャッシュし、同じ（表記ゆれ程度の）クエリで検索エンジンに再アクセスしない
+"""
+
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """クエリを正規化（全角/半角の統一・大文字小文字の無視・空白の圧縮）"""
+    query = unicodedata.normalize('NFKC', query)
+    return _WHITESPACE.sub(' ', query).strip().casefold()
+
+
+class SearchCache:
+    """
+    検索結果のキャッシュ
+
+    - メモリ上のLRU（max_entries件まで）
+    - db_path を指定するとSQLiteにも保存し、プロセスをまたいで再利用
+    """
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 1024, db_path: Optional[str] = None):
+        """
+        Args:
+            ttl: キャッシュの有効期間（秒）
+            max_entries: メモリに保持する最大件数
+            db_path: 永続化用のSQLiteファイル（省略時はメモリのみ）
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memory: 'OrderedDict[str, Tuple[List[str], float]]' = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                " key TEXT PRIMARY KEY, query TEXT, urls TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(provider: str, query: str, num_results: int) -> str:
+        return f"{provider}:{num_results}:{normalize_query(query)}"
+
+    def get(self, provider: str, query: str, num_results: int) -> Optional[List[str]]:
+        """キャッシュされたURLリストを取得（なければ・期限切れならNone）"""
+        key = self.make_key(provider, query, num_results)
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                urls, stored_at = item
+                if now - stored_at < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return list(urls)
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT urls, stored_at FROM search_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if now - row[1] < self.ttl:
+                        urls = json.loads(row[0])
+                        self._remember(key, urls, row[1])
+                        self.disk_hits += 1
+                        return list(urls)
+                    self._db.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, provider: str, query: str, num_results: int, urls: List[str]):
+        """URLリストを保存（空の結果は保存しない）"""
+        if not urls:
+            return
+        key = self.make_key(provider, query, num_results)
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, list(urls), stored_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, query, urls, stored_at) VALUES (?, ?, ?, ?)",
+                    (key, query, json.dumps(urls, ensure_ascii=False), stored_at)
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, urls: List[str], stored_at: float):
+        self._memory[key] = (urls, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def purge_expired(self) -> int:
+        """期限切れのエントリを削除し、削除件数を返す（SQLite使用時はSQLite側の件数）"""
+        threshold = time.time() - self.ttl
+        with self._lock:
+            expired = [key for key, (_, stored_at) in self._memory.items() if stored_at <= threshold]
+            for key in expired:
+                del self._memory[key]
+            removed = len(expired)
+            if self._db is not None:
+                cursor = self._db.execute("DELETE FROM search_cache WHERE stored_at <= ?", (threshold,))
+                self._db.commit()
+                removed = cursor.rowcount
+        return removed
+
+    def clear(self):
+        """キャッシュを全て削除"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM search_cache")
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # --- 非同期ラッパー（SQLiteを使う場合はスレッドで実行） ---
+
+    async def aget(self, provider: str, query: str, num_results: int) -> Optional[List[str]]:
+        if self._db is None:
+            return self.get(provider, query, num_results)
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, provider, query, num_results)
+
+    async def aput(self, provider: str, query: str, num_results: int, urls: List[str]):
+        if self._db is None:
+            self.put(provider, query, num_results, urls)
+            return
+        await asyncio.get_running_loop().run_in_executor(None, self.put, provider, query, num_results, list(urls))
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット・ミスなどの統計情報"""
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'entries': len(self._memory),
+        }
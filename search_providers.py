@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+検索エンジンのバックエンド
+Bing・DuckDuckGo を同じインターフェースで非同期に検索し、SearchRouter で
+順番に試す（fallback）・同時に問い合わせて最初の結果を使う（race）・結果をまとめる（merge）
+レート制限などで失敗したプロバイダーは一定時間スキップする
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from deadline import Deadline
+from retry_policy import parse_retry_after
+from search_cache import SearchCache
+from url_utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+MODE_FALLBACK = 'fallback'    # 先頭のプロバイダーから順に、結果が得られるまで試す
+MODE_RACE = 'race'            # すべてのプロバイダーに同時に問い合わせ、最初に得られた結果を使う
+MODE_MERGE = 'merge'          # すべてのプロバイダーの結果を順位ごとに交互に並べ、重複を除いてまとめる
+MODES = (MODE_FALLBACK, MODE_RACE, MODE_MERGE)
+
+
+class SearchError(Exception):
+    """検索エンジンが200以外を返した"""
+
+    def __init__(self, provider: str, status: int, retry_after: Optional[float] = None,
+                 rate_limited: bool = False):
+        super().__init__(f"{provider}: HTTP {status}")
+        self.provider = provider
+        self.status = status
+        self.retry_after = retry_after
+        self.rate_limited = rate_limited
+
+
+class SearchProvider:
+    """
+    検索エンジンのバックエンド
+
+    サブクラスで name / SEARCH_URL / params() / parse() を定義する。
+    """
+    name = 'search'
+    SEARCH_URL = ''
+    # レート制限・ブロックを示すステータス（このステータスなら直ちにスキップの対象にする）
+    RATE_LIMIT_STATUSES: Tuple[int, ...] = (429, 503)
+
+    def __init__(self, search_url: Optional[str] = None):
+        """
+        Args:
+            search_url: 検索URL（省略時は SEARCH_URL。テストやベンチマークではローカルのサーバーを指定）
+        """
+        self.search_url = search_url or self.SEARCH_URL
+
+    def params(self, query: str, num_results: int) -> Dict[str, str]:
+        """検索URLのクエリパラメーター"""
+        return {'q': query}
+
+    def parse(self, html: str, num_results: int) -> List[str]:
+        """検索結果ページからURLを上位 num_results 件まで取り出す"""
+        raise NotImplementedError
+
+    async def search(self, session: aiohttp.ClientSession, query: str, num_results: int,
+                     timeout: float, headers: Optional[Dict[str, str]] = None) -> List[str]:
+        """
+        検索してURLのリストを返す
+
+        Raises:
+            SearchError: 200以外のステータス
+            asyncio.TimeoutError: タイムアウト
+        """
+        async with session.get(self.search_url, params=self.params(query, num_results), headers=headers,
+                               timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status != 200:
+                raise SearchError(self.name, response.status,
+                                  parse_retry_after(response.headers.get('Retry-After')),
+                                  rate_limited=response.status in self.RATE_LIMIT_STATUSES)
+            html = await response.text(errors='replace')
+        return self.parse(html, num_results)
+
+    @staticmethod
+    def _collect_links(soup: BeautifulSoup, urls: List[str], num_results: int, excluded_hosts: Sequence[str]):
+        """代替セレクター: ページ内の外部リンクを検索結果として追加"""
+        for link in soup.find_all('a', href=True):
+            if len(urls) >= num_results:
+                break
+            href = link['href']
+            if href.startswith('http') and not any(host in href for host in excluded_hosts):
+                if href not in urls:
+                    urls.append(href)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.search_url!r})"
+
+
+class BingSearch(SearchProvider):
+    """Bing検索"""
+    name = 'bing'
+    SEARCH_URL = "https://www.bing.com/search"
+
+    def params(self, query: str, num_results: int) -> Dict[str, str]:
+        return {'q': query, 'count': str(num_results * 2)}
+
+    def parse(self, html: str, num_results: int) -> List[str]:
+        soup = BeautifulSoup(html, 'lxml')
+        urls: List[str] = []
+
+        # 通常の検索結果を取得
+        for result in soup.find_all('li', class_='b_algo'):
+            link = result.find('h2')
+            if link and link.find('a'):
+                url = link.find('a').get('href')
+                if url and url.startswith('http'):
+                    urls.append(url)
+                    if len(urls) >= num_results:
+                        break
+
+        # 代替の検索結果セレクター
+        if len(urls) < num_results:
+            self._collect_links(soup, urls, num_results, ('bing.com', 'microsoft.com'))
+        return urls[:num_results]
+
+
+class DuckDuckGoSearch(SearchProvider):
+    """DuckDuckGo検索（HTML版）"""
+    name = 'duckduckgo'
+    SEARCH_URL = "https://html.duckduckgo.com/html/"
+    # 機械的なアクセスと判定すると 202 で確認ページを返す
+    RATE_LIMIT_STATUSES = (202, 403, 429, 503)
+
+    @staticmethod
+    def _target(href: str) -> Optional[str]:
+        """結果のリンク（//duckduckgo.com/l/?uddg=<URL> のリダイレクトを含む）から遷移先のURLを取り出す"""
+        if href.startswith('//'):
+            href = 'https:' + href
+        parts = urlsplit(href)
+        if parts.hostname and parts.hostname.endswith('duckduckgo.com') and parts.path.startswith('/l/'):
+            targets = parse_qs(parts.query).get('uddg')
+            return targets[0] if targets else None
+        return href if href.startswith('http') else None
+
+    def parse(self, html: str, num_results: int) -> List[str]:
+        soup = BeautifulSoup(html, 'lxml')
+        urls: List[str] = []
+
+        # DuckDuckGoの検索結果を取得
+        for result in soup.find_all('a', class_='result__a'):
+            url = self._target(result.get('href') or '')
+            if url and url not in urls:
+                urls.append(url)
+                if len(urls) >= num_results:
+                    break
+
+        # 代替セレクター
+        if len(urls) < num_results:
+            self._collect_links(soup, urls, num_results, ('duckduckgo.com',))
+        return urls[:num_results]
+
+
+class ProviderHealth:
+    """プロバイダーごとの成功・失敗の記録と、スキップする期限"""
+    __slots__ = ('successes', 'failures', 'empty', 'consecutive_failures', 'disabled_until',
+                 'latency', 'last_error')
+
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.empty = 0                      # 200だったが結果が0件
+        self.consecutive_failures = 0
+        self.disabled_until = 0.0           # time.monotonic() 基準
+        self.latency: Optional[float] = None  # 成功した検索の所要時間のEWMA（秒）
+        self.last_error: Optional[str] = None
+
+    def available(self, now: Optional[float] = None) -> bool:
+        return (time.monotonic() if now is None else now) >= self.disabled_until
+
+    def to_dict(self) -> Dict:
+        return {
+            'available': self.available(),
+            'successes': self.successes,
+            'failures': self.failures,
+            'empty': self.empty,
+            'consecutive_failures': self.consecutive_failures,
+            'retry_in': max(0.0, self.disabled_until - time.monotonic()),
+            'latency': self.latency,
+            'last_error': self.last_error,
+        }
+
+
+class SearchOutcome:
+    """SearchRouter.search() の結果"""
+    __slots__ = ('urls', 'provider', 'cached', 'errors', 'skipped', 'expired')
+
+    def __init__(self, urls: Optional[List[str]] = None, provider: Optional[str] = None, cached: bool = False):
+        self.urls: List[str] = urls or []
+        self.provider = provider                            # 結果を返したプロバイダー（merge ではルーター名）
+        self.cached = cached
+        self.errors: List[Tuple[str, BaseException]] = []   # (プロバイダー名, 例外)
+        self.skipped: List[str] = []                        # 失敗が続いているためスキップしたプロバイダー
+        self.expired = False                                # 締め切りを過ぎたため検索しなかった
+
+    def __repr__(self) -> str:
+        return f"SearchOutcome(provider={self.provider!r}, urls={len(self.urls)}, cached={self.cached}, errors={len(self.errors)})"
+
+
+class SearchRouter:
+    """
+    複数の検索プロバイダーの使い分け
+
+    失敗したプロバイダーは一定時間スキップする（レート制限を示すステータスなら1回で、
+    それ以外の失敗は failure_threshold 回続いたら。失敗が続くほど長く、Retry-After があればその秒数）。
+
+    使用例:
+        router = SearchRouter([BingSearch(), DuckDuckGoSearch()], mode='race')
+        scraper = FastWebScraper(search_router=router)
+    """
+
+    def __init__(self, providers: Sequence[SearchProvider], mode: str = MODE_FALLBACK, timeout: float = 10.0,
+                 cache: Optional[SearchCache] = None, cooldown: float = 30.0, max_cooldown: float = 600.0,
+                 failure_threshold: int = 2, alpha: float = 0.2):
+        """
+        Args:
+            providers: 検索プロバイダー（fallback では先頭から順に試す）
+            mode: 'fallback'（順番に試す）, 'race'（同時に問い合わせて最初の結果）, 'merge'（すべての結果をまとめる）
+            timeout: 1回の検索のタイムアウト（秒）
+            cache: 検索結果キャッシュ（プロバイダー名ごとに保存。merge では全プロバイダーの名前を連結したキー）
+            cooldown: 失敗したプロバイダーをスキップする最初の時間（秒。失敗が続くごとに2倍）
+            max_cooldown: スキップする時間の上限（秒）
+            failure_threshold: レート制限以外の失敗が何回続いたらスキップするか
+            alpha: 所要時間のEWMAの重み
+        """
+        if not providers:
+            raise ValueError("providers を1つ以上指定してください")
+        if mode not in MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        self.providers = list(providers)
+        self.mode = mode
+        self.timeout = timeout
+        self.cache = cache
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failure_threshold = max(1, failure_threshold)
+        self.alpha = alpha
+        self.health: Dict[str, ProviderHealth] = {provider.name: ProviderHealth() for provider in self.providers}
+        # scraper_api の default_search_router は複数のイベントループ（スレッド）で共有されるため、ヘルスの更新はロックで保護
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return '+'.join(provider.name for provider in self.providers)
+
+    def with_cache(self, cache: Optional[SearchCache]) -> 'SearchRouter':
+        """キャッシュだけを差し替えたルーター（プロバイダーとヘルスの記録は共有）"""
+        router = SearchRouter(self.providers, self.mode, self.timeout, cache, self.cooldown,
+                              self.max_cooldown, self.failure_threshold, self.alpha)
+        router.health = self.health
+        router._lock = self._lock
+        return router
+
+    def stats(self) -> Dict[str, Dict]:
+        """プロバイダーごとの成功・失敗数、スキップ中か、所要時間"""
+        with self._lock:
+            return {name: health.to_dict() for name, health in self.health.items()}
+
+    # --- ヘルスの記録 ---
+
+    def _succeeded(self, provider: SearchProvider, elapsed: float, urls: List[str]):
+        with self._lock:
+            health = self.health[provider.name]
+            health.consecutive_failures = 0
+            health.disabled_until = 0.0
+            if not urls:
+                health.empty += 1
+                return
+            health.successes += 1
+            health.latency = elapsed if health.latency is None else health.latency + self.alpha * (elapsed - health.latency)
+
+    def _failed(self, provider: SearchProvider, error: BaseException):
+        rate_limited = isinstance(error, SearchError) and error.rate_limited
+        with self._lock:
+            health = self.health[provider.name]
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.last_error = str(error) or type(error).__name__
+            if not rate_limited and health.consecutive_failures < self.failure_threshold:
+                return
+            # スキップの対象になった回から数えて、失敗が続くごとに2倍
+            streak = health.consecutive_failures - (1 if rate_limited else self.failure_threshold)
+            delay = min(self.max_cooldown, self.cooldown * 2 ** max(0, streak))
+            if isinstance(error, SearchError) and error.retry_after is not None:
+                delay = min(self.max_cooldown, error.retry_after)
+            health.disabled_until = time.monotonic() + delay
+        logger.warning(f"⏸️ 検索エンジン {provider.name} を{delay:.0f}秒間スキップします（{health.last_error}）")
+
+    # --- 検索 ---
+
+    async def _attempt(self, provider: SearchProvider, session: aiohttp.ClientSession, query: str,
+                       num_results: int, timeout: float, headers: Optional[Dict[str, str]],
+                       outcome: SearchOutcome) -> List[str]:
+        """1つのプロバイダーで検索（失敗した場合は outcome.errors に記録して空のリストを返す）"""
+        start = time.perf_counter()
+        try:
+            urls = await provider.search(session, query, num_results, timeout, headers)
+        except (SearchError, asyncio.TimeoutError, aiohttp.ClientError, OSError, ValueError) as e:
+            self._failed(provider, e)
+            outcome.errors.append((provider.name, e))
+            return []
+        self._succeeded(provider, time.perf_counter() - start, urls)
+        return urls
+
+    async def _cached(self, query: str, num_results: int) -> Optional[SearchOutcome]:
+        if self.cache is None:
+            return None
+        keys = [self.name] if self.mode == MODE_MERGE else [provider.name for provider in self.providers]
+        for key in keys:
+            urls = await self.cache.aget(key, query, num_results)
+            if urls is not None:
+                return SearchOutcome(urls, key, cached=True)
+        return None
+
+    async def search(self, session: aiohttp.ClientSession, query: str, num_results: int = 5,
+                     deadline: Optional[Deadline] = None,
+                     headers: Optional[Dict[str, str]] = None) -> SearchOutcome:
+        """
+        検索してURLを取得
+
+        Args:
+            session: 検索に使うaiohttpセッション
+            query: 検索キーワード
+            num_results: 取得する件数
+            deadline: 全体の締め切り（タイムアウトを残り時間で頭打ちにする）
+            headers: リクエストヘッダー
+        """
+        cached = await self._cached(query, num_results)
+        if cached is not None:
+            return cached
+
+        outcome = SearchOutcome()
+        now = time.monotonic()
+        providers = []
+        with self._lock:
+            for provider in self.providers:
+                if self.health[provider.name].available(now):
+                    providers.append(provider)
+                else:
+                    outcome.skipped.append(provider.name)
+
+        def timeout() -> float:
+            return deadline.cap(self.timeout) if deadline is not None else self.timeout
+
+        if self.mode == MODE_FALLBACK:
+            for provider in providers:
+                if timeout() <= 0:
+                    outcome.expired = True
+                    break
+                urls = await self._attempt(provider, session, query, num_results, timeout(), headers, outcome)
+                if urls:
+                    outcome.urls, outcome.provider = urls, provider.name
+                    break
+        elif providers:
+            if timeout() <= 0:
+                outcome.expired = True
+            elif self.mode == MODE_RACE:
+                await self._race(providers, session, query, num_results, timeout(), headers, outcome)
+            else:
+                await self._merge(providers, session, query, num_results, timeout(), headers, outcome)
+
+        if outcome.urls and self.cache is not None:
+            await self.cache.aput(outcome.provider, query, num_results, outcome.urls)
+        return outcome
+
+    async def _race(self, providers: List[SearchProvider], session: aiohttp.ClientSession, query: str,
+                    num_results: int, timeout: float, headers: Optional[Dict[str, str]], outcome: SearchOutcome):
+        """同時に問い合わせ、最初に結果を返したプロバイダーを使う（残りはキャンセル）"""
+        tasks = {
+            asyncio.ensure_future(self._attempt(provider, session, query, num_results, timeout, headers, outcome)): provider
+            for provider in providers
+        }
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider = tasks.pop(task)
+                    urls = task.result()
+                    if urls and not outcome.urls:
+                        outcome.urls, outcome.provider = urls, provider.name
+                if outcome.urls:
+                    return
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _merge(self, providers: List[SearchProvider], session: aiohttp.ClientSession, query: str,
+                     num_results: int, timeout: float, headers: Optional[Dict[str, str]], outcome: SearchOutcome):
+        """すべてのプロバイダーの結果を順位ごとに交互に並べ、同じページを除いて num_results 件にまとめる"""
+        url_lists = await asyncio.gather(*(
+            self._attempt(provider, session, query, num_results, timeout, headers, outcome) for provider in providers
+        ))
+        merged: Dict[str, str] = {}
+        for rank in range(max(map(len, url_lists), default=0)):
+            for urls in url_lists:
+                if rank < len(urls):
+                    merged.setdefault(normalize_url(urls[rank]), urls[rank])
+        if merged:
+            outcome.urls = list(merged.values())[:num_results]
+            outcome.provider = self.name
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+ベンチマーク（ローカルの検索エンジンと合成サイト群）のテスト
+"""
+
+import asyncio
+
+from aiohttp.test_utils import TestServer, TestClient
+
+from benchmark import SiteFarm, run_benchmark, percentile
+
+
+def test_site_farm_is_deterministic():
+    """合成ページはシードと番号から決定的に作られ、検索結果ページは指定した範囲のページを返す"""
+    async def main():
+        farm = SiteFarm([8001, 8002], size_kb=4, latency_ms=0, jitter_ms=0, failure_rate=0.3, seed=1)
+        async with TestClient(TestServer(farm.create_app())) as client:
+            first = [await (await client.get(f'/page/{n}')).read() for n in range(20)]
+            second = [await (await client.get(f'/page/{n}')).read() for n in range(20)]
+            statuses = [(await client.get(f'/page/{n}')).status for n in range(20)]
+            serp = await (await client.get('/bing/search', params={'q': 'bench 5 3'})).text()
+        return first, second, statuses, serp
+
+    first, second, statuses, serp = asyncio.run(main())
+    assert first == second
+    assert 200 in statuses and set(statuses) - {200}
+    assert all(len(body) >= 4 * 1024 for body, status in zip(first, statuses) if status == 200)
+    assert serp.count('class="b_algo"') == 3
+    assert 'http://127.0.0.1:8002/page/5' in serp and 'http://127.0.0.1:8001/page/8' not in serp
+
+
+def test_percentile():
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+
+
+def test_small_run_for_both_scrapers():
+    """v1 / v2 とも、ローカルのサイト群の全ページを検索・取得・保存できる"""
+    reports = run_benchmark(('v1', 'v2'), hosts=2, pages=12, results_per_query=6, fetch_sample=2,
+                            size_kb=4, latency_ms=0, jitter_ms=0, images=2)
+    assert [report['scraper'] for report in reports] == ['v1', 'v2']
+    for report in reports:
+        assert 'error' not in report, report
+        assert report['search']['urls'] == 12
+        assert report['scrape']['pages'] == report['scrape']['ok'] == 12
+        assert report['fetch']['pages'] == 2
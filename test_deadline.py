@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+全体の締め切り（部分的な結果を返す）のテスト（ネットワークに接続せずローカルのサーバーで実行）
+"""
+
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from deadline import Deadline
+from fast_scraper import FastWebScraper
+from scrape_result import ScrapeStatus
+
+
+async def fast(request):
+    return web.Response(text="<html><body><p>fast</p></body></html>", content_type='text/html')
+
+
+async def slow(request):
+    await asyncio.sleep(5)
+    return web.Response(text="<html><body><p>slow</p></body></html>", content_type='text/html')
+
+
+def _app() -> web.Application:
+    app = web.Application()
+    app.router.add_get('/fast', fast)
+    app.router.add_get('/slow', slow)
+    return app
+
+
+def test_deadline_helpers():
+    deadline = Deadline(10)
+    assert Deadline.coerce(None) is None
+    assert Deadline.coerce(deadline) is deadline
+    assert isinstance(Deadline.coerce(5), Deadline)
+    assert 9 < deadline.remaining() <= 10
+    assert deadline.cap(3) == 3
+    assert not deadline.expired
+    assert Deadline(0).expired and Deadline(0).remaining() == 0.0
+
+
+def test_partial_results_by_deadline():
+    """締め切りまでに完了した結果を返し、残りは DEADLINE_EXCEEDED になる"""
+    async def main():
+        async with TestServer(_app()) as server:
+            urls = [str(server.make_url('/fast')), str(server.make_url('/slow'))]
+            scraper = FastWebScraper()
+            started = time.perf_counter()
+            results = await scraper.scrape_urls_async(urls, deadline=0.5)
+            return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(main())
+    assert elapsed < 2
+    assert [result.status for result in results] == [ScrapeStatus.OK, ScrapeStatus.DEADLINE_EXCEEDED]
+    assert 'fast' in results[0].content
+
+
+def test_iter_scrape_yields_every_url():
+    """iter_scrape は締め切りで打ち切った分も含めて全URLの結果を返す"""
+    async def main():
+        async with TestServer(_app()) as server:
+            urls = [str(server.make_url('/slow')), str(server.make_url('/fast'))]
+            return [result async for result in FastWebScraper().iter_scrape(urls, deadline=0.5)]
+
+    results = asyncio.run(main())
+    assert [result.status for result in results] == [ScrapeStatus.OK, ScrapeStatus.DEADLINE_EXCEEDED]
+    assert results[1].url.endswith('/slow')
+
+
+class ForeignCancelScraper(FastWebScraper):
+    """抽出中に、ページ自体のタスクではない処理から CancelledError が伝わるスクレイパー"""
+
+    async def _extract_raw(self, body, encoding, url=None):
+        raise asyncio.CancelledError()
+
+
+def test_foreign_cancellation_is_reported():
+    """ページのタスク自体がキャンセルされていなければ、結果から落とさずエラーとして返す"""
+    async def main():
+        async with TestServer(_app()) as server:
+            urls = [str(server.make_url('/fast'))]
+            return await asyncio.wait_for(ForeignCancelScraper().scrape_urls_async(urls), 5)
+
+    results = asyncio.run(main())
+    assert len(results) == 1
+    assert results[0].status is ScrapeStatus.ERROR
+    assert results[0].content == "Error: Cancelled"
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+名前解決キャッシュと事前接続のテスト（ネットワークに接続せずローカルのサーバーで実行）
+"""
+
+import asyncio
+import socket
+
+import aiohttp
+from aiohttp import web
+from aiohttp.abc import AbstractResolver
+from aiohttp.test_utils import TestServer
+
+from dns_cache import DnsCache
+from fast_scraper import FastWebScraper
+from metrics import ScrapeMetrics, PHASE_CONNECT, PHASE_TTFB
+from prewarm import ConnectionPrewarmer
+from scrape_result import ScrapeStatus
+from scheduler import HostScheduler
+
+
+class CountingResolver(AbstractResolver):
+    """どのホスト名も 127.0.0.1 に解決し、実際の名前解決の回数を数えるリゾルバー"""
+
+    calls = 0
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        CountingResolver.calls += 1
+        await asyncio.sleep(0.05)
+        return [{'hostname': host, 'host': '127.0.0.1', 'port': port, 'family': socket.AF_INET,
+                 'proto': 0, 'flags': socket.AI_NUMERICHOST}]
+
+    async def close(self):
+        pass
+
+
+def _app(peers: set) -> web.Application:
+    async def page(request):
+        peers.add(request.transport.get_extra_info('peername')[1])
+        return web.Response(text="<html><body><p>本文</p></body></html>", content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/page', page)
+    return app
+
+
+def test_concurrent_lookups_are_coalesced(monkeypatch):
+    """同じホストへの同時の名前解決は1回にまとめ、TTLが切れたら解決し直す"""
+    monkeypatch.setattr(CountingResolver, 'calls', 0)
+
+    async def main():
+        cache = DnsCache(ttl=0.2, resolver_factory=CountingResolver)
+        results = await asyncio.gather(*(cache.resolve('example.test', 80) for _ in range(5)))
+        assert all(addrs[0]['host'] == '127.0.0.1' for addrs in results)
+        assert CountingResolver.calls == 1
+        assert cache.stats()['misses'] == 1 and cache.stats()['hits'] == 4
+
+        assert await cache.prefetch('example.test', 80)
+        assert CountingResolver.calls == 1
+
+        await asyncio.sleep(0.25)
+        assert cache.get('example.test', 80) is None
+        await cache.resolve('example.test', 80)
+        assert CountingResolver.calls == 2
+        await cache.close()
+
+    asyncio.run(main())
+
+
+def test_cache_is_shared_across_runs(monkeypatch):
+    """スクレイパーが作成するセッションが変わっても、共有したキャッシュで名前解決は1回で済む"""
+    monkeypatch.setattr(CountingResolver, 'calls', 0)
+
+    async def main():
+        async with TestServer(_app(set())) as server:
+            url = f"http://localhost:{server.port}/page"
+            dns_cache = DnsCache(resolver_factory=CountingResolver)
+            scraper = FastWebScraper(dns_cache=dns_cache)
+            first = await scraper.scrape_urls_async([url])
+            second = await scraper.scrape_urls_async([url])
+            await dns_cache.close()
+            return first + second, dns_cache
+
+    results, dns_cache = asyncio.run(main())
+    assert all(result.status is ScrapeStatus.OK for result in results)
+    assert CountingResolver.calls == 1
+    assert dns_cache.stats()['hits'] >= 1
+
+
+def test_prewarmed_connection_is_reused(monkeypatch):
+    """事前接続した接続を取得で再利用し、同じオリジンへ2本目の接続を張らない"""
+    monkeypatch.setattr(CountingResolver, 'calls', 0)
+    peers = set()
+
+    async def main():
+        async with TestServer(_app(peers)) as server:
+            urls = [f"http://localhost:{server.port}/page?{i}" for i in range(3)]
+            prewarm = ConnectionPrewarmer()
+            scraper = FastWebScraper(dns_cache=DnsCache(resolver_factory=CountingResolver), prewarm=prewarm,
+                                     scheduler=HostScheduler(per_host_limit=1))
+            return await scraper.scrape_urls_async(urls), prewarm
+
+    results, prewarm = asyncio.run(main())
+    assert all(result.status is ScrapeStatus.OK for result in results)
+    stats = prewarm.stats()
+    assert stats['warmed'] == 1 and stats['failed'] == 0 and stats['used'] == 1
+    assert len(peers) == 1
+    assert CountingResolver.calls == 1
+
+
+def test_prewarm_uses_head_and_is_not_traced():
+    """事前接続はオリジンへのHEADリクエストで行い、取得のメトリクス（接続・TTFB）には含めない"""
+    requests = []
+    peers = set()
+
+    async def main():
+        async def root(request):
+            requests.append((request.method, request.path))
+            peers.add(request.transport.get_extra_info('peername')[1])
+            return web.Response(text="<html></html>", content_type='text/html')
+
+        app = _app(peers)
+        app.router.add_get('/', root)
+        async with TestServer(app) as server:
+            metrics = ScrapeMetrics()
+            prewarm = ConnectionPrewarmer()
+            scraper = FastWebScraper(metrics=metrics, prewarm=prewarm)
+            await scraper.scrape_urls_async([str(server.make_url('/page'))])
+            return metrics, prewarm
+
+    metrics, prewarm = asyncio.run(main())
+    assert requests == [('HEAD', '/')] and len(peers) == 1
+    assert prewarm.stats()['used'] == 1
+    assert metrics.histogram(PHASE_TTFB).count == 1
+    assert metrics.histogram(PHASE_CONNECT) is None
+
+
+def test_shared_prewarmer_across_loops():
+    """複数のスレッドのイベントループで1つのプリウォーマーを共有しても件数が揃う"""
+    prewarm = ConnectionPrewarmer()
+
+    def run(port: int):
+        async def main():
+            async with aiohttp.ClientSession() as session:
+                for i in range(20):
+                    prewarm.warm(session, [f"http://127.0.0.1:{port}/page?{i}"])
+                    await prewarm.ready(session, f"http://127.0.0.1:{port}/page?{i}")
+        asyncio.run(main())
+
+    async def serve():
+        async with TestServer(_app(set())) as server:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(None, run, server.port) for _ in range(4)))
+
+    asyncio.run(serve())
+    stats = prewarm.stats()
+    assert stats['warmed'] + stats['failed'] == 80 and stats['used'] == stats['warmed'] == 80
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+HTMLの抽出処理のテスト（ネットワークに接続せずローカルのサーバーで実行）
+"""
+
+import asyncio
+import threading
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import scraper_base
+from extraction import extract_page, parse_srcset, largest_srcset_candidate, ENGINE_BS4, ENGINE_LXML
+from fast_scraper import FastWebScraper
+from scrape_result import ScrapeStatus
+
+PAGE = ("<html><head><title>抽出</title></head><body><h1>見出し</h1>"
+        "<p>本文の<b>段落</b>です。</p><img src='/a.png' alt='画像'></body></html>")
+
+
+def _scrape(paths, **kwargs):
+    """ローカルのサーバーから paths のページを取得した結果と、使用したスクレイパーを返す"""
+    async def page(request):
+        return web.Response(text=PAGE.replace('見出し', request.match_info['name']), content_type='text/html')
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/{name}', page)
+        async with TestServer(app) as server:
+            scraper = FastWebScraper(**kwargs)
+            try:
+                return await scraper.scrape_urls_async([str(server.make_url(path)) for path in paths]), scraper
+            finally:
+                scraper.close()
+
+    return asyncio.run(main())
+
+
+def test_process_executor_matches_event_loop():
+    """executor='process' でもイベントループ内での抽出と同じ結果になり、close() でワーカーを終了する"""
+    paths = [f'/p{i}' for i in range(4)]
+    inline, _ = _scrape(paths)
+    pooled, scraper = _scrape(paths, executor='process', max_workers=2)
+
+    assert [result.content for result in pooled] == [result.content for result in inline]
+    # サーバーのポートは実行ごとに変わるのでパスで比較
+    assert [[image.rsplit('/', 1)[1] for image in result.images] for result in pooled] == [['a.png']] * 4
+    assert '# p3' in pooled[3].content
+    assert scraper._executor is None
+
+
+def test_thread_executor_runs_off_the_loop(monkeypatch):
+    """executor='thread' ではHTMLの解析・テキスト変換をイベントループのスレッドで行わない"""
+    threads = set()
+    extract = scraper_base.extract_page_raw_timed
+
+    def recording_extract(*args):
+        threads.add(threading.get_ident())
+        return extract(*args)
+
+    monkeypatch.setattr(scraper_base, 'extract_page_raw_timed', recording_extract)
+    results, _ = _scrape(['/a', '/b'], executor='thread')
+    assert all(result.status is ScrapeStatus.OK for result in results)
+    assert threads and threading.get_ident() not in threads
+
+
+IMAGES_PAGE = b"""<html><head><meta property="og:image" content="/og.png"><meta name="twitter:image" content="/og.png">
+<link rel="preload" as="image" href="/hero.jpg"></head><body>
+<img src="/a.png" alt="A" srcset="/a-480.png 480w, /a-1200.png 1200w">
+<img data-src="/lazy.png"><img src="data:image/gif;base64,AAA">
+<picture><source srcset="/p1.webp 1x, /p2.webp 2x"><img src="/p.png" alt="P"></picture>
+<div style="background-image: url('/bg.jpg')">x</div>
+<img src="/a.png#top"></body></html>"""
+
+
+def test_image_extraction_sources():
+    """srcset・picture/source・遅延読み込み・CSS背景・メタ情報の画像を重複なく出現順に取り出す（bs4 / lxml 共通）"""
+    expected = ['a.png', 'a-1200.png', 'lazy.png', 'p2.webp', 'p.png', 'bg.jpg', 'og.png', 'hero.jpg']
+    for engine in (ENGINE_BS4, ENGINE_LXML):
+        _, images = extract_page(IMAGES_PAGE, 'https://Example.com/dir/page', engine=engine)
+        assert images == ['https://example.com/' + name for name in expected], engine
+
+
+def test_parse_srcset():
+    """カンマを含むURLや記述子のない候補も分解し、幅指定の最大の候補を選ぶ"""
+    assert parse_srcset("a.jpg 480w, b,c.jpg 2x, d.jpg") == [('a.jpg', 480.0, 'w'), ('b,c.jpg', 2.0, 'x'),
+                                                              ('d.jpg', 1.0, 'x')]
+    assert largest_srcset_candidate("small.jpg 3x, big.jpg 800w, mid.jpg 400w") == 'big.jpg'
+    assert largest_srcset_candidate("") is None
+
+
+def test_scraper_keeps_alt_text():
+    """スクレイパーの結果は画像URLを重複なく並べ、altテキストを image_alts に残す"""
+    async def page(request):
+        return web.Response(body=IMAGES_PAGE, content_type='text/html')
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/page', page)
+        async with TestServer(app) as server:
+            return (await FastWebScraper().scrape_urls_async([str(server.make_url('/page'))]))[0]
+
+    result = asyncio.run(main())
+    assert len(result.images) == len(set(result.images)) == 8
+    alts = {url.rsplit('/', 1)[1]: alt for url, alt in result.image_alts.items()}
+    assert alts == {'a.png': 'A', 'a-1200.png': 'A', 'p.png': 'P'}
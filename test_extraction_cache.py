@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+抽出結果キャッシュのテスト（ネットワークに接続せずローカルのサーバーで実行）
+"""
+
+import asyncio
+import os
+import threading
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from extraction_cache import ExtractionCache
+from fast_scraper import FastWebScraper
+from scrape_result import ScrapeStatus
+from scheduler import HostScheduler
+
+PAGE = "<html><head><title>t</title></head><body><p>同じ本文</p><img src='/a.png'></body></html>"
+
+
+def test_same_body_is_extracted_once():
+    """同じキーの同時の抽出は1回にまとめる"""
+    async def main():
+        cache = ExtractionCache()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return ('text', [], {})
+
+        values = await asyncio.gather(*(cache.get_or_compute('k', compute) for _ in range(5)))
+        assert calls == 1
+        assert all(value == ('text', [], {}) for value in values)
+        assert cache.stats()['coalesced'] == 4
+
+    asyncio.run(main())
+
+
+def test_owner_cancellation_is_not_shared():
+    """抽出していた呼び出しがキャンセルされても、待っていた呼び出しは抽出し直して結果を得る"""
+    async def main():
+        cache = ExtractionCache()
+        started = asyncio.Event()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            started.set()
+            await asyncio.sleep(0.1)
+            return ('text', [], {})
+
+        owner = asyncio.ensure_future(cache.get_or_compute('k', compute))
+        await started.wait()
+        waiter = asyncio.ensure_future(cache.get_or_compute('k', compute))
+        await asyncio.sleep(0)
+        owner.cancel()
+
+        assert await asyncio.wait_for(waiter, 2) == ('text', [], {})
+        assert owner.cancelled()
+        assert calls == 2
+
+    asyncio.run(main())
+
+
+def test_waiter_cancellation_still_propagates():
+    """待っている呼び出し自体のキャンセルは通常どおり伝わり、抽出は続く"""
+    async def main():
+        cache = ExtractionCache()
+
+        async def compute():
+            await asyncio.sleep(0.1)
+            return ('text', [], {})
+
+        owner = asyncio.ensure_future(cache.get_or_compute('k', compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.get_or_compute('k', compute))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert waiter.cancelled()
+        assert await owner == ('text', [], {})
+
+    asyncio.run(main())
+
+
+def test_scheduler_reports_foreign_cancellation():
+    """ワーカーに外から CancelledError が伝わっても、バッチは待ち続けずにそのURLをエラーとして返す"""
+    async def main():
+        async def worker(url):
+            raise asyncio.CancelledError()
+
+        return await asyncio.wait_for(HostScheduler().run(['http://example.com/'], worker), 2)
+
+    [result] = asyncio.run(main())
+    assert type(result).__name__ == 'JobCancelled' and result.url == 'http://example.com/'
+
+
+def test_spill_to_disk_runs_off_the_loop(tmp_path):
+    """あふれたエントリの退避と読み込みはイベントループのスレッドで行わない"""
+    spill_dir = str(tmp_path / 'spill')
+    threads = set()
+
+    class RecordingCache(ExtractionCache):
+        def _spill(self, evicted):
+            if evicted:
+                threads.add(threading.get_ident())
+            super()._spill(evicted)
+
+        def _load_spilled(self, key):
+            threads.add(threading.get_ident())
+            return super()._load_spilled(key)
+
+    async def compute():
+        return ('text', [('img', '/a.png')], {'title': 't'})
+
+    async def main():
+        cache = RecordingCache(max_entries=1, spill_dir=spill_dir)
+        await cache.get_or_compute('a', compute)
+        await cache.get_or_compute('b', compute)
+        assert os.listdir(spill_dir) == ['a.json']
+
+        value = await cache.get_or_compute('a', compute)
+        assert value == ('text', [('img', '/a.png')], {'title': 't'})
+        assert cache.stats()['disk_hits'] == 1
+        assert sorted(os.listdir(spill_dir)) == ['a.json', 'b.json']
+
+    asyncio.run(main())
+    assert threads and threading.get_ident() not in threads
+
+
+class SlowExtractScraper(FastWebScraper):
+    """抽出に時間がかかるスクレイパー（締め切りで抽出中にキャンセルされる状況を作る）"""
+
+    async def _extract_raw(self, body, encoding, url=None):
+        await asyncio.sleep(0.3)
+        return await super()._extract_raw(body, encoding, url)
+
+
+def test_concurrent_runs_sharing_cache_with_deadline():
+    """キャッシュを共有する2つの実行のうち、片方が締め切りで打ち切られても、もう片方は完了する"""
+    async def page(request):
+        return web.Response(text=PAGE, content_type='text/html')
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/page', page)
+        async with TestServer(app) as server:
+            cache = ExtractionCache()
+            urls = [str(server.make_url('/page'))]
+            short = SlowExtractScraper(extraction_cache=cache)
+            patient = SlowExtractScraper(extraction_cache=cache)
+
+            short_run = asyncio.ensure_future(short.scrape_urls_async(urls, deadline=0.15))
+            await asyncio.sleep(0.05)
+            patient_run = asyncio.ensure_future(patient.scrape_urls_async(urls))
+
+            short_results = await asyncio.wait_for(short_run, 5)
+            patient_results = await asyncio.wait_for(patient_run, 5)
+
+        assert short_results[0].status is ScrapeStatus.DEADLINE_EXCEEDED
+        assert patient_results[0].status is ScrapeStatus.OK
+        assert '同じ本文' in patient_results[0].content
+
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+抽出エンジン（bs4 / lxml / stream）のテスト（ネットワークに接続せずローカルのサーバーで実行）
+"""
+
+import asyncio
+import re
+import threading
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from extraction import StreamingExtractor, extract_page, ENGINE_BS4, ENGINE_LXML, STYLE_MAIN
+from fast_scraper import FastWebScraper
+
+SECTION = """<h1>見出し</h1><p>本文の<b>段落</b>です。<a href="/x">リンク</a></p>
+<ul><li>項目1</li><li>項目2</li></ul><img src="/a.png" alt="画像A">
+<picture><source srcset="/b.webp 2x"><img src="/b.png"></picture><script>var x = 1;</script>
+"""
+# stream エンジンが複数のチャンクに分けて受信する大きさにする
+PAGE = ("<html><head><title>テスト</title><meta property='og:image' content='/og.png'></head>"
+        "<body><nav>メニュー</nav>" + SECTION * 300 + "</body></html>")
+
+
+def _scrape(engines, **kwargs):
+    async def page(request):
+        return web.Response(text=PAGE, content_type='text/html')
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/page', page)
+        async with TestServer(app) as server:
+            url = str(server.make_url('/page'))
+            results = {}
+            for engine in engines:
+                scraper = FastWebScraper(engine=engine, **kwargs)
+                try:
+                    results[engine] = (await scraper.scrape_urls_async([url]))[0]
+                finally:
+                    scraper.close()
+            return results
+
+    return asyncio.run(main())
+
+
+def test_engines_produce_equivalent_output():
+    """lxml と stream は同じ出力、bs4 は空白の違いを除いて同じ出力になる"""
+    results = _scrape(('bs4', 'lxml', 'stream'))
+    bs4, lxml, stream = results['bs4'], results['lxml'], results['stream']
+
+    assert lxml.content == stream.content
+    assert re.sub(r'\s+', '', bs4.content) == re.sub(r'\s+', '', lxml.content)
+    assert bs4.images == lxml.images == stream.images
+    assert [image.rsplit('/', 1)[1] for image in lxml.images] == ['a.png', 'b.webp', 'b.png', 'og.png']
+    assert 'var x' not in lxml.content and lxml.content.count('見出し') == 300
+
+
+def test_lxml_engine_main_style():
+    """STYLE_MAIN でも lxml は bs4 と同じ本文を抽出し、指定した文字コードでデコードする"""
+    html = ("<html><head><title>タイトル</title><meta name='description' content='説明'></head>"
+            "<body><nav>メニュー</nav><article><h2>記事</h2><p>本文</p></article></body></html>")
+    body = html.encode('shift_jis')
+    bs4_content, _ = extract_page(body, 'http://example.com/', 'shift_jis', STYLE_MAIN, ENGINE_BS4)
+    lxml_content, _ = extract_page(body, 'http://example.com/', 'shift_jis', STYLE_MAIN, ENGINE_LXML)
+    assert lxml_content.strip() == bs4_content.strip() == "# タイトル\n\n**説明**: 説明\n\n## 記事\n\n本文"
+
+    try:
+        extract_page(body, 'http://example.com/', engine='regex')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未知のエンジンで ValueError が送出されていません")
+
+
+
+def test_lxml_engine_matches_bs4_on_lazy_images_and_pre():
+    """遅延読み込みの画像は本文中にも出力し、pre内で捨てたタグの後ろの空白は保つ（bs4と同じ）"""
+    html = ("<html><body><p>前 <img data-src='/lazy.png' alt='遅延'> 中 <img data-lazy-src='/lazy2.png'> 後</p>"
+            "<pre>def f():\n<script>x</script>    return 1\n</pre></body></html>").encode('utf-8')
+    bs4_content, _ = extract_page(html, 'http://example.com/', 'utf-8', engine=ENGINE_BS4)
+    lxml_content, _ = extract_page(html, 'http://example.com/', 'utf-8', engine=ENGINE_LXML)
+
+    for content in (bs4_content, lxml_content):
+        assert '![遅延](/lazy.png)' in content and '![](/lazy2.png)' in content
+    assert re.sub(r'\s+', '', bs4_content) == re.sub(r'\s+', '', lxml_content)
+    assert 'def f():\n    return 1' in lxml_content
+    assert '\n        return 1' in bs4_content     # html2text は pre を4文字字下げする
+
+def test_stream_engine_uses_executor(monkeypatch):
+    """engine='stream' でも executor を指定すればツリーの走査をイベントループの外で行う"""
+    threads = set()
+    close = StreamingExtractor.close
+
+    def recording_close(self):
+        threads.add(threading.get_ident())
+        return close(self)
+
+    monkeypatch.setattr(StreamingExtractor, 'close', recording_close)
+    on_loop = _scrape(('stream',))['stream']
+    assert threads == {threading.get_ident()}
+
+    threads.clear()
+    off_loop = _scrape(('stream',), executor='thread')['stream']
+    assert threads and threading.get_ident() not in threads
+    assert off_loop.content == on_loop.content
+
+
+def test_stream_engine_falls_back_to_threads():
+    """解析途中の状態はプロセス間で受け渡せないため、executor='process' はスレッドプールになる"""
+    scraper = FastWebScraper(engine='stream', executor='process')
+    assert scraper.executor_kind == 'thread'
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+HTTPレスポンスキャッシュのテスト（ネットワークに接続せずローカルのサーバーで実行）
+"""
+
+import asyncio
+from collections import Counter
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from http_cache import HttpCache, parse_cache_control
+from page_fetcher import PageFetcher
+
+ETAG = '"v1"'
+
+
+def _app(requests: Counter, revalidations: Counter, cache_control: dict) -> web.Application:
+    async def page(request):
+        name = request.match_info['name']
+        requests[name] += 1
+        headers = {'ETag': ETAG}
+        if name in cache_control:
+            headers['Cache-Control'] = cache_control[name]
+        if request.headers.get('If-None-Match') == ETAG:
+            revalidations[name] += 1
+            return web.Response(status=304, headers=headers)
+        return web.Response(text=f"<html><body>{name}</body></html>", content_type='text/html', headers=headers)
+
+    app = web.Application()
+    app.router.add_get('/{name}', page)
+    return app
+
+
+def _fetch_twice(tmp_path, cache_control: dict, ttl: float = 3600):
+    """各ページを2回取得し、(リクエスト数, 再検証の数, 2回目の FetchedPage) を返す"""
+    requests, revalidations = Counter(), Counter()
+
+    async def main():
+        cache = HttpCache(str(tmp_path / 'cache'), ttl=ttl)
+        fetcher = PageFetcher({}, timeout=5, cache=cache)
+        pages = {}
+        async with TestServer(_app(requests, revalidations, cache_control)) as server, \
+                aiohttp.ClientSession() as session:
+            for name in cache_control:
+                url = str(server.make_url('/' + name))
+                await fetcher.fetch(session, url)
+                pages[name] = await fetcher.fetch(session, url)
+        return pages
+
+    pages = asyncio.run(main())
+    return requests, revalidations, pages
+
+
+def test_parse_cache_control():
+    assert parse_cache_control('No-Cache, max-age="60", private') == {'no-cache': None, 'max-age': '60',
+                                                                      'private': None}
+    assert parse_cache_control(None) == {}
+
+
+def test_no_store_is_not_cached(tmp_path):
+    """no-store のレスポンスは保存せず、毎回取得する"""
+    requests, revalidations, pages = _fetch_twice(tmp_path, {'secret': 'no-store'})
+    assert requests['secret'] == 2 and revalidations['secret'] == 0
+    assert not pages['secret'].from_cache
+
+
+def test_no_cache_is_always_revalidated(tmp_path):
+    """no-cache のレスポンスはTTL以内でも毎回再検証する"""
+    requests, revalidations, pages = _fetch_twice(tmp_path, {'news': 'no-cache'})
+    assert requests['news'] == 2 and revalidations['news'] == 1
+    assert pages['news'].from_cache
+
+
+def test_max_age_overrides_ttl(tmp_path):
+    """max-age 以内なら ttl を過ぎていても再検証せず、max-age=0 なら毎回再検証する"""
+    requests, revalidations, pages = _fetch_twice(tmp_path, {'fresh': 'max-age=600', 'stale': 'max-age=0'},
+                                                  ttl=0)
+    assert requests['fresh'] == 1 and pages['fresh'].from_cache
+    assert requests['stale'] == 2 and revalidations['stale'] == 1
+
+
+def test_no_store_removes_existing_entry(tmp_path):
+    """以前保存したページが no-store を返すようになったら、保存済みのエントリを削除する"""
+    cache = HttpCache(str(tmp_path / 'cache'))
+    url = 'http://example.com/page'
+    cache.put(url, b'old', {'ETag': ETAG}, 'utf-8')
+    assert cache.get(url) is not None
+    cache.put(url, b'new', {'Cache-Control': 'private, no-store'}, 'utf-8')
+    assert cache.get(url) is None and cache.size == 0
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+画像ダウンロード（重複排除・再開・サイズ上限）のテスト（ローカルのサーバーで実行）
+"""
+
+import asyncio
+import os
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer, unused_port
+
+from image_downloader import ImageDownloader, WRITE_SIZE, DOWNLOADED, DUPLICATE, SKIPPED, TOO_LARGE, REJECTED_TYPE
+
+SMALL = b'\x89PNG' + b'a' * 1000
+LARGE = b'\x89PNG' + os.urandom(3 * WRITE_SIZE)
+
+
+def _app() -> web.Application:
+    async def image(request):
+        body = LARGE if request.match_info['name'] == 'large' else SMALL
+        return web.Response(body=body, content_type='image/png')
+
+    async def html(request):
+        return web.Response(text="<html></html>", content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/img/{name}', image)
+    app.router.add_get('/page', html)
+    return app
+
+
+def _download(output_dir: str, paths, port: int = 0, **kwargs):
+    async def main():
+        async with TestServer(_app(), port=port) as server:
+            downloader = ImageDownloader(output_dir, **kwargs)
+            downloads = await downloader.download([str(server.make_url(path)) for path in paths])
+            return downloader, downloads
+
+    return asyncio.run(main())
+
+
+def test_dedup_and_resume(tmp_path):
+    # 2回の実行で同じURLになるようポートを固定
+    port = unused_port()
+    _, downloads = _download(str(tmp_path), ['/img/a', '/img/b', '/img/large', '/page'], port)
+    statuses = sorted(d.status for d in downloads)
+    assert statuses == sorted([DOWNLOADED, DUPLICATE, DOWNLOADED, REJECTED_TYPE])
+    # 同じ内容の2枚は1ファイルを共有し、大きな画像は分割して書き込んでも内容が一致する
+    assert downloads[0].file == downloads[1].file
+    with open(os.path.join(str(tmp_path), downloads[2].file), 'rb') as f:
+        assert f.read() == LARGE
+    assert not [name for name in os.listdir(str(tmp_path)) if name.endswith('.part')]
+
+    # 2回目はマニフェストを見て再取得しない
+    _, downloads = _download(str(tmp_path), ['/img/a', '/img/large'], port)
+    assert [d.status for d in downloads] == [SKIPPED, SKIPPED]
+
+
+def test_max_bytes(tmp_path):
+    _, downloads = _download(str(tmp_path), ['/img/large'], max_bytes=WRITE_SIZE)
+    assert downloads[0].status == TOO_LARGE
+    assert os.listdir(str(tmp_path)) == ['manifest.json']
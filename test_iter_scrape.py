@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+iter_scrape（完了したものから1件ずつ返すAPI）のテスト（ネットワークに接続せずローカルのサーバーで実行）
+"""
+
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from fast_scraper import FastWebScraper
+from scraper_session import ScraperSession, background_loop
+
+
+async def page(request):
+    delay = float(request.match_info['delay'])
+    await asyncio.sleep(delay)
+    return web.Response(text=f"<html><body><p>{delay}</p></body></html>", content_type='text/html')
+
+
+def _app() -> web.Application:
+    app = web.Application()
+    app.router.add_get('/{delay}', page)
+    return app
+
+
+def test_results_are_yielded_as_they_complete():
+    """遅いページを待たずに、先に完了したページの結果から返す"""
+    async def main():
+        async with TestServer(_app()) as server:
+            urls = [str(server.make_url(f'/{delay}')) for delay in ('0.6', '0.3', '0')]
+            started = time.perf_counter()
+            arrivals = []
+            async for result in FastWebScraper().iter_scrape(urls):
+                arrivals.append((result.url.rsplit('/', 1)[1], time.perf_counter() - started))
+            return arrivals
+
+    arrivals = asyncio.run(main())
+    assert [name for name, _ in arrivals] == ['0', '0.3', '0.6']
+    assert arrivals[0][1] < 0.3
+
+
+def test_leaving_early_does_not_wait_for_slow_pages():
+    """イテレーションを途中で抜けると、残りの取得を待たずに戻る"""
+    async def main():
+        async with TestServer(_app()) as server:
+            urls = [str(server.make_url(f'/{delay}')) for delay in ('3', '3', '0')]
+            started = time.perf_counter()
+            results = FastWebScraper().iter_scrape(urls)
+            async for result in results:
+                break
+            await results.aclose()
+            return result, time.perf_counter() - started
+
+    first, elapsed = asyncio.run(main())
+    assert first.url.endswith('/0')
+    assert elapsed < 2
+
+
+def test_sync_iteration_through_session():
+    """同期コードからは session.iterate() で完了した順に取り出せる"""
+    server = TestServer(_app())
+    loop = background_loop()
+    asyncio.run_coroutine_threadsafe(server.start_server(), loop).result(5)
+    session = ScraperSession()
+    try:
+        urls = [str(server.make_url(f'/{delay}')) for delay in ('0.3', '0')]
+        scraper = FastWebScraper(session=session)
+        names = [result.url.rsplit('/', 1)[1] for result in session.iterate(scraper.iter_scrape(urls))]
+    finally:
+        session.close_sync()
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result(5)
+    assert names == ['0', '0.3']
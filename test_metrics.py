@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+メトリクスとPrometheus形式の出力のテスト（ネットワークに接続せずローカルのサーバーで実行）
+"""
+
+import asyncio
+import re
+from functools import partial
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from extraction_cache import ExtractionCache
+from fast_scraper import FastWebScraper
+from metrics import (ScrapeMetrics, format_summary, COUNTER_ERRORS, COUNTER_PAGES, COUNTER_SEARCHES,
+                     PHASE_CONNECT, PHASE_CONVERT, PHASE_DOWNLOAD, PHASE_PAGE, PHASE_PARSE, PHASE_QUERY,
+                     PHASE_SEARCH, PHASE_TTFB, PHASE_WRITE)
+from metrics_server import MetricsServer
+from result_sink import JsonlSink
+from search_providers import SearchRouter, BingSearch
+
+
+async def ok(request):
+    return web.Response(text="<html><body><p>ok</p></body></html>", content_type='text/html')
+
+
+async def missing(request):
+    return web.Response(status=404)
+
+
+async def image(request):
+    return web.Response(body=b'\x89PNG', content_type='image/png')
+
+
+async def slow(request):
+    await asyncio.sleep(5)
+    return web.Response(text="<html></html>", content_type='text/html')
+
+
+def _scrape(metrics: ScrapeMetrics):
+    async def main():
+        app = web.Application()
+        for path, handler in (('/ok', ok), ('/missing', missing), ('/image', image), ('/slow', slow)):
+            app.router.add_get(path, handler)
+        async with TestServer(app) as server:
+            urls = [str(server.make_url(path)) for path in ('/ok', '/missing', '/image', '/slow')]
+            return await FastWebScraper(metrics=metrics, timeout=0.3).scrape_urls_async(urls)
+
+    return asyncio.run(main())
+
+
+def test_phases_and_counters():
+    """ページごとの段階の所要時間と、状態・エラーの種類ごとのカウンターを記録する"""
+    metrics = ScrapeMetrics()
+    _scrape(metrics)
+
+    assert metrics.histogram(PHASE_PAGE).count == 4
+    assert metrics.histogram(PHASE_DOWNLOAD).count == 1
+    assert metrics.histogram(PHASE_PARSE).count == 1
+    assert metrics.counter(COUNTER_PAGES, status='ok') == 1
+    assert metrics.counter(COUNTER_ERRORS, type='http', status=404) == 1
+    assert metrics.counter(COUNTER_ERRORS, type='content_type') == 1
+    assert metrics.counter(COUNTER_ERRORS, type='timeout') == 1
+
+
+def test_error_labels_are_consistent():
+    """errors_total の系列はすべて type と status のラベルを持つ（ステータスのないエラーは空文字列）"""
+    metrics = ScrapeMetrics()
+    _scrape(metrics)
+    metrics.increment(COUNTER_ERRORS, type='search', status=None)
+
+    lines = [line for line in MetricsServer(metrics).render().splitlines()
+             if line.startswith('scraper_errors_total{')]
+    assert len(lines) == 4
+    for line in lines:
+        assert re.findall(r'(\w+)="', line) == ['status', 'type'], line
+    assert 'scraper_errors_total{status="",type="timeout"} 1' in lines
+    assert 'scraper_errors_total{status="404",type="http"} 1' in lines
+    assert 'scraper_errors_total{status="",type="search"} 1' in lines
+
+
+def test_query_pipeline_records_every_phase(tmp_path):
+    """検索から保存までの各段階と、接続・TTFB（接続の再利用を含む）をURL・クエリ付きで記録する"""
+    metrics = ScrapeMetrics()
+    events = []
+    metrics.add_listener(events.append)
+
+    async def search(request):
+        base = str(request.url.origin())
+        items = ''.join(f'<li class="b_algo"><h2><a href="{base}/ok?{i}">p{i}</a></h2></li>' for i in range(3))
+        return web.Response(text=f"<html><body><ol>{items}</ol></body></html>", content_type='text/html')
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/search', search)
+        app.router.add_get('/ok', ok)
+        async with TestServer(app) as server:
+            router = SearchRouter([BingSearch(str(server.make_url('/search')))])
+            scraper = FastWebScraper(metrics=metrics, search_router=router,
+                                     sink_factory=partial(JsonlSink, output_dir=str(tmp_path / 'out')))
+            return await scraper.scrape_async("計測")
+
+    assert asyncio.run(main()) == str(tmp_path / 'out')
+    summary = metrics.summary()
+    for phase in (PHASE_SEARCH, PHASE_CONNECT, PHASE_TTFB, PHASE_DOWNLOAD, PHASE_PARSE, PHASE_CONVERT,
+                  PHASE_PAGE, PHASE_WRITE, PHASE_QUERY):
+        assert summary[phase]['count'] >= 1, phase
+    assert summary[PHASE_PAGE]['count'] == 3
+    assert metrics.counter(COUNTER_SEARCHES, engine='bing', cached=False) == 1
+
+    ttfb = [event for event in events if event.phase == PHASE_TTFB]
+    # 検索結果ページと3件のページ（検索と同じセッションの接続を再利用する）
+    assert len(ttfb) == 4 and '/search?' in ttfb[0].url
+    assert any(event.attrs['reused'] for event in ttfb)
+    assert [event.query for event in events if event.phase == PHASE_QUERY] == ["計測"]
+
+    table = format_summary(summary, (PHASE_SEARCH, PHASE_PAGE, 'missing'))
+    assert len(table.splitlines()) == 3 and 'ms' in table.splitlines()[2]
+
+
+def test_metrics_endpoint(tmp_path):
+    """/metrics はPrometheusのテキスト形式でカウンター・ヒストグラム・監視対象のスクレイパーの状態を返す"""
+    metrics = ScrapeMetrics()
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/ok', ok)
+        app.router.add_get('/missing', missing)
+        async with TestServer(app) as site:
+            scraper = FastWebScraper(metrics=metrics, extraction_cache=ExtractionCache())
+            async with MetricsServer(metrics, port=0, lag_interval=0.01) as server:
+                server.watch_scraper(scraper, name='v1')
+                await scraper.scrape_urls_async([str(site.make_url('/ok')), str(site.make_url('/ok')),
+                                                 str(site.make_url('/missing'))])
+                await asyncio.sleep(0.05)
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(f'http://127.0.0.1:{server.port}/metrics') as response:
+                        return response.headers['Content-Type'], await response.text()
+
+    content_type, text = asyncio.run(main())
+    assert content_type.startswith('text/plain; version=0.0.4')
+    lines = text.splitlines()
+    assert '# TYPE scraper_pages_total counter' in lines
+    assert 'scraper_pages_total{status="ok"} 2' in lines
+    assert 'scraper_errors_total{status="404",type="http"} 1' in lines
+    assert '# TYPE scraper_phase_duration_seconds histogram' in lines
+    assert 'scraper_phase_duration_seconds_count{phase="page"} 3' in lines
+    assert any(line.startswith('scraper_phase_duration_seconds_bucket{phase="page",le="+Inf"} 3') for line in lines)
+    assert 'scraper_in_flight_requests{scheduler="v1"} 0' in lines
+    assert 'scraper_cache_hits_total{cache="extraction",scraper="v1"} 1' in lines
+    assert any(line.startswith('scraper_event_loop_lag_seconds_count ') for line in lines)
+
+
+def test_caches_of_each_scraper_are_labelled():
+    """同じ種類のキャッシュを持つ複数のスクレイパーを監視しても、系列が上書きされない"""
+    v1 = FastWebScraper(extraction_cache=ExtractionCache())
+    v2 = FastWebScraper(extraction_cache=ExtractionCache())
+    v2.extraction_cache.misses = 3
+    server = MetricsServer(ScrapeMetrics())
+    server.watch_scraper(v1, name='v1')
+    server.watch_scraper(v2, name='v2')
+
+    lines = server.render().splitlines()
+    assert 'scraper_cache_misses_total{cache="extraction",scraper="v1"} 0' in lines
+    assert 'scraper_cache_misses_total{cache="extraction",scraper="v2"} 3' in lines
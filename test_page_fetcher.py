@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+PageFetcher（ページの取得）のテスト（ネットワークに接続せずローカルのサーバーで実行）
+"""
+
+import asyncio
+import time
+from collections import Counter
+from typing import Optional
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from deadline import Deadline
+from fast_scraper import FastWebScraper
+from host_latency import HostLatencyTracker
+from page_fetcher import PageFetcher, ContentTypeRejected, HttpStatusError
+from retry_policy import RetryPolicy, parse_retry_after
+from scrape_result import ScrapeStatus
+
+CHUNK = b"<p>" + b"x" * 65530 + b"</p>"
+
+
+def _slow_stream(content_type: str, state: dict):
+    """64KBずつ、途中で止めなければ約3秒かけて送るハンドラー"""
+    async def handler(request):
+        return await _stream(request, content_type, state)
+    return handler
+
+
+async def _stream(request, content_type: str, state: dict):
+    response = web.StreamResponse(headers={'Content-Type': content_type})
+    await response.prepare(request)
+    state['sent'] = 0
+    try:
+        await response.write(b"<html><body>")
+        for _ in range(300):
+            await response.write(CHUNK)
+            state['sent'] += len(CHUNK)
+            await asyncio.sleep(0.01)
+        await response.write_eof()
+        state['completed'] = True
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    return response
+
+
+def _fetch(handler, url_path: str = '/page', **kwargs):
+    async def main():
+        app = web.Application()
+        app.router.add_get(url_path, handler)
+        async with TestServer(app) as server, aiohttp.ClientSession() as session:
+            fetcher = PageFetcher({}, timeout=10, **kwargs)
+            started = time.perf_counter()
+            try:
+                return await fetcher.fetch(session, str(server.make_url(url_path))), time.perf_counter() - started
+            except ContentTypeRejected as e:
+                return e, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+def test_body_is_capped_at_max_bytes():
+    """max_bytes を超える分は受信せずに打ち切り、truncated として返す"""
+    state = {}
+    page, elapsed = _fetch(_slow_stream('text/html', state), max_bytes=200_000)
+    assert page.truncated
+    assert page.size == len(page.body) == 200_000
+    assert elapsed < 2
+    assert not state.get('completed')
+
+
+def test_non_html_is_rejected_before_reading():
+    """HTML以外のContent-Typeは本文を読まずに中止する"""
+    state = {}
+    error, elapsed = _fetch(_slow_stream('application/octet-stream', state))
+    assert isinstance(error, ContentTypeRejected)
+    assert 'application/octet-stream' in str(error)
+    assert elapsed < 2
+    assert not state.get('completed')
+
+
+def test_scraper_statuses():
+    """スクレイパーでは打ち切ったページを TRUNCATED（本文は抽出）、HTML以外を REJECTED_CONTENT_TYPE にする"""
+    async def big(request):
+        return web.Response(text="<html><body><h1>先頭</h1>" + "<p>続き</p>" * 20000 + "</body></html>",
+                            content_type='text/html')
+
+    async def pdf(request):
+        return web.Response(body=b'%PDF-1.4', content_type='application/pdf')
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/big', big)
+        app.router.add_get('/doc.pdf', pdf)
+        async with TestServer(app) as server:
+            urls = [str(server.make_url('/big')), str(server.make_url('/doc.pdf'))]
+            return await FastWebScraper(max_page_bytes=4096).scrape_urls_async(urls)
+
+    big_page, pdf_page = asyncio.run(main())
+    assert big_page.status is ScrapeStatus.TRUNCATED
+    assert '先頭' in big_page.content and big_page.content.count('続き') < 1000
+    assert pdf_page.status is ScrapeStatus.REJECTED_CONTENT_TYPE
+
+
+class FlakyServer:
+    """パスごとに、最初の何回かは指定したステータスを返すサーバー（/slow-first は最初の1回だけ応答が遅い）"""
+
+    def __init__(self, failures: int = 0, status: int = 503, retry_after: Optional[str] = None):
+        self.failures = failures
+        self.status = status
+        self.retry_after = retry_after
+        self.requests = Counter()
+
+    async def page(self, request):
+        path = request.path
+        self.requests[path] += 1
+        if path == '/slow-first' and self.requests[path] == 1:
+            await asyncio.sleep(3)
+        elif self.requests[path] <= self.failures:
+            headers = {'Retry-After': self.retry_after} if self.retry_after else {}
+            return web.Response(status=self.status, headers=headers)
+        return web.Response(text="<html><body>ok</body></html>", content_type='text/html')
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/{name}', self.page)
+        return app
+
+
+def _fetch_from(server: FlakyServer, fetcher: PageFetcher, paths, deadline=None):
+    """パスを順に取得し、[(FetchedPage または例外, 所要時間)] を返す"""
+    async def main():
+        outcomes = []
+        async with TestServer(server.app()) as test_server, aiohttp.ClientSession() as session:
+            for path in paths:
+                started = time.perf_counter()
+                try:
+                    outcome = await fetcher.fetch(session, str(test_server.make_url(path)),
+                                                  deadline=Deadline.coerce(deadline))
+                except Exception as e:
+                    outcome = e
+                outcomes.append((outcome, time.perf_counter() - started))
+        return outcomes
+
+    return asyncio.run(main())
+
+
+def test_transient_failures_are_retried():
+    """503は指数バックオフで再試行し、404は再試行しない"""
+    server = FlakyServer(failures=2)
+    fetcher = PageFetcher({}, retry=RetryPolicy(max_attempts=3, base_delay=0.01, jitter=False))
+    (page, _), = _fetch_from(server, fetcher, ['/page'])
+    assert page.body == b"<html><body>ok</body></html>"
+    assert server.requests['/page'] == 3 and fetcher.retries == 2
+
+    server = FlakyServer(failures=1, status=404)
+    fetcher = PageFetcher({}, retry=RetryPolicy(base_delay=0.01))
+    (error, _), = _fetch_from(server, fetcher, ['/page'])
+    assert isinstance(error, HttpStatusError) and error.status == 404
+    assert server.requests['/page'] == 1
+
+
+def test_retry_after_is_honoured():
+    """Retry-After の秒数だけ待って再試行し、長すぎる・締め切りに間に合わない場合は再試行しない"""
+    server = FlakyServer(failures=1, status=429, retry_after='1')
+    fetcher = PageFetcher({}, retry=RetryPolicy(base_delay=0.01))
+    (page, elapsed), = _fetch_from(server, fetcher, ['/page'])
+    assert page.body and elapsed >= 1
+
+    server = FlakyServer(failures=1, status=429, retry_after='120')
+    (error, elapsed), = _fetch_from(server, PageFetcher({}, retry=RetryPolicy()), ['/page'])
+    assert isinstance(error, HttpStatusError) and error.retry_after == 120 and elapsed < 1
+
+    server = FlakyServer(failures=1, status=503, retry_after='1')
+    (error, elapsed), = _fetch_from(server, PageFetcher({}, retry=RetryPolicy()), ['/page'], deadline=0.5)
+    assert isinstance(error, HttpStatusError) and elapsed < 0.5
+    assert server.requests['/page'] == 1
+
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert parse_retry_after('soon') is None
+
+
+def test_slow_request_is_hedged():
+    """TTFBのp95を過ぎても応答がなければ2つ目のリクエストを送り、先に応答した方を使う"""
+    server = FlakyServer()
+    fetcher = PageFetcher({}, timeout=10, hedge=True)
+    warmup = [f'/fast{i}' for i in range(5)]
+    outcomes = _fetch_from(server, fetcher, warmup + ['/slow-first'])
+    page, elapsed = outcomes[-1]
+    assert page.body == b"<html><body>ok</body></html>"
+    assert elapsed < 2
+    assert server.requests['/slow-first'] == 2
+    assert fetcher.hedged == 1 and fetcher.hedge_wins == 1
+
+
+def test_adaptive_timeout():
+    """学習したホストの応答時間からタイムアウトを決め、タイムアウトした後は長めに待つ"""
+    tracker = HostLatencyTracker(default_timeout=15, min_timeout=0.5, max_timeout=30, min_samples=5)
+    url = 'http://fast.example/page'
+    assert tracker.timeout(url) == 15
+    for _ in range(5):
+        tracker.observe(url, 0.05)
+    assert tracker.timeout(url) == 0.5
+    tracker.observe_timeout(url, 0.5)
+    assert tracker.timeout(url) > 0.5
+    for _ in range(5):
+        tracker.observe(url, 2.0)
+    assert 2.0 < tracker.timeout(url) < 15
+    assert tracker.timeout('http://other.example/') == 15
+
+    server = FlakyServer()
+    fetcher = PageFetcher({}, timeout=15, latency=HostLatencyTracker(default_timeout=15, min_timeout=1))
+    _fetch_from(server, fetcher, [f'/p{i}' for i in range(5)])
+    (stats,) = fetcher.latency.stats().values()
+    assert stats['samples'] == 5 and stats['timeout'] == 1
+    assert fetcher.timeout_for('http://other.example/') == 15
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+ResultDB（SQLiteの結果データベース）のテスト（ネットワークに接続せずローカルのサーバーで実行）
+"""
+
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from fast_scraper import FastWebScraper
+from result_db import ResultDB
+
+
+def _page(url: str, content: str, images=()) -> dict:
+    return {'url': url, 'content': content, 'images': list(images), 'status': 'ok',
+            'scraped_at': '2026-10-17T00:00:00', 'elapsed': 0.1, 'image_alts': {}}
+
+
+def test_full_text_search(tmp_path):
+    """本文を全文検索し、検索キーワードで絞り込める（短い語はLIKEで検索）"""
+    db = ResultDB(str(tmp_path / 'results.db'))
+    db.save('python', [_page('https://a.example/', '非同期プログラミングの入門です'),
+                       _page('https://b.example/', 'データベースの全文検索インデックス')])
+    db.save('sqlite', [_page('https://c.example/', '全文検索インデックスとプログラミング')])
+
+    assert {hit['url'] for hit in db.search('全文検索インデックス')} == {'https://b.example/', 'https://c.example/'}
+    assert [hit['url'] for hit in db.search('全文検索インデックス', query='sqlite')] == ['https://c.example/']
+    assert [hit['url'] for hit in db.search('非同期 入門')] == ['https://a.example/']
+    assert {hit['url'] for hit in db.search('入門')} == {'https://a.example/'}
+    assert db.search('   ') == []
+    assert db.stats() == {'runs': 2, 'queries': 2, 'pages': 3, 'images': 0}
+    db.close()
+
+
+def test_latest_and_images(tmp_path):
+    """同じURLは最新の結果を返し、画像はクエリごとに重複なく取得順に返す"""
+    path = str(tmp_path / 'results.db')
+    db = ResultDB(path)
+    db.save('q', [_page('https://a.example/', '古い', ['https://a.example/1.png', 'https://a.example/2.png'])])
+    db.save('q', [_page('https://A.example/#top', '新しい', ['https://a.example/2.png', 'https://a.example/3.png'])])
+    db.close()
+
+    db = ResultDB(path)
+    assert db.latest('https://a.example')['content'] == '新しい'
+    assert db.images_for_query('q') == ['https://a.example/1.png', 'https://a.example/2.png',
+                                        'https://a.example/3.png']
+    assert db.latest('https://missing.example/') is None
+    db.close()
+
+
+def test_scraper_sink(tmp_path):
+    """open_run() をスクレイパーの sink_factory にすると、取得した順にデータベースへ保存する"""
+    async def page(request):
+        name = request.match_info['name']
+        return web.Response(text=f"<html><body><p>ページ{name}の本文</p><img src='/{name}.png'></body></html>",
+                            content_type='text/html')
+
+    db = ResultDB(str(tmp_path / 'results.db'))
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/{name}', page)
+        async with TestServer(app) as server:
+            urls = [str(server.make_url(f'/p{i}')) for i in range(3)]
+            scraper = FastWebScraper(sink_factory=db.open_run)
+            return await scraper.save_results_async('ローカル', scraper.iter_scrape(urls), total=len(urls))
+
+    assert asyncio.run(main()) == db.path
+    assert db.stats()['pages'] == 3 and db.stats()['images'] == 3
+    assert [hit['query'] for hit in db.search('ページp1の本文')] == ['ローカル']
+    db.close()
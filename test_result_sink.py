@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+JSONLの結果出力のテスト（ネットワークに接続せずローカルのサーバーで実行）
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from functools import partial
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import result_sink
+from fast_scraper import FastWebScraper
+from result_sink import JsonlSink, read_jsonl, render_view
+from result_writer import ResultWriter
+
+
+def _result(i: int) -> dict:
+    return {'url': f'https://example.com/{i}', 'content': f'本文{i}', 'images': [f'https://example.com/{i}.png'],
+            'status': 'ok', 'scraped_at': '2026-10-17T00:00:00', 'elapsed': 0.1}
+
+
+def test_records_are_flushed_while_writing(tmp_path):
+    """write() はすぐに戻り、flush_every 件ごとに途中経過をディスクに残す"""
+    output_dir = str(tmp_path / 'out')
+    sink = JsonlSink('クエリ', total=5, output_dir=output_dir, flush_every=2, flush_interval=10)
+    for i in range(2):
+        sink.write(_result(i))
+
+    deadline = time.monotonic() + 2
+    while time.monotonic() < deadline and len(list(read_jsonl(sink.path))) < 2:
+        time.sleep(0.01)
+    assert [record['url'] for record in read_jsonl(sink.path)] == [f'https://example.com/{i}' for i in range(2)]
+
+    sink.write(_result(2))
+    assert sink.close() == output_dir
+    records = list(read_jsonl(sink.path))
+    assert len(records) == 3 and all(record['query'] == 'クエリ' for record in records)
+    try:
+        sink.write(_result(3))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("close() 後の write() で ValueError が送出されていません")
+
+
+def test_view_is_rendered_from_jsonl(tmp_path):
+    """view を指定すると従来形式のファイルも生成し、後からJSONLから作り直すこともできる"""
+    output_dir = str(tmp_path / 'out')
+    with JsonlSink('q', total=2, output_dir=output_dir, view=ResultWriter) as sink:
+        sink.write(_result(0))
+        sink.write(_result(1))
+
+    files = set(os.listdir(output_dir))
+    assert {'results.jsonl', 'all_content.txt', 'all_image_urls.txt', 'ai_data.json'} <= files
+    with open(os.path.join(output_dir, 'all_content.txt'), encoding='utf-8') as f:
+        assert '本文1' in f.read()
+
+    # 同じJSONLから別のディレクトリに作り直せる
+    rerendered = render_view(sink.path, ResultWriter, str(tmp_path / 'again'))
+    with open(os.path.join(rerendered, 'ai_data.json'), encoding='utf-8') as a, \
+            open(os.path.join(output_dir, 'ai_data.json'), encoding='utf-8') as b:
+        rendered, original = json.load(a), json.load(b)
+    # scraped_at は生成した時刻
+    rendered.pop('scraped_at')
+    original.pop('scraped_at')
+    assert rendered == original
+
+
+def test_view_is_written_in_one_pass_off_the_caller_thread(tmp_path, monkeypatch):
+    """従来形式のファイルはバックグラウンドスレッドで1件ずつ書き込み、close() でJSONLを読み直さない"""
+    threads = []
+
+    class RecordingWriter(ResultWriter):
+        def write(self, result):
+            threads.append(threading.current_thread())
+            super().write(result)
+
+    def fail(path):
+        raise AssertionError("JSONLを読み直しています")
+
+    monkeypatch.setattr(result_sink, 'read_jsonl', fail)
+    sink = JsonlSink('q', total=3, output_dir=str(tmp_path / 'out'), view=RecordingWriter, flush_interval=0.01)
+    for i in range(3):
+        sink.write(_result(i))
+    sink.close()
+
+    assert len(threads) == 3 and threading.current_thread() not in threads
+    with open(tmp_path / 'out' / 'all_content.txt', encoding='utf-8') as f:
+        text = f.read()
+    assert all(f'本文{i}' in text for i in range(3))
+
+
+def test_scraper_streams_results_in_completion_order(tmp_path):
+    """save_results_async は完了した順に1行ずつ追記する"""
+    async def page(request):
+        delay = float(request.match_info['delay'])
+        await asyncio.sleep(delay)
+        return web.Response(text=f"<html><body><p>{delay}</p></body></html>", content_type='text/html')
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/{delay}', page)
+        async with TestServer(app) as server:
+            urls = [str(server.make_url(f'/{delay}')) for delay in ('0.3', '0')]
+            scraper = FastWebScraper(sink_factory=partial(JsonlSink, output_dir=str(tmp_path / 'out')))
+            return await scraper.save_results_async('q', scraper.iter_scrape(urls), total=len(urls))
+
+    output_dir = asyncio.run(main())
+    records = list(read_jsonl(os.path.join(output_dir, 'results.jsonl')))
+    assert [record['url'].rsplit('/', 1)[1] for record in records] == ['0', '0.3']
+    assert all(record['query'] == 'q' and record['status'] == 'ok' for record in records)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+結果ストア（重複排除・圧縮・ガベージコレクション）のテスト
+"""
+
+import os
+import time
+
+from result_store import ResultStore, main
+from scrape_result import ScrapeResult
+
+CONTENT = "同じ本文" * 100
+
+
+def _age(store: ResultStore, digest: str, seconds: float):
+    """blobの更新日時を過去にずらす"""
+    path, _ = store._find_blob(digest)
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_dedup_and_load(tmp_path):
+    store = ResultStore(str(tmp_path), compression='gzip')
+    results = [ScrapeResult('https://a.example/', CONTENT, ['https://a.example/1.png']),
+               ScrapeResult('https://b.example/', CONTENT, [])]
+    with store.open_run('q', len(results)) as run:
+        for result in results:
+            run.write(result)
+
+    assert store.stats()['blobs'] == 1
+    assert store.dedup_hits == 1
+    loaded = store.load(store.runs()[0]['run_id'])
+    assert [page['content'] for page in loaded] == [CONTENT, CONTENT]
+    assert loaded[0]['images'] == ['https://a.example/1.png']
+
+
+def test_gc_removes_only_unreferenced_old_blobs(tmp_path):
+    store = ResultStore(str(tmp_path), compression='gzip')
+    with store.open_run('q', 1) as run:
+        run.write(ScrapeResult('https://a.example/', CONTENT, []))
+    orphan = store.put_content("参照されない本文")
+    _age(store, orphan, 7200)
+
+    assert store.gc(min_age=3600)['removed'] == 1
+    assert store.load(store.runs()[0]['run_id'])[0]['content'] == CONTENT
+    assert store._find_blob(orphan) is None
+
+
+def test_gc_keeps_blob_reused_by_run_in_progress(tmp_path):
+    """マニフェストを書く前の実行が再利用した古いblobは gc() で削除されない"""
+    store = ResultStore(str(tmp_path), compression='gzip')
+    digest = store.put_content(CONTENT)
+    _age(store, digest, 7200)
+
+    run = store.open_run('q', 1)
+    run.write(ScrapeResult('https://a.example/', CONTENT, []))
+    # 書き込みスレッドが重複排除を終えるまで待つ
+    for _ in range(100):
+        if store.dedup_hits:
+            break
+        time.sleep(0.01)
+    assert store.dedup_hits == 1
+
+    assert store.gc(min_age=3600)['removed'] == 0
+    run.close()
+    assert store.load(run.run_id)[0]['content'] == CONTENT
+
+
+def test_corrupt_manifest_is_skipped_by_runs_and_gc(tmp_path):
+    """書きかけ・壊れたマニフェストは runs() と同じく gc() でも読み飛ばす"""
+    store = ResultStore(str(tmp_path), compression='gzip')
+    with store.open_run('q', 1) as run:
+        run.write(ScrapeResult('https://a.example/', CONTENT, []))
+    for name, text in (('truncated.json', '{"run_id": "truncated", "resu'), ('list.json', '[]')):
+        with open(os.path.join(store.manifest_dir, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    assert len(store.runs()) == 1
+    assert store.gc(min_age=0)['kept'] == 1
+    assert store.load(store.runs()[0]['run_id'])[0]['content'] == CONTENT
+
+
+def test_cli_reports_errors_with_exit_code(tmp_path, capsys):
+    store = ResultStore(str(tmp_path / 'store'))
+    store.put_content(CONTENT)
+    assert main(['--root', store.root, 'stats']) == 0
+
+    not_a_dir = tmp_path / 'file'
+    not_a_dir.write_text('')
+    assert main(['--root', str(not_a_dir), 'gc']) == 1
+    assert '❌ gc' in capsys.readouterr().err
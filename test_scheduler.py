@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+HostScheduler のテスト（ネットワークに接続せずローカルのサーバーで実行）
+"""
+
+import asyncio
+from collections import Counter
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from fast_scraper import FastWebScraper
+from scheduler import HostScheduler, host_key
+from scrape_result import ScrapeStatus
+
+
+class ConcurrencyProbe:
+    """ホストごと・全体の同時実行数の最大値を記録するワーカー"""
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.active = Counter()
+        self.peak = Counter()
+        self.peak_total = 0
+        self.started = []
+
+    async def __call__(self, url: str) -> str:
+        host = host_key(url)
+        self.started.append(host)
+        self.active[host] += 1
+        self.peak[host] = max(self.peak[host], self.active[host])
+        self.peak_total = max(self.peak_total, sum(self.active.values()))
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active[host] -= 1
+        return url.upper()
+
+
+def _urls(hosts: int, per_host: int):
+    return [f"http://h{h}.example/{i}" for h in range(hosts) for i in range(per_host)]
+
+
+def test_limits_and_order():
+    """全体・ホストごとの同時実行数を守り、結果は入力順に返す"""
+    urls = _urls(3, 10)
+    probe = ConcurrencyProbe()
+    scheduler = HostScheduler(max_concurrency=5, per_host_limit=2)
+
+    results = asyncio.run(scheduler.run(urls, probe))
+    assert results == [url.upper() for url in urls]
+    assert max(probe.peak.values()) == 2
+    assert probe.peak_total == 5
+    assert scheduler.stats() == {'queued': 0, 'in_flight': 0, 'completed': 30, 'active_hosts': 0, 'hosts': {}}
+
+
+def test_round_robin_between_hosts():
+    """1つのホストのURLが続いていても、ホスト間を交互に処理する"""
+    probe = ConcurrencyProbe(delay=0)
+    asyncio.run(HostScheduler(max_concurrency=1).run(_urls(3, 2), probe))
+    assert probe.started == ['h0.example', 'h1.example', 'h2.example'] * 2
+
+
+def test_shared_scheduler_limits_all_batches():
+    """同じスケジューラを共有するバッチの同時実行数は合計で制限される"""
+    probe = ConcurrencyProbe()
+    scheduler = HostScheduler(max_concurrency=4, per_host_limit=4)
+
+    async def main():
+        return await asyncio.gather(scheduler.run(_urls(2, 6), probe), scheduler.run(_urls(2, 6), probe))
+
+    first, second = asyncio.run(main())
+    assert first == second
+    assert probe.peak_total == 4
+
+
+def test_early_exit_cancels_queued_urls():
+    """iter_run を途中で抜けると、待ち行列と実行中のURLを破棄する"""
+    probe = ConcurrencyProbe(delay=0.05)
+    scheduler = HostScheduler(max_concurrency=2, per_host_limit=2)
+
+    async def main():
+        async for _ in scheduler.iter_run(_urls(1, 10), probe):
+            break
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert scheduler.queued == 0 and scheduler.in_flight == 0
+    assert len(probe.started) < 10
+
+
+def test_failing_worker_does_not_abort_batch():
+    """ワーカーが例外を送出したURLは on_error の結果（省略時は例外）になり、残りのURLは処理を続ける"""
+    async def worker(url: str) -> str:
+        await asyncio.sleep(0.01)
+        if url.endswith('/1'):
+            raise ValueError("broken")
+        return url.upper()
+
+    async def main(on_error=None):
+        scheduler = HostScheduler(max_concurrency=2, per_host_limit=2)
+        results = await scheduler.run(_urls(1, 6), worker, on_error=on_error)
+        return scheduler, results
+
+    scheduler, results = asyncio.run(main())
+    assert isinstance(results[1], ValueError)
+    assert results[5] == "HTTP://H0.EXAMPLE/5" and scheduler.stats()['completed'] == 6
+
+    _, results = asyncio.run(main(on_error=lambda url, error: f"failed {url}: {error}"))
+    assert results[1] == "failed http://h0.example/1: broken"
+    assert sum(result.startswith("HTTP://") for result in results) == 5
+
+
+def test_scraper_reports_worker_failure_as_error_result(monkeypatch):
+    """1件の処理で予期しない例外が起きても、そのURLだけ ERROR の結果になり他のページは取得する"""
+    async def page(request):
+        return web.Response(text="<html><body><p>page</p></body></html>", content_type='text/html')
+
+    scraper = FastWebScraper()
+    scrape_one = scraper._scrape_one
+
+    async def flaky(http_session, url, deadline=None):
+        if url.endswith('/2'):
+            raise RuntimeError("unexpected")
+        return await scrape_one(http_session, url, deadline=deadline)
+
+    monkeypatch.setattr(scraper, '_scrape_one', flaky)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/{name}', page)
+        async with TestServer(app) as server:
+            return await scraper.scrape_urls_async([str(server.make_url(f'/{i}')) for i in range(4)])
+
+    results = asyncio.run(main())
+    assert [result.status for result in results] == [ScrapeStatus.OK, ScrapeStatus.OK, ScrapeStatus.ERROR, ScrapeStatus.OK]
+    assert results[2].url.endswith('/2') and results[2].content == "Error: unexpected"
+
+
+def test_scraper_respects_per_host_limit():
+    """スクレイパーに渡したスケジューラでサーバーへの同時リクエスト数が制限される"""
+    active = peak = 0
+
+    async def page(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            active -= 1
+        return web.Response(text="<html><body><p>page</p></body></html>", content_type='text/html')
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/{name}', page)
+        async with TestServer(app) as server:
+            urls = [str(server.make_url(f'/{i}')) for i in range(12)]
+            scraper = FastWebScraper(scheduler=HostScheduler(max_concurrency=10, per_host_limit=3))
+            return await scraper.scrape_urls_async(urls)
+
+    results = asyncio.run(main())
+    assert len(results) == 12 and all('page' in result.content for result in results)
+    assert peak == 3
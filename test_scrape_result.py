@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+ScrapeResult（1ページ分の結果の型）のテスト
+"""
+
+import json
+
+from scrape_result import ScrapeResult, ScrapeStatus, is_success
+
+
+def test_mapping_compatibility_and_round_trip():
+    """従来の辞書と同じキーで参照でき、to_dict() / from_dict() で往復できる"""
+    result = ScrapeResult('https://a.example/', '本文', ['https://a.example/1.png'], ScrapeStatus.TRUNCATED,
+                          scraped_at=1_700_000_000.0, elapsed=0.5, image_alts={'https://a.example/1.png': '図'})
+    assert not hasattr(result, '__dict__')
+    assert result['content'] == '本文' and result['status'] is ScrapeStatus.TRUNCATED
+    assert isinstance(result['scraped_at'], str) and result.scraped_at == 1_700_000_000.0
+    assert list(result) == list(result.to_dict())
+    assert result.ok and is_success(result)
+
+    data = json.loads(json.dumps(result.to_dict(), ensure_ascii=False))
+    assert data['status'] == 'truncated'
+    restored = ScrapeResult.from_dict(data)
+    assert restored.to_dict() == result.to_dict()
+
+
+def test_legacy_dicts():
+    """status のない従来形式の辞書はエラーメッセージから状態を判定する"""
+    legacy = {'url': 'https://a.example/', 'content': 'Error: HTTP 404', 'images': [],
+              'scraped_at': '2026-10-17T00:00:00', 'elapsed': 0.1}
+    assert ScrapeResult.from_dict(legacy).status is ScrapeStatus.ERROR
+    assert not is_success(legacy)
+    assert is_success({**legacy, 'content': '本文'})
+    assert not is_success({**legacy, 'status': 'timeout'})
+
+
+def test_results_without_alts_share_no_mapping():
+    """altテキストのない結果は image_alts に辞書を持たず、辞書としての参照・変換では空の辞書になる"""
+    results = [ScrapeResult(f'https://a.example/{i}', '本文', []) for i in range(2)]
+    assert all(result.image_alts is None for result in results)
+    assert results[0]['image_alts'] == {} and results[0].to_dict()['image_alts'] == {}
+    assert ScrapeResult.from_dict(results[0].to_dict()).image_alts is None
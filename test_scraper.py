@@ -5,6 +5,7 @@
 
 from fast_scraper import FastWebScraper
 import json
+import logging
 import os
 
 def test_scraping():
@@ -60,4 +61,5 @@ def test_scraping():
         return False
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     test_scraping()
\ No newline at end of file
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+scraper_api のテスト（ローカルの検索エンジン・サイトで実行し、ネットワークには接続しない）
+"""
+
+import asyncio
+import json
+from collections import Counter
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import scraper_api
+from scrape_result import ScrapeResult
+from search_cache import SearchCache
+from search_providers import SearchRouter, BingSearch
+
+
+async def _serve(state: dict) -> TestServer:
+    """検索結果ページ（Bing形式）と3件のページを配信するサーバーを起動（state["base"] にベースURL）"""
+    async def search(request):
+        base = state['base']
+        links = ''.join(f'<li class="b_algo"><h2><a href="{base}/page/{i}">p{i}</a></h2></li>' for i in range(3))
+        return web.Response(text=f"<html><body><ol>{links}</ol></body></html>", content_type='text/html')
+
+    async def page(request):
+        name = request.match_info['name']
+        state.setdefault('peers', set()).add(request.transport.get_extra_info('peername'))
+        return web.Response(text=f"<html><body><p>ページ{name}</p><img src='/img/{name}.png'></body></html>",
+                            content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/search', search)
+    app.router.add_get('/page/{name}', page)
+    server = TestServer(app)
+    await server.start_server()
+    state['base'] = str(server.make_url('')).rstrip('/')
+    return server
+
+
+def _use_local_search(monkeypatch, base: str):
+    router = SearchRouter([BingSearch(base + '/search')], cache=SearchCache())
+    monkeypatch.setattr(scraper_api, 'default_search_router', router)
+
+
+def test_results_are_scrape_results_or_opt_in_dicts(monkeypatch):
+    """公開APIの結果は ScrapeResult、as_dicts=True なら JSON に変換でき、変更もできる辞書"""
+    async def main():
+        state = {}
+        server = await _serve(state)
+        try:
+            _use_local_search(monkeypatch, state['base'])
+            return (await scraper_api.ascrape_with_query("q", save_to_file=False),
+                    await scraper_api.ascrape_with_query("q", save_to_file=False, as_dicts=True))
+        finally:
+            await server.close()
+
+    result, dicts = asyncio.run(main())
+    assert result['success'] and len(result['results']) == 3
+    page = result['results'][0]
+    assert isinstance(page, ScrapeResult) and page.ok and page['status'] == 'ok'
+
+    page = dicts['results'][0]
+    assert type(page) is dict
+    assert page['status'] == 'ok'
+    page['note'] = 'mutable'
+    json.dumps(dicts, ensure_ascii=False)
+
+
+def test_batch_results_are_opt_in_dicts(monkeypatch):
+    async def main():
+        state = {}
+        server = await _serve(state)
+        try:
+            _use_local_search(monkeypatch, state['base'])
+            return await scraper_api.ascrape_batch(["a", "b"], as_dicts=True)
+        finally:
+            await server.close()
+
+    batch = asyncio.run(main())
+    assert batch['unique_urls'] == 3 and batch['total_urls'] == 6
+    assert all(type(page) is dict for query in batch['queries'] for page in query['results'])
+    first, second = batch['queries']
+    assert first['results'][0] is second['results'][0]
+    json.dumps(batch, ensure_ascii=False)
+
+
+def test_async_calls_share_a_session_per_loop(monkeypatch):
+    """session を省略した非同期呼び出しはループごとのセッションを共有し、ループの終了時に閉じる"""
+    async def main():
+        state = {}
+        server = await _serve(state)
+        try:
+            _use_local_search(monkeypatch, state['base'])
+            await scraper_api.aquick_scrape("q1")
+            await scraper_api.aget_all_image_urls("q2")
+            session = await scraper_api.default_loop_session()
+            return session, state['peers']
+        finally:
+            await server.close()
+
+    session, peers = asyncio.run(main())
+    # 2回目の呼び出しは1回目のkeep-alive接続を再利用する
+    assert len(peers) <= 3
+    assert session.closed
+    assert not scraper_api._loop_sessions
+
+
+def test_sync_wrappers_share_default_session(monkeypatch):
+    """同期関数は共有のバックグラウンドループ上の default_session で実行し、接続を再利用する"""
+    async def main():
+        state = {}
+        server = await _serve(state)
+        try:
+            _use_local_search(monkeypatch, state['base'])
+            loop = asyncio.get_running_loop()
+            # サーバーはこのループで動いているため、同期関数は別スレッドから呼ぶ
+            images = await loop.run_in_executor(None, scraper_api.get_all_image_urls, "q1")
+            text = await loop.run_in_executor(None, scraper_api.quick_scrape, "q2")
+            return images, text, state['peers']
+        finally:
+            await server.close()
+
+    images, text, peers = asyncio.run(main())
+    assert len(images) == 3
+    assert 'ページ0' in text
+    assert len(peers) <= 3
+
+
+def test_batch_deduplicates_queries_and_urls(monkeypatch):
+    """表記ゆれのクエリは1回だけ検索し、複数のクエリに出てきたページ（フラグメント違いを含む）は1回だけ取得する"""
+    searches = Counter()
+    fetches = Counter()
+    links = {'python': [0, 1, 2], 'rust': [1, 2, 3]}
+
+    async def main():
+        async def search(request):
+            query = request.query['q']
+            searches[query.casefold().strip()] += 1
+            items = ''.join(f'<li class="b_algo"><h2><a href="{base}/page/{i}#q={query}">p{i}</a></h2></li>'
+                            for i in links[query.casefold().strip()])
+            return web.Response(text=f"<html><body><ol>{items}</ol></body></html>", content_type='text/html')
+
+        async def page(request):
+            fetches[request.match_info['name']] += 1
+            return web.Response(text=f"<html><body><p>ページ{request.match_info['name']}</p></body></html>",
+                                content_type='text/html')
+
+        app = web.Application()
+        app.router.add_get('/search', search)
+        app.router.add_get('/page/{name}', page)
+        async with TestServer(app) as server:
+            base = str(server.make_url('')).rstrip('/')
+            _use_local_search(monkeypatch, base)
+            return await scraper_api.ascrape_batch(["Python", "rust", " PYTHON "])
+
+    batch = asyncio.run(main())
+    assert searches == {'python': 1, 'rust': 1}
+    assert fetches == {'0': 1, '1': 1, '2': 1, '3': 1}
+    assert batch['total_queries'] == 3 and batch['unique_urls'] == 4 and batch['total_urls'] == 9
+    python, rust, python_again = batch['queries']
+    assert [page['content'].strip() for page in rust['results']] == ['ページ1', 'ページ2', 'ページ3']
+    assert python['results'] == python_again['results']
+    assert python['results'][1] is rust['results'][0]
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+ScraperSession（呼び出しをまたいで再利用するコネクションプール）のテスト
+（ネットワークに接続せずローカルのサーバーで実行）
+"""
+
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from fast_scraper import FastWebScraper
+from scraper_session import ScraperSession, background_loop
+
+
+def _app(peers: set) -> web.Application:
+    async def page(request):
+        peers.add(request.transport.get_extra_info('peername'))
+        return web.Response(text="<html><body><p>page</p></body></html>", content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/page', page)
+    return app
+
+
+def test_connections_are_reused_across_calls():
+    """同じ ScraperSession を渡した呼び出しはkeep-aliveの接続を再利用し、渡さなければ呼び出しごとに接続する"""
+    shared_peers, own_peers = set(), set()
+
+    async def main():
+        async with TestServer(_app(shared_peers)) as server:
+            url = str(server.make_url('/page'))
+            scraper = FastWebScraper()
+            async with ScraperSession() as session:
+                for _ in range(3):
+                    await scraper.scrape_urls_async([url], session=session)
+            assert session.closed
+
+        async with TestServer(_app(own_peers)) as server:
+            url = str(server.make_url('/page'))
+            for _ in range(3):
+                await FastWebScraper().scrape_urls_async([url])
+
+    asyncio.run(main())
+    assert len(shared_peers) == 1
+    assert len(own_peers) == 3
+
+
+def test_sync_calls_share_the_background_loop():
+    """同期コードからの呼び出しは共有のバックグラウンドループで同じaiohttpセッションを使う"""
+    peers = set()
+    server = TestServer(_app(peers))
+    loop = background_loop()
+    asyncio.run_coroutine_threadsafe(server.start_server(), loop).result(5)
+    try:
+        url = str(server.make_url('/page'))
+        session = ScraperSession()
+        scraper = FastWebScraper(session=session)
+        first = session.run(scraper.scrape_urls_async([url]))
+        http_session = session.run(session.get())
+        second = session.run(scraper.scrape_urls_async([url]))
+        assert session.run(session.get()) is http_session
+        session.close_sync()
+        assert session.closed
+    finally:
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result(5)
+
+    assert first[0].content == second[0].content and 'page' in first[0].content
+    assert len(peers) == 1
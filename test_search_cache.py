@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+検索結果キャッシュのテスト（ネットワークに接続せずローカルの検索エンジンで実行）
+"""
+
+import asyncio
+import threading
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from search_cache import SearchCache, normalize_query
+from search_providers import SearchRouter, BingSearch
+
+
+def test_normalize_query():
+    assert normalize_query("  Ｐｙｔｈｏｎ   ASYNC ") == "python async"
+
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    """SQLiteに保存した結果は別のインスタンスから読める（期限切れは読まない）"""
+    db_path = str(tmp_path / 'search.db')
+    cache = SearchCache(db_path=db_path)
+    cache.put('bing', 'Python', 3, ['https://a.example/', 'https://b.example/'])
+    cache.close()
+
+    cache = SearchCache(db_path=db_path)
+    assert cache.get('bing', 'python', 3) == ['https://a.example/', 'https://b.example/']
+    assert cache.stats()['disk_hits'] == 1
+    cache.close()
+
+    expired = SearchCache(ttl=0, db_path=db_path)
+    assert expired.get('bing', 'python', 3) is None
+    expired.close()
+
+
+def test_sqlite_access_runs_off_the_loop(tmp_path):
+    """SQLiteを使う場合、ルーターからの読み書きはイベントループのスレッドで行わない"""
+    requests = 0
+
+    async def search(request):
+        nonlocal requests
+        requests += 1
+        return web.Response(text='<li class="b_algo"><h2><a href="https://a.example/">a</a></h2></li>',
+                            content_type='text/html')
+
+    class RecordingCache(SearchCache):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.threads = set()
+
+        def get(self, *args):
+            self.threads.add(threading.get_ident())
+            return super().get(*args)
+
+        def put(self, *args):
+            self.threads.add(threading.get_ident())
+            return super().put(*args)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/search', search)
+        cache = RecordingCache(db_path=str(tmp_path / 'search.db'))
+        async with TestServer(app) as server, aiohttp.ClientSession() as session:
+            router = SearchRouter([BingSearch(str(server.make_url('/search')))], cache=cache)
+            first = await router.search(session, 'q', 1)
+            second = await router.search(session, 'Q', 1)
+        cache.close()
+        return cache, first, second
+
+    cache, first, second = asyncio.run(main())
+    assert first.urls == second.urls == ['https://a.example/']
+    assert not first.cached and second.cached
+    assert requests == 1
+    assert cache.threads and threading.get_ident() not in cache.threads
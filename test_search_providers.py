@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+検索プロバイダーの使い分け（fallback / race / merge とスキップ）のテスト（ネットワークに接続せずローカルの検索エンジンで実行）
+"""
+
+import asyncio
+import time
+from collections import Counter
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from deadline import Deadline
+from search_providers import SearchRouter, BingSearch, DuckDuckGoSearch, SearchError
+
+BING_RESULTS = ('<li class="b_algo"><h2><a href="https://a.example/1">a</a></h2></li>'
+                '<li class="b_algo"><h2><a href="https://shared.example/">s</a></h2></li>')
+DDG_RESULTS = ('<a class="result__a" href="//duckduckgo.com/l/?uddg=https%3A%2F%2Fd.example%2F1&rut=x">d</a>'
+               '<a class="result__a" href="https://shared.example/#frag">s</a>'
+               '<a href="https://duckduckgo.com/">広告</a>')
+
+
+def _app(hits: Counter) -> web.Application:
+    async def bing(request):
+        hits['bing'] += 1
+        return web.Response(text=BING_RESULTS, content_type='text/html')
+
+    async def slow_bing(request):
+        hits['slow_bing'] += 1
+        await asyncio.sleep(2)
+        return web.Response(text=BING_RESULTS, content_type='text/html')
+
+    async def limited(request):
+        hits['limited'] += 1
+        return web.Response(status=429, headers={'Retry-After': '120'})
+
+    async def broken(request):
+        hits['broken'] += 1
+        return web.Response(status=500)
+
+    async def ddg(request):
+        hits['ddg'] += 1
+        return web.Response(text=DDG_RESULTS, content_type='text/html')
+
+    app = web.Application()
+    for path, handler in (('/bing', bing), ('/slow_bing', slow_bing), ('/limited', limited),
+                          ('/broken', broken), ('/ddg', ddg)):
+        app.router.add_get(path, handler)
+    return app
+
+
+def _run(make_router, queries, **kwargs):
+    """ローカルの検索エンジンでルーターを作成して順に検索し、(ルーター, 結果のリスト, 呼び出し数) を返す"""
+    hits = Counter()
+
+    async def main():
+        async with TestServer(_app(hits)) as server, aiohttp.ClientSession() as session:
+            router = make_router(lambda path: str(server.make_url(path)))
+            outcomes = [await router.search(session, query, **kwargs) for query in queries]
+            return router, outcomes
+
+    router, outcomes = asyncio.run(main())
+    return router, outcomes, hits
+
+
+def test_fallback_skips_rate_limited_provider():
+    """レート制限されたプロバイダーは次のプロバイダーに切り替え、Retry-After の間はスキップする"""
+    router, outcomes, hits = _run(
+        lambda url: SearchRouter([BingSearch(url('/limited')), DuckDuckGoSearch(url('/ddg'))]), ['q1', 'q2'])
+    first, second = outcomes
+    assert first.provider == second.provider == 'duckduckgo'
+    assert first.urls == ['https://d.example/1', 'https://shared.example/#frag']
+    assert isinstance(first.errors[0][1], SearchError) and first.errors[0][1].rate_limited
+    assert second.skipped == ['bing'] and not second.errors
+    assert hits['limited'] == 1 and hits['ddg'] == 2
+
+    bing = router.stats()['bing']
+    assert not bing['available'] and 110 < bing['retry_in'] <= 120
+
+
+def test_failures_disable_provider_after_threshold():
+    """レート制限以外の失敗は failure_threshold 回続いてからスキップする"""
+    router, outcomes, hits = _run(
+        lambda url: SearchRouter([BingSearch(url('/broken'))], failure_threshold=2, cooldown=60), ['a', 'b', 'c'])
+    assert [outcome.urls for outcome in outcomes] == [[], [], []]
+    assert hits['broken'] == 2
+    assert outcomes[2].skipped == ['bing']
+    assert router.stats()['bing']['consecutive_failures'] == 2
+
+
+def test_race_uses_first_result():
+    """race では最初に結果を返したプロバイダーを使い、遅いプロバイダーは待たない"""
+    started = time.perf_counter()
+    router, outcomes, hits = _run(
+        lambda url: SearchRouter([BingSearch(url('/slow_bing')), DuckDuckGoSearch(url('/ddg'))], mode='race'), ['q'])
+    assert time.perf_counter() - started < 1.5
+    assert outcomes[0].provider == 'duckduckgo'
+    assert hits['slow_bing'] == 1
+    assert router.stats()['bing']['failures'] == 0
+
+
+def test_merge_interleaves_and_dedupes():
+    """merge では順位ごとに交互に並べ、同じページ（フラグメント違いを含む）は1件にまとめる"""
+    router, outcomes, hits = _run(
+        lambda url: SearchRouter([BingSearch(url('/bing')), DuckDuckGoSearch(url('/ddg'))], mode='merge'),
+        ['q'], num_results=5)
+    outcome = outcomes[0]
+    assert outcome.provider == 'bing+duckduckgo'
+    assert outcome.urls == ['https://a.example/1', 'https://d.example/1', 'https://shared.example/']
+
+
+def test_expired_deadline_skips_search():
+    """締め切りを過ぎていれば問い合わせずに expired を返す"""
+    router, outcomes, hits = _run(lambda url: SearchRouter([BingSearch(url('/bing'))]), ['q'],
+                                  deadline=Deadline(0))
+    assert outcomes[0].expired and not outcomes[0].urls
+    assert hits['bing'] == 0
+
+
+def test_router_shared_across_loops():
+    """1つのルーターを複数のスレッドのイベントループで共有しても、ヘルスの記録が揃う"""
+    hits = Counter()
+
+    def run(router: SearchRouter):
+        async def main():
+            async with aiohttp.ClientSession() as session:
+                for i in range(10):
+                    await router.search(session, f"q{i}")
+        asyncio.run(main())
+
+    async def serve():
+        async with TestServer(_app(hits)) as server:
+            router = SearchRouter([BingSearch(str(server.make_url('/bing')))])
+            loop = asyncio.get_running_loop()
+            # with_cache() で作ったルーターもヘルスの記録とロックを共有する
+            await asyncio.gather(*(loop.run_in_executor(None, run, router if i % 2 else router.with_cache(None))
+                                   for i in range(4)))
+            return router
+
+    router = asyncio.run(serve())
+    assert hits['bing'] == 40 and router.stats()['bing']['successes'] == 40
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+URL関連のユーティリティ
+"""
+
+from urllib.parse import urlsplit, urlunsplit
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    同一ページを指すURLを同じ文字列にそろえる（重複排除・キャッシュのキー用）
+
+    - スキームとホスト名を小文字化
+    - デフォルトポート（http:80 / https:443）を除去
+    - フラグメント（#以降）を除去
+    - 空のパスは "/" にする
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        # IPv6アドレス
+        host = f"[{host}]"
+    if parts.username or parts.password:
+        userinfo = parts.username or ''
+        if parts.password:
+            userinfo += f":{parts.password}"
+        host = f"{userinfo}@{host}"
+    if port is not None and _DEFAULT_PORTS.get(scheme) != port:
+        host = f"{host}:{port}"
+    path = parts.path or '/'
+    return urlunsplit((scheme, host, path, parts.query, ''))